@@ -7,39 +7,32 @@ from datetime import datetime
 
 # --- DroidRun Professional Architecture Imports ---
 try:
-    from droidrun.agent.droid import DroidAgent
-    from droidrun.agent.utils.llm_picker import load_llm
-    from droidrun.config_manager import DroidrunConfig, AgentConfig, ManagerConfig, ExecutorConfig, TelemetryConfig
+    from llm_factory import create_droid_agent, run_droid_agent
 except ImportError:
     print("CRITICAL ERROR: 'droidrun' library not found.")
     sys.exit(1)
 
 from schemas import HotelDetails, ItineraryDay, ItineraryActivity, FullTripPlan
+from metrics import track_llm_call
+from rate_limiter import LIMITER, estimate_tokens
 
 class StayManager:
-    def __init__(self, provider="gemini", model="models/gemini-1.5-flash"):
+    def __init__(self, provider="gemini", model="models/gemini-1.5-flash", device_serial=None):
         self.provider = provider
         self.model = model
+        self.device_serial = device_serial
         self.api_key = os.getenv("GEMINI_API_KEY") or os.getenv("GOOGLE_API_KEY")
         if self.api_key:
             genai.configure(api_key=self.api_key)
 
     async def _run_agent(self, goal: str) -> dict:
         """Helper to run DroidAgent for Hotel Search."""
-        provider_name = "GoogleGenAI" if self.provider == "gemini" else self.provider
-        llm = load_llm(provider_name=provider_name, model=self.model, api_key=self.api_key)
-        
-        manager_config = ManagerConfig(vision=True)
-        executor_config = ExecutorConfig(vision=True)
-        agent_config = AgentConfig(reasoning=True, manager=manager_config, executor=executor_config)
-        telemetry_config = TelemetryConfig(enabled=False)
-        config = DroidrunConfig(agent=agent_config, telemetry=telemetry_config)
-
-        agent = DroidAgent(goal=goal, llms=llm, config=config)
+        agent = create_droid_agent(goal, provider=self.provider, model=self.model,
+                                   device_serial=self.device_serial, api_key=self.api_key)
         
         try:
             print(f"      🧠 StayAgent Analyzing...")
-            result = await agent.run()
+            result = await run_droid_agent(agent, key=self.device_serial)
             
             # Robust Parsing
             raw_text = str(result.reason) if hasattr(result, 'reason') else str(result)
@@ -108,7 +101,9 @@ class StayManager:
         )
         
         model = genai.GenerativeModel(self.model)
-        response = model.generate_content(prompt)
+        async with LIMITER.limit(tokens=estimate_tokens(prompt), key=self.device_serial):
+            with track_llm_call("itinerary"):
+                response = await model.generate_content_async(prompt)
         
         try:
             # Clean up response
@@ -6,9 +6,7 @@ import sys
 
 # --- DroidRun Professional Architecture Imports ---
 try:
-    from droidrun.agent.droid import DroidAgent
-    from droidrun.agent.utils.llm_picker import load_llm
-    from droidrun.config_manager import DroidrunConfig, AgentConfig, ManagerConfig, ExecutorConfig, TelemetryConfig
+    from llm_factory import create_droid_agent, run_droid_agent
 except ImportError:
     print("CRITICAL ERROR: 'droidrun' library not found.")
     sys.exit(1)
@@ -16,28 +14,21 @@ except ImportError:
 from schemas import FlightDetails, CabDetails
 
 class TransitManager:
-    def __init__(self, provider="gemini", model="models/gemini-1.5-flash"):
+    def __init__(self, provider="gemini", model="models/gemini-1.5-flash", device_serial=None):
         self.provider = provider
         self.model = model
+        self.device_serial = device_serial
         self.api_key = os.getenv("GEMINI_API_KEY") or os.getenv("GOOGLE_API_KEY")
 
     async def _run_agent(self, goal: str) -> dict:
         """Helper to run DroidAgent."""
-        # Config setup
-        provider_name = "GoogleGenAI" if self.provider == "gemini" else self.provider
-        llm = load_llm(provider_name=provider_name, model=self.model, api_key=self.api_key)
-        
-        manager_config = ManagerConfig(vision=True)
-        executor_config = ExecutorConfig(vision=True)
-        agent_config = AgentConfig(reasoning=True, manager=manager_config, executor=executor_config)
-        telemetry_config = TelemetryConfig(enabled=False)
-        config = DroidrunConfig(agent=agent_config, telemetry=telemetry_config)
-
-        agent = DroidAgent(goal=goal, llms=llm, config=config)
+        # Shared LLM client + config (see llm_factory.py)
+        agent = create_droid_agent(goal, provider=self.provider, model=self.model,
+                                   device_serial=self.device_serial, api_key=self.api_key)
         
         try:
             print(f"      🧠 TransitAgent Analyzing...")
-            result = await agent.run()
+            result = await run_droid_agent(agent, key=self.device_serial)
             
             # Robust Parsing (based on EventCoordinator logic)
             raw_text = str(result.reason) if hasattr(result, 'reason') else str(result)
@@ -8,8 +8,7 @@ from dotenv import load_dotenv
 
 # --- DroidRun Professional Architecture Imports ---
 try:
-    from droidrun.agent.droid import DroidAgent
-    from droidrun.config_manager import DroidrunConfig
+    from llm_factory import create_droid_agent, run_droid_agent
 except ImportError:
     print("CRITICAL ERROR: 'droidrun' library not found or incompatible version.")
     print("Please ensure you have installed it: pip install droidrun")
@@ -18,15 +17,21 @@ except ImportError:
 # Load environment variables
 load_dotenv()
 
+from metrics import timed_execute_task
+from neurorun.ui_settle import wait_until_idle
+from result_cache import PRICE_CACHE
+from single_flight import coalesce_identical
+
 class CommerceAgent:
     """
     Professional Commerce Agent using DroidRun Framework.
     Follows the 'Brain' (Host) and 'Senses' (Portal) architecture.
     """
     
-    def __init__(self, provider="gemini", model="gemini-1.5-flash"):
+    def __init__(self, provider="gemini", model="gemini-1.5-flash", device_serial=None):
         self.provider = provider
         self.model = model
+        self.device_serial = device_serial # None = let DroidRun pick the attached device
         self._ensure_api_keys()
 
     def _ensure_api_keys(self):
@@ -55,13 +60,26 @@ class CommerceAgent:
             print(f"[Error] Price Parse Failed for '{price_str}': {e}")
             return float('inf')
 
-    async def execute_task(self, app_name: str, query: str, item_type: str, action: str = "search", target_item: str = None) -> dict:
+    @timed_execute_task("commerce")
+    @coalesce_identical(("app_name", "query", "item_type", "max_age"), when={"action": "search"})
+    async def execute_task(self, app_name: str, query: str, item_type: str, action: str = "search", target_item: str = None,
+                           max_age: float = None) -> dict:
         """
         Spawns a DroidAgent to execute a specific commerce task.
         Uses Vision capabilities for better UI understanding.
         Action: 'search' (compare prices) or 'order' (buy item via COD).
+        Searches are served from the shared price cache while fresh; `max_age` (seconds)
+        overrides the app's TTL for this call (0 = always search on the device).
         """
         print(f"\n[CommerceAgent] Initializing Task for: {app_name} (Action: {action})")
+
+        cache_key = None
+        if action == "search":
+            cache_key = PRICE_CACHE.key(app_name, query, item_type)
+            cached = PRICE_CACHE.get(cache_key, max_age=max_age)
+            if cached is not None:
+                print(f"[CommerceAgent] ⚡ Cache hit for '{query}' on {app_name} ({cached['cache_age']}s old)")
+                return cached
         
         # 1. Define Goal (Natural Language with Structural Constraints)
         if action == "order":
@@ -96,47 +114,14 @@ class CommerceAgent:
             )
 
         # 2. Configure Agent (Professional Pattern)
-        # Using load_llm to avoid DroidrunConfig error
-        from droidrun.agent.utils.llm_picker import load_llm
-        from droidrun.config_manager import DroidrunConfig, AgentConfig, ManagerConfig, ExecutorConfig, TelemetryConfig
-        
-        api_key = os.getenv("GEMINI_API_KEY") or os.getenv("GOOGLE_API_KEY")
-        llm = load_llm(
-            provider_name="GoogleGenAI",
-            model=self.model,
-            api_key=api_key
-        )
-
-        # Create properly typed config
-        # Enable vision for Manager (planning) and Executor (acting)
-        manager_config = ManagerConfig(vision=True)
-        executor_config = ExecutorConfig(vision=True)
-        
-        agent_config = AgentConfig(
-            reasoning=True,
-            manager=manager_config,
-            executor=executor_config
-        )
-        
-        # Disable telemetry to avoid "multiple values for distinct_id" error
-        telemetry_config = TelemetryConfig(enabled=False)
-        
-        config = DroidrunConfig(
-            agent=agent_config,
-            telemetry=telemetry_config
-        )
-
-        agent = DroidAgent(
-            goal=goal,
-            llms=llm,
-            config=config,
-        )
+        # LLM client and config are shared process-wide (see llm_factory.py)
+        agent = create_droid_agent(goal, provider="gemini", model=self.model, device_serial=self.device_serial)
 
         # 3. Execute
         start_data = {"platform": app_name, "status": "failed", "data": {}}
         try:
             print(f"[CommerceAgent] 🧠 Running Agent Logic...")
-            result = await agent.run()
+            result = await run_droid_agent(agent, key=self.device_serial)
             print(f"[DEBUG] Raw Agent Result type: {type(result)}")
             print(f"[DEBUG] Raw Agent Result: {result}")
             
@@ -179,6 +164,9 @@ class CommerceAgent:
                      print(f"[Warn] Agent output was not JSON: {clean_json[:50]}...")
             else:
                  print("[Warn] Agent returned None result.")
+
+            if cache_key and start_data["status"] == "success":
+                PRICE_CACHE.put(cache_key, start_data)
             
             return start_data
 
@@ -197,9 +185,10 @@ class CommerceAgent:
         results = {}
         
         for platform in platforms:
-            res = await self.execute_task(platform, query, "food item", action="search")
+            # About to pay: only trust prices seen in the last couple of minutes
+            res = await self.execute_task(platform, query, "food item", action="search", max_age=120)
             results[platform.lower()] = res
-            await asyncio.sleep(2)
+            await wait_until_idle(self.device_serial, timeout=2)
 
         # 2. Determine Victor
         z_price = float('inf')
@@ -274,7 +263,7 @@ async def main():
         for platform in platforms:
             res = await commerce_bot.execute_task(platform, args.query, item_type, action=args.action)
             results[platform.lower()] = res
-            await asyncio.sleep(2)
+            await wait_until_idle(commerce_bot.device_serial, timeout=2)
             
         print("\n--- Final Results ---")
         print(json.dumps(results, indent=2))
@@ -0,0 +1,342 @@
+import asyncio
+import json
+import logging
+import os
+import time
+import uuid
+from collections import deque
+from typing import Any, Callable, Deque, Dict, Iterable, List, Optional, Set, Tuple
+
+from fastapi import WebSocket
+
+from metrics import WS_FANOUT_SECONDS
+
+logger = logging.getLogger("ConnectionManager")
+
+# Events a client must never miss
+LIFECYCLE_EVENTS = {"queued", "start", "complete"}
+# The only frames that may be shed for a slow client
+LOG_EVENTS = {"log", "log_batch"}
+
+
+class ClientConnection:
+    """One WebSocket plus its bounded outbound queue, writer task and subscriptions."""
+
+    def __init__(self, websocket: WebSocket, max_queue: int):
+        self.websocket = websocket
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue)
+        self.dropped = 0
+        self.writer: Optional[asyncio.Task] = None
+
+        # New clients get every event until their first subscribe/unsubscribe
+        self.all = True
+        self.summary = False
+        self.task_ids: Set[str] = set()
+        self.personas: Set[str] = set()
+
+    def subscriptions(self) -> Dict[str, Any]:
+        return {
+            "all": self.all,
+            "summary": self.summary,
+            "task_ids": sorted(self.task_ids),
+            "personas": sorted(self.personas),
+        }
+
+
+class ConnectionManager:
+    """
+    Fans events out to WebSocket clients without ever awaiting the network.
+
+    Every client gets a bounded queue drained by its own writer task, so one slow dashboard
+    can't stall `log_and_broadcast`. When a client's queue is full the slow-client policy applies:
+      - "downsample" (default): log lines are dropped for that client; any other frame evicts
+        the oldest queued log frame instead. Once the client catches up it gets a 'dropped'
+        notice with the count so it can refetch. A queue holding nothing but lifecycle frames
+        is never trimmed: the client is disconnected and resyncs on reconnect.
+      - "disconnect": the client is closed and must reconnect.
+
+    Log lines are coalesced per task: the first line starts a `batch_interval` timer and
+    everything that arrives before it fires goes out as one 'log_batch' frame. A task's
+    pending lines are always flushed before its 'complete' event.
+
+    Every published event carries a monotonically increasing `seq` and is kept in a bounded
+    replay buffer, so a reconnecting client can ask for everything after the last seq it saw
+    (see `replay`) instead of refetching the world. Seqs restart at 0 with the process, so
+    they are only meaningful together with `boot_id`, sent in the 'hello' frame on connect.
+
+    Events are routed by topic: clients can subscribe to task ids, personas, "summary"
+    (lifecycle events of every task, no log lines) or "all". Each event is delivered to the
+    union of the matching subscriber sets, so cost grows with interested clients only.
+    """
+
+    def __init__(self, max_queue: Optional[int] = None, policy: Optional[str] = None, send_timeout: Optional[float] = None,
+                 batch_interval: Optional[float] = None):
+        self.max_queue = max_queue if max_queue is not None else int(os.getenv("WS_SEND_QUEUE", "256"))
+        self.policy = policy or os.getenv("WS_SLOW_CLIENT_POLICY", "downsample")
+        self.send_timeout = send_timeout if send_timeout is not None else float(os.getenv("WS_SEND_TIMEOUT", "5"))
+        self.batch_interval = batch_interval if batch_interval is not None else int(os.getenv("WS_BATCH_MS", "50")) / 1000
+        self.clients: Dict[WebSocket, ClientConnection] = {}
+        # Close tasks for evicted slow clients, kept so they aren't garbage collected mid-close
+        self._closing: Set[asyncio.Task] = set()
+
+        # task_id -> (persona, [messages]) waiting for the batch timer
+        self._pending_logs: Dict[str, Tuple[Optional[str], List[str]]] = {}
+
+        # Event sequence + replay buffer of (seq, event, encoded frame); a seq from another
+        # boot_id refers to a previous process and can't be replayed
+        self.boot_id = uuid.uuid4().hex
+        self.seq = 0
+        self._replay: Deque[Tuple[int, Dict[str, Any], str]] = deque(maxlen=int(os.getenv("WS_REPLAY_EVENTS", "2000")))
+        # Called with every published event (after seq is assigned)
+        self.on_publish: Optional[Callable[[Dict[str, Any]], None]] = None
+
+        # Topic indexes
+        self._all: Set[ClientConnection] = set()
+        self._summary: Set[ClientConnection] = set()
+        self._by_task: Dict[str, Set[ClientConnection]] = {}
+        self._by_persona: Dict[str, Set[ClientConnection]] = {}
+
+    @property
+    def active_connections(self):
+        return list(self.clients.keys())
+
+    async def connect(self, websocket: WebSocket) -> ClientConnection:
+        await websocket.accept()
+        client = ClientConnection(websocket, self.max_queue)
+        client.writer = asyncio.create_task(self._writer(client))
+        self.clients[websocket] = client
+        self._all.add(client)
+        self._enqueue(client, "hello", json.dumps({"type": "hello", "boot_id": self.boot_id, "current_seq": self.seq}))
+        return client
+
+    def disconnect(self, websocket: WebSocket):
+        client = self.clients.pop(websocket, None)
+        if client is None:
+            return
+        self._unindex(client, client.task_ids, client.personas)
+        self._all.discard(client)
+        self._summary.discard(client)
+        if client.writer and client.writer is not asyncio.current_task():
+            client.writer.cancel()
+
+    # --- Subscriptions ---
+    def subscribe(self, client: ClientConnection, task_ids: Iterable[str] = (), personas: Iterable[str] = (),
+                  summary: Optional[bool] = None, firehose: Optional[bool] = None):
+        """Adds topics. Any explicit subscription turns the default firehose off unless firehose=True."""
+        task_ids, personas = set(task_ids) - client.task_ids, set(personas) - client.personas
+        for task_id in task_ids:
+            self._by_task.setdefault(task_id, set()).add(client)
+        for persona in personas:
+            self._by_persona.setdefault(persona, set()).add(client)
+        client.task_ids |= task_ids
+        client.personas |= personas
+
+        if summary is not None:
+            client.summary = summary
+            (self._summary.add if summary else self._summary.discard)(client)
+        client.all = bool(firehose)
+        (self._all.add if client.all else self._all.discard)(client)
+
+    def unsubscribe(self, client: ClientConnection, task_ids: Iterable[str] = (), personas: Iterable[str] = (),
+                    summary: bool = False, firehose: bool = False):
+        task_ids, personas = set(task_ids) & client.task_ids, set(personas) & client.personas
+        self._unindex(client, task_ids, personas)
+        client.task_ids -= task_ids
+        client.personas -= personas
+        if summary:
+            client.summary = False
+            self._summary.discard(client)
+        # Unsubscribing from anything also ends the default firehose
+        client.all = False if (firehose or task_ids or personas or summary) else client.all
+        if not client.all:
+            self._all.discard(client)
+
+    def _unindex(self, client: ClientConnection, task_ids: Iterable[str], personas: Iterable[str]):
+        for index, keys in ((self._by_task, task_ids), (self._by_persona, personas)):
+            for key in keys:
+                subscribers = index.get(key)
+                if subscribers is not None:
+                    subscribers.discard(client)
+                    if not subscribers:
+                        del index[key]
+
+    async def handle_message(self, client: ClientConnection, text: str):
+        """
+        Client -> server control messages, e.g.
+          {"action": "subscribe", "task_ids": ["..."], "personas": ["rider"], "summary": true}
+          {"action": "unsubscribe", "task_ids": ["..."]}
+        A subscribe may carry "since": <seq> (and the "boot_id" it came from) to replay what it
+        missed on those topics.
+        Anything else (plain keep-alive pings) is ignored.
+        """
+        try:
+            msg = json.loads(text)
+        except ValueError:
+            return
+        if not isinstance(msg, dict) or msg.get("action") not in ("subscribe", "unsubscribe"):
+            return
+
+        task_ids = msg.get("task_ids") or []
+        personas = msg.get("personas") or []
+        if not isinstance(task_ids, list) or not isinstance(personas, list):
+            self._enqueue(client, "error", json.dumps({"type": "error", "message": "task_ids/personas must be lists"}))
+            return
+
+        if msg["action"] == "subscribe":
+            self.subscribe(client, task_ids, personas, summary=msg.get("summary"), firehose=msg.get("all", False))
+        else:
+            self.unsubscribe(client, task_ids, personas, summary=bool(msg.get("summary")), firehose=bool(msg.get("all")))
+        self._enqueue(client, "subscribed", json.dumps({"type": "subscribed", **client.subscriptions()}))
+
+        # Optional catch-up for the new topics: {"action": "subscribe", ..., "since": 123}
+        if msg["action"] == "subscribe" and isinstance(msg.get("since"), int):
+            self.replay(client, msg["since"], msg.get("boot_id"))
+
+    @staticmethod
+    def _wants(client: ClientConnection, data: Dict[str, Any]) -> bool:
+        return (
+            client.all
+            or data.get("task_id") in client.task_ids
+            or data.get("persona") in client.personas
+            or (client.summary and data.get("type") in LIFECYCLE_EVENTS)
+        )
+
+    def replay(self, client: ClientConnection, since: int, boot_id: Optional[str] = None):
+        """
+        Queues buffered events with seq > since that match the client's subscriptions.
+        If the buffer no longer reaches back that far, or `since` is from another boot (a
+        restart resets seq), the client gets a 'resync' frame and should refetch /tasks instead.
+        """
+        same_boot = boot_id is None or boot_id == self.boot_id
+        if since == self.seq and same_boot:
+            return
+        if not same_boot or since > self.seq or not self._replay or self._replay[0][0] > since + 1:
+            self._enqueue(client, "resync", json.dumps({"type": "resync", "boot_id": self.boot_id, "current_seq": self.seq}))
+            return
+
+        missed = []
+        for seq, data, message in reversed(self._replay):
+            if seq <= since:
+                break
+            if self._wants(client, data):
+                missed.append((data.get("type", "raw"), message))
+        for kind, message in reversed(missed):
+            self._enqueue(client, kind, message)
+
+    def _recipients(self, data: Dict[str, Any]) -> Set[ClientConnection]:
+        recipients = set(self._all)
+        task_id, persona = data.get("task_id"), data.get("persona")
+        if task_id in self._by_task:
+            recipients |= self._by_task[task_id]
+        if persona in self._by_persona:
+            recipients |= self._by_persona[persona]
+        if data.get("type") in LIFECYCLE_EVENTS:
+            recipients |= self._summary
+        return recipients
+
+    async def _writer(self, client: ClientConnection):
+        try:
+            while True:
+                _, message = await client.queue.get()
+                await asyncio.wait_for(client.websocket.send_text(message), timeout=self.send_timeout)
+                if client.dropped and client.queue.empty():
+                    notice = json.dumps({"type": "dropped", "count": client.dropped})
+                    client.dropped = 0
+                    await asyncio.wait_for(client.websocket.send_text(notice), timeout=self.send_timeout)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning(f"Dropping WebSocket client after send failure: {e!r}")
+            self.disconnect(client.websocket)
+            try:
+                await client.websocket.close()
+            except Exception:
+                pass
+
+    def _enqueue(self, client: ClientConnection, kind: str, message: str):
+        try:
+            client.queue.put_nowait((kind, message))
+            return
+        except asyncio.QueueFull:
+            pass
+
+        if self.policy != "disconnect":
+            if kind in LOG_EVENTS:
+                client.dropped += 1
+                return
+            # Make room by shedding the oldest queued log frame; nothing else may be lost
+            if self._evict_log_frame(client):
+                client.dropped += 1
+                client.queue.put_nowait((kind, message))
+                return
+
+        logger.warning("Disconnecting slow WebSocket client (send queue full)")
+        self._close_slow_client(client)
+
+    @staticmethod
+    def _evict_log_frame(client: ClientConnection) -> bool:
+        frames = [client.queue.get_nowait() for _ in range(client.queue.qsize())]
+        victim = next((i for i, (kind, _) in enumerate(frames) if kind in LOG_EVENTS), None)
+        if victim is not None:
+            del frames[victim]
+        for frame in frames:
+            client.queue.put_nowait(frame)
+        return victim is not None
+
+    def _close_slow_client(self, client: ClientConnection):
+        self.disconnect(client.websocket)
+        task = asyncio.create_task(client.websocket.close())
+        self._closing.add(task)
+        task.add_done_callback(self._closed)
+
+    def _closed(self, task: asyncio.Task):
+        self._closing.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.warning(f"Closing slow WebSocket client failed: {task.exception()!r}")
+
+    async def broadcast(self, message: str):
+        # Legacy support if needed, but we prefer structured (untagged, so firehose clients only)
+        for client in list(self._all):
+            self._enqueue(client, "raw", message)
+
+    async def broadcast_json(self, data: Dict[str, Any]):
+        """Encodes once and queues for every interested client; never waits on a socket."""
+        self.publish(data)
+
+    async def broadcast_log(self, task_id: str, persona: Optional[str], message: str):
+        """Buffers a log line for the task's next 'log_batch' frame."""
+        if self.batch_interval <= 0:
+            self.publish({"type": "log", "task_id": task_id, "persona": persona, "message": message})
+            return
+        pending = self._pending_logs.get(task_id)
+        if pending is None:
+            self._pending_logs[task_id] = (persona, [message])
+            asyncio.get_running_loop().call_later(self.batch_interval, self.flush_logs, task_id)
+        else:
+            pending[1].append(message)
+
+    def flush_logs(self, task_id: str):
+        pending = self._pending_logs.pop(task_id, None)
+        if pending is None:
+            return
+        persona, messages = pending
+        self.publish({"type": "log_batch", "task_id": task_id, "persona": persona, "messages": messages})
+
+    def publish(self, data: Dict[str, Any]):
+        if data.get("type") == "complete" and data.get("task_id") in self._pending_logs:
+            # Logs must land before the completion they lead up to
+            self.flush_logs(data["task_id"])
+
+        start = time.perf_counter()
+        self.seq += 1
+        data = {**data, "seq": self.seq}
+        message = json.dumps(data, default=str)
+        self._replay.append((self.seq, data, message))
+        if self.on_publish:
+            self.on_publish(data)
+
+        recipients = self._recipients(data)
+        kind = data.get("type", "raw")
+        for client in recipients:
+            self._enqueue(client, kind, message)
+        WS_FANOUT_SECONDS.labels(kind).observe(time.perf_counter() - start)
@@ -0,0 +1,232 @@
+import asyncio
+import logging
+import os
+import time
+from contextlib import asynccontextmanager
+from typing import Callable, Dict, List, Optional
+
+from neurorun.adb_session import AdbError
+
+logger = logging.getLogger("DevicePool")
+
+# adb / DroidRun messages that mean the phone itself is the problem (as opposed to the LLM,
+# a parse error or agent logic), lower-cased
+DEVICE_ERROR_MARKERS = (
+    "device offline",
+    "device not found",
+    "no devices/emulators found",
+    "device unauthorized",
+    "device still authorizing",
+    "adb: ",
+    "failed to connect",
+    "connection refused",
+    "portal",
+)
+
+
+def is_device_error(error: BaseException) -> bool:
+    """True for ADB/connection failures, the only errors that should count against a device."""
+    if isinstance(error, (AdbError, ConnectionError)):
+        return True
+    message = str(error).lower()
+    return any(marker in message for marker in DEVICE_ERROR_MARKERS)
+
+
+async def _adb(*args: str, timeout: float = 10) -> str:
+    proc = await asyncio.create_subprocess_exec(
+        "adb", *args, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.DEVNULL
+    )
+    try:
+        out, _ = await asyncio.wait_for(proc.communicate(), timeout=timeout)
+    except asyncio.TimeoutError:
+        proc.kill()
+        raise
+    return out.decode(errors="ignore")
+
+
+async def list_adb_serials() -> Dict[str, str]:
+    """{serial: state} for everything `adb devices` reports (state is 'device', 'offline', 'unauthorized', ...)."""
+    try:
+        out = await _adb("devices")
+    except (FileNotFoundError, asyncio.TimeoutError):
+        return {}
+    serials = {}
+    for line in out.splitlines()[1:]:
+        parts = line.split()
+        if len(parts) >= 2:
+            serials[parts[0]] = parts[1]
+    return serials
+
+
+class Device:
+    """Lease bookkeeping for one phone/emulator. serial=None means 'whatever adb picks by default'."""
+
+    def __init__(self, serial: Optional[str]):
+        self.serial = serial
+        self.busy = False
+        self.healthy = True
+        self.failures = 0
+        self.last_error: Optional[str] = None
+        self.task_id: Optional[str] = None
+        self.leased_at: Optional[float] = None
+        self.completed = 0
+        self.failed_this_lease = False
+
+    def to_dict(self) -> dict:
+        return {
+            "serial": self.serial,
+            "state": "busy" if self.busy else "idle",
+            "healthy": self.healthy,
+            "failures": self.failures,
+            "last_error": self.last_error,
+            "task_id": self.task_id,
+            "busy_for": round(time.monotonic() - self.leased_at, 1) if self.busy and self.leased_at else None,
+            "completed": self.completed,
+        }
+
+
+class DevicePool:
+    """
+    Leases one ADB device per task.
+
+    Devices are discovered from `adb devices` at start and re-checked every
+    `refresh_interval` seconds. A device that crashes `max_failures` tasks in a row, or
+    disappears from adb, is marked unhealthy and skipped until a probe succeeds again.
+    If nothing is attached the pool holds a single default device (serial=None) so
+    single-phone setups behave exactly as before.
+    """
+
+    def __init__(self, refresh_interval: Optional[float] = None, max_failures: int = 3):
+        self.refresh_interval = refresh_interval if refresh_interval is not None else float(os.getenv("DEVICE_REFRESH_SECONDS", "30"))
+        self.max_failures = max_failures
+        self.devices: Dict[Optional[str], Device] = {}
+        self.on_resize: Optional[Callable[[int], None]] = None
+
+        self._available = asyncio.Condition()
+        self._refresher: Optional[asyncio.Task] = None
+
+    def __len__(self) -> int:
+        return len(self.devices)
+
+    def snapshot(self) -> List[dict]:
+        return [d.to_dict() for d in self.devices.values()]
+
+    async def start(self):
+        await self.refresh()
+        self._refresher = asyncio.create_task(self._refresh_loop())
+        logger.info(f"Device pool: {[d.serial for d in self.devices.values()]}")
+
+    async def stop(self):
+        if self._refresher:
+            self._refresher.cancel()
+            try:
+                await self._refresher
+            except asyncio.CancelledError:
+                pass
+
+    async def _refresh_loop(self):
+        while True:
+            await asyncio.sleep(self.refresh_interval)
+            try:
+                await self.refresh()
+            except Exception as e:
+                logger.error(f"Device refresh failed: {e}")
+
+    async def refresh(self):
+        """Picks up newly attached devices, drops vanished idle ones and re-probes unhealthy ones."""
+        found = await list_adb_serials()
+        ready = {serial for serial, state in found.items() if state == "device"}
+
+        default = self.devices.get(None)
+        if ready and default is not None:
+            if default.busy:
+                # Leased before real devices showed up: let that task finish on it, but hand
+                # out no new leases; it is dropped on the first refresh after release
+                default.healthy = False
+            else:
+                del self.devices[None]
+        elif default is not None:
+            default.healthy = True
+        for serial in ready:
+            if serial not in self.devices:
+                self.devices[serial] = Device(serial)
+                logger.info(f"Device attached: {serial}")
+
+        for serial, device in list(self.devices.items()):
+            if serial is None:
+                continue
+            if serial not in ready:
+                if device.busy:
+                    device.healthy = False
+                    device.last_error = f"adb state: {found.get(serial, 'missing')}"
+                else:
+                    del self.devices[serial]
+                    logger.info(f"Device detached: {serial}")
+            elif not device.healthy and not device.busy and await self._probe(serial):
+                device.healthy = True
+                device.failures = 0
+                logger.info(f"Device recovered: {serial}")
+
+        if not self.devices:
+            self.devices[None] = Device(None)
+
+        async with self._available:
+            self._available.notify_all()
+        if self.on_resize:
+            self.on_resize(len(self.devices))
+
+    async def _probe(self, serial: str) -> bool:
+        try:
+            return "ok" in await _adb("-s", serial, "shell", "echo", "ok", timeout=5)
+        except (FileNotFoundError, asyncio.TimeoutError):
+            return False
+
+    def _pick_idle(self) -> Optional[Device]:
+        # Prefer the device that has done the least work so load spreads evenly
+        idle = [d for d in self.devices.values() if not d.busy and d.healthy]
+        return min(idle, key=lambda d: d.completed) if idle else None
+
+    def mark_failure(self, serial: Optional[str], error: Exception):
+        """Records a device-level failure; enough in a row take it out of rotation. Errors
+        that aren't about the device (quota, parsing, agent logic) are ignored."""
+        device = self.devices.get(serial)
+        if device is None or not is_device_error(error):
+            return
+        device.failures += 1
+        device.failed_this_lease = True
+        device.last_error = str(error)
+        # The default device can't be probed back to health, so it is never taken out
+        if device.failures >= self.max_failures and serial is not None:
+            device.healthy = False
+            logger.warning(f"Device {device.serial} marked unhealthy after {device.failures} failures")
+
+    @asynccontextmanager
+    async def lease(self, task_id: Optional[str] = None):
+        """Waits for an idle healthy device, marks it busy and always releases it on exit."""
+        async with self._available:
+            device = self._pick_idle()
+            while device is None:
+                await self._available.wait()
+                device = self._pick_idle()
+            device.busy = True
+            device.task_id = task_id
+            device.leased_at = time.monotonic()
+            device.failed_this_lease = False
+
+        try:
+            yield device
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self.mark_failure(device.serial, e)
+            raise
+        else:
+            if not device.failed_this_lease:
+                device.failures = 0
+            device.completed += 1
+        finally:
+            device.busy = False
+            device.task_id = None
+            device.leased_at = None
+            async with self._available:
+                self._available.notify()
@@ -9,9 +9,7 @@ from dotenv import load_dotenv
 
 # --- DroidRun Professional Architecture Imports ---
 try:
-    from droidrun.agent.droid import DroidAgent
-    from droidrun.agent.utils.llm_picker import load_llm
-    from droidrun.config_manager import DroidrunConfig, AgentConfig, ManagerConfig, ExecutorConfig, TelemetryConfig
+    from llm_factory import create_droid_agent, run_droid_agent
 except ImportError:
     print("CRITICAL ERROR: 'droidrun' library not found.")
     sys.exit(1)
@@ -23,38 +21,32 @@ except ImportError:
     print("CRITICAL ERROR: 'commerce_agent.py' not found.")
     sys.exit(1)
 
+from neurorun.ui_settle import wait_until_idle
+from result_cache import PRICE_CACHE
+
 load_dotenv()
 
 class EventCoordinatorAgent:
-    def __init__(self, provider="gemini", model="models/gemini-2.5-flash"):
+    def __init__(self, provider="gemini", model="models/gemini-2.5-flash", device_serial=None):
         self.provider = provider
         self.model = model
-        self.commerce_bot = CommerceAgent(provider=provider, model=model)
+        self.device_serial = device_serial
+        self.api_key = os.getenv("GEMINI_API_KEY") or os.getenv("GOOGLE_API_KEY")
+        self.commerce_bot = CommerceAgent(provider=provider, model=model, device_serial=device_serial)
         self._ensure_api_keys()
 
     def _ensure_api_keys(self):
-        if self.provider == "gemini" and not os.getenv("GEMINI_API_KEY") and not os.getenv("GOOGLE_API_KEY"):
+        if self.provider == "gemini" and not self.api_key:
              print("[Warn] GEMINI_API_KEY not found in env.")
 
     async def _run_agent(self, goal: str) -> dict:
         """Helper to run DroidAgent with Robust Regex Parsing."""
-        # ... (Config setup same) ...
-        api_key = os.getenv("GEMINI_API_KEY") or os.getenv("GOOGLE_API_KEY")
-        provider_name = "GoogleGenAI" if self.provider == "gemini" else self.provider
-        
-        llm = load_llm(provider_name=provider_name, model=self.model, api_key=api_key)
-        
-        manager_config = ManagerConfig(vision=True)
-        executor_config = ExecutorConfig(vision=True)
-        agent_config = AgentConfig(reasoning=True, manager=manager_config, executor=executor_config)
-        telemetry_config = TelemetryConfig(enabled=False)
-        config = DroidrunConfig(agent=agent_config, telemetry=telemetry_config)
-
-        agent = DroidAgent(goal=goal, llms=llm, config=config)
+        agent = create_droid_agent(goal, provider=self.provider, model=self.model,
+                                   device_serial=self.device_serial, api_key=self.api_key)
         
         try:
             print(f"      🧠 Analyzing...")
-            result = await agent.run()
+            result = await run_droid_agent(agent, key=self.device_serial)
             
             # --- Robust Parsing ---
             raw_text = str(result.reason) if hasattr(result, 'reason') else str(result)
@@ -174,7 +166,7 @@ class EventCoordinatorAgent:
             await self.send_invite(contact, invite_msg)
             print(f"   🏠 Resetting to Home after invite to {contact}...")
             await self.go_home() # STRICT EXIT as requested
-            await asyncio.sleep(2)
+            await wait_until_idle(self.device_serial, timeout=2)
         print("✅ Phase 1 Complete: All invites sent & returned to Home.\n")
 
         # --- PHASE 2: POLLING & RESEARCH (Infinite) ---
@@ -231,7 +223,7 @@ class EventCoordinatorAgent:
                 else:
                      print(f"   ⏳ {contact} hasn't replied yet.")
                 
-                await asyncio.sleep(2)
+                await wait_until_idle(self.device_serial, timeout=2)
 
     async def go_home(self) -> dict:
         """Helper to ensure device is at Home Screen."""
@@ -246,8 +238,15 @@ class EventCoordinatorAgent:
         results = {}
         
         for p in platforms:
+             # A fresh cached price needs no device work at all (not even going Home)
+             res = PRICE_CACHE.get(PRICE_CACHE.key(p, item, "food item"))
+             if res is not None:
+                 print(f"      ⚡ {p}: cached price ({res['cache_age']}s old)")
+                 results[p.lower()] = res
+                 continue
+
              await self.go_home() # Reset state to avoid "Already Open" loops
-             await asyncio.sleep(2)
+             await wait_until_idle(self.device_serial, timeout=2)
              
              print(f"      👉 Checking {p}...")
              res = await self.commerce_bot.execute_task(p, item, "food item", action="search")
@@ -258,7 +257,7 @@ class EventCoordinatorAgent:
              price = res.get('data', {}).get('price', 'N/A')
              print(f"         [{p}] Status: {status} | Price: {price}")
              
-             await asyncio.sleep(2)
+             await wait_until_idle(self.device_serial, timeout=2)
              
         z_data = results.get('zomato', {}).get('data', {})
         s_data = results.get('swiggy', {}).get('data', {})
@@ -314,7 +313,7 @@ class EventCoordinatorAgent:
         
         for contact in contacts:
             await self.send_invite(contact, invite_msg)
-            await asyncio.sleep(2)
+            await wait_until_idle(self.device_serial, timeout=2)
         print("✅ Phase 1 Complete: All invites sent.\n")
 
         # --- PHASE 2: POLLING & RESEARCH ---
@@ -361,7 +360,7 @@ class EventCoordinatorAgent:
                 else:
                      print(f"   ⏳ {contact} hasn't replied yet.")
                 
-                await asyncio.sleep(2)
+                await wait_until_idle(self.device_serial, timeout=2)
             
             # DORMANT STATE
             print("   💤 Entering Dormant State... Waking up in 10s...")
@@ -395,7 +394,7 @@ class EventCoordinatorAgent:
                 target_item=order['exact_title']
             )
             print("✅ Order Placed.")
-            await asyncio.sleep(5)
+            await wait_until_idle(self.device_serial, timeout=5)
             
         print("\n=== 🎉 EVENT COORDINATION COMPLETE ===")
 
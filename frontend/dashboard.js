@@ -11,6 +11,7 @@ document.addEventListener('DOMContentLoaded', () => {
     const closeModalBtn = document.getElementById('close-modal');
     const connectionStatus = document.getElementById('connection-status');
     const statusDot = document.querySelector('.status-dot');
+    const loadMoreBtn = document.getElementById('load-more');
 
     // Cursor Elements
 
@@ -18,6 +19,9 @@ document.addEventListener('DOMContentLoaded', () => {
     // State
     let activeTaskId = null;
     let tasks = {}; // { taskId: taskData }
+    let ws = null;
+    let lastSeq = null; // Highest event seq applied; used to resume the stream after a reconnect
+    let bootId = null; // Server process lastSeq belongs to; seqs restart with the server
 
     // --- Init ---
     init();
@@ -83,20 +87,35 @@ document.addEventListener('DOMContentLoaded', () => {
 
 
     // --- Data Fetching ---
-    async function fetchTasks() {
+    // /tasks is paginated and returns summaries (no logs/result); details come from /tasks/{id}
+    const PAGE_SIZE = 50;
+    let nextCursor = null;
+
+    async function fetchTasks(cursor = null) {
         try {
-            const response = await fetch('http://localhost:8000/tasks');
-            const data = await response.json();
+            const params = new URLSearchParams({ limit: PAGE_SIZE });
+            if (cursor) params.set('cursor', cursor);
 
-            tasksGrid.innerHTML = '';
-            tasks = {};
+            const response = await fetch(`http://localhost:8000/tasks?${params}`);
+            const data = await response.json();
+            const page = data.tasks || [];
+
+            if (!cursor) {
+                tasksGrid.innerHTML = '';
+                tasks = {};
+                // A full reload reflects every event up to this point
+                if (data.seq !== undefined) lastSeq = data.seq;
+                if (data.boot_id !== undefined) bootId = data.boot_id;
+            }
+            nextCursor = data.next_cursor;
+            loadMoreBtn.classList.toggle('hidden', !nextCursor);
 
-            if (data.length === 0) {
+            if (!cursor && page.length === 0) {
                 renderEmptyState();
             } else {
-                data.forEach((task, index) => {
+                page.forEach((task, index) => {
                     tasks[task.id] = task;
-                    createTaskCard(task, index); // Pass index for stagger
+                    createTaskCard(task, index, 'append'); // Page is newest first
                 });
             }
             feather.replace();
@@ -105,6 +124,25 @@ document.addEventListener('DOMContentLoaded', () => {
         }
     }
 
+    async function fetchTaskDetails(taskId) {
+        try {
+            const response = await fetch(`http://localhost:8000/tasks/${taskId}`);
+            const data = await response.json();
+            if (data.error) return null;
+            // Keep any live logs that arrived while the request was in flight
+            const known = tasks[taskId] || {};
+            tasks[taskId] = { ...known, ...data };
+            return tasks[taskId];
+        } catch (error) {
+            console.error("Failed to fetch task details:", error);
+            return null;
+        }
+    }
+
+    loadMoreBtn.addEventListener('click', () => {
+        if (nextCursor) fetchTasks(nextCursor);
+    });
+
     function renderEmptyState() {
         tasksGrid.innerHTML = `
             <div class="empty-state">
@@ -123,7 +161,7 @@ document.addEventListener('DOMContentLoaded', () => {
     }
 
     // --- UI Rendering ---
-    function createTaskCard(task, index = 0) {
+    function createTaskCard(task, index = 0, position = 'prepend') {
         if (tasksGrid.querySelector('.empty-state')) {
             tasksGrid.innerHTML = '';
         }
@@ -157,7 +195,11 @@ document.addEventListener('DOMContentLoaded', () => {
             </div>
         `;
 
-        tasksGrid.prepend(card); // Newest first
+        if (position === 'append') {
+            tasksGrid.appendChild(card); // Older pages go below
+        } else {
+            tasksGrid.prepend(card); // Newest first
+        }
 
         // GSAP Entrance (Staggered based on index or just simple entry)
         gsap.fromTo(card,
@@ -222,17 +264,21 @@ document.addEventListener('DOMContentLoaded', () => {
         if (activeTaskId === taskId) {
             modalStatus.textContent = status.toUpperCase();
             modalStatus.className = `badge ${status}`;
-            if (status === 'success' || status === 'failed') {
+            if (['success', 'failed', 'cancelled', 'timeout'].includes(status)) {
                 showResult(result);
             }
         }
     }
 
     // --- Modal Logic ---
-    function openTaskModal(taskId) {
-        const task = tasks[taskId];
+    async function openTaskModal(taskId) {
+        let task = tasks[taskId];
         if (!task) return;
 
+        // Only the open task streams logs; the rest of the grid is summary-only
+        sendWs({ action: 'subscribe', task_ids: [taskId], summary: true });
+        task = (await fetchTaskDetails(taskId)) || task;
+
         activeTaskId = taskId;
         modalTitle.textContent = `${capitalize(task.persona)} Operation`;
         modalId.textContent = `ID: ${taskId.split('-')[0]}...`;
@@ -268,6 +314,7 @@ document.addEventListener('DOMContentLoaded', () => {
             y: 50, opacity: 0, scale: 0.95, duration: 0.3, ease: "power3.in",
             onComplete: () => {
                 modal.classList.add('hidden');
+                if (activeTaskId) sendWs({ action: 'unsubscribe', task_ids: [activeTaskId] });
                 activeTaskId = null;
             }
         });
@@ -316,8 +363,22 @@ document.addEventListener('DOMContentLoaded', () => {
     }
 
     // --- WebSocket ---
+    function sendWs(message) {
+        if (ws && ws.readyState === WebSocket.OPEN) {
+            ws.send(JSON.stringify(message));
+        }
+    }
+
     function connectWebSocket() {
-        const ws = new WebSocket('ws://localhost:8000/ws');
+        // Cards only need lifecycle events; logs are subscribed per open task.
+        // On reconnect the server replays only what we missed since lastSeq.
+        const params = new URLSearchParams({ summary: 1 });
+        if (activeTaskId) params.set('task_id', activeTaskId);
+        if (lastSeq !== null) {
+            params.set('since', lastSeq);
+            params.set('boot_id', bootId);
+        }
+        ws = new WebSocket(`ws://localhost:8000/ws?${params}`);
 
         ws.onopen = () => {
             connectionStatus.textContent = 'ONLINE';
@@ -343,38 +404,88 @@ document.addEventListener('DOMContentLoaded', () => {
     }
 
     function handleWsMessage(payload) {
-        const { type, task_id, message, status, result, persona } = payload;
+        const { type, task_id, message, status, result, persona, seq } = payload;
+
+        if (type === 'hello') {
+            if (bootId !== null && payload.boot_id !== bootId) {
+                // Server restarted: seqs start over and nothing can be replayed
+                bootId = payload.boot_id;
+                lastSeq = null;
+                fetchTasks();
+                if (activeTaskId) fetchTaskDetails(activeTaskId);
+            }
+            bootId = payload.boot_id;
+            return;
+        }
 
-        if (type === 'start') {
-            const newTask = {
-                id: task_id,
-                persona: persona,
-                status: 'running',
-                created_at: new Date().toISOString(),
-                logs: [],
-                result: null,
-                payload: {}
-            };
-            tasks[task_id] = newTask;
-            createTaskCard(newTask);
-            feather.replace();
+        if (seq !== undefined) {
+            if (lastSeq !== null && seq <= lastSeq) return; // Already applied (replay overlap)
+            lastSeq = seq;
+        }
+
+        if (type === 'resync') {
+            // Too far behind for the replay buffer (or the server restarted)
+            lastSeq = payload.current_seq;
+            fetchTasks();
+            if (activeTaskId) fetchTaskDetails(activeTaskId);
+            return;
+        }
+
+        if (type === 'dropped') {
+            // Server shed some of our log frames while we were slow; resync from REST
+            fetchTasks();
+            if (activeTaskId) fetchTaskDetails(activeTaskId);
+            return;
+        }
+
+        if (!task_id) return; // Control frames (e.g. 'subscribed' acks)
+
+        if (type === 'queued' || type === 'start') {
+            // Frames can arrive in either order (e.g. 'start' live before a replayed 'queued'),
+            // so cards are upserted by task id and never moved back from running to queued
+            upsertTask(task_id, persona, type === 'queued' ? 'queued' : 'running');
         }
 
-        if (!tasks[task_id] && type !== 'start') {
+        if (!tasks[task_id]) {
             fetchTasks();
             return;
         }
 
-        if (type === 'log') {
-            tasks[task_id].logs.push(message);
+        if (type === 'log' || type === 'log_batch') {
+            // Server coalesces bursts into one 'log_batch' frame per task
+            const lines = type === 'log_batch' ? payload.messages : [message];
+            if (tasks[task_id].logs) tasks[task_id].logs.push(...lines);
             if (activeTaskId === task_id) {
-                appendLog(message);
+                lines.forEach(line => appendLog(line));
             }
         } else if (type === 'complete') {
             updateTaskCard(task_id, status, result);
         }
     }
 
+    function upsertTask(taskId, persona, status) {
+        const known = tasks[taskId];
+        if (!known || !document.getElementById(`card-${taskId}`)) {
+            const newTask = {
+                id: taskId,
+                persona: persona,
+                status: status,
+                created_at: new Date().toISOString(),
+                logs: [],
+                result: null,
+                payload: {},
+                ...known
+            };
+            newTask.status = known && known.status !== 'queued' ? known.status : status;
+            tasks[taskId] = newTask;
+            createTaskCard(newTask);
+            feather.replace();
+        } else if (known.status === 'queued' && status === 'running') {
+            // Queued task picked up by a worker
+            updateTaskCard(taskId, 'running');
+        }
+    }
+
     // --- Helpers ---
     function capitalize(str) {
         return str ? str.charAt(0).toUpperCase() + str.slice(1) : '';
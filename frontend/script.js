@@ -278,6 +278,12 @@ document.addEventListener('DOMContentLoaded', () => {
     }
 
     // API & WebSocket Interaction
+    let ws = null;
+    const myTaskIds = new Set(); // Only tasks launched from this page are streamed here
+    let lastSeq = null; // Resume point so a reconnect only replays what we missed
+    const seenSeqs = new Set(); // Frames already shown (replays can overlap live frames)
+    let bootId = null; // Server process lastSeq belongs to; seqs restart with the server
+
     findDealBtn.addEventListener('click', async () => {
         const persona = hiddenInput.value;
         if (!persona) {
@@ -341,7 +347,16 @@ document.addEventListener('DOMContentLoaded', () => {
             });
 
             if (response.ok) {
-                logStatus('Task sent successfully. Enforcing protocol...');
+                const data = await response.json();
+                myTaskIds.add(data.task_id);
+                if (ws && ws.readyState === WebSocket.OPEN) {
+                    // Replay from the task's 'queued' frame: anything it published before
+                    // this subscribe reached the server would otherwise be lost
+                    ws.send(JSON.stringify({ action: 'subscribe', task_ids: [data.task_id], since: data.seq - 1, boot_id: bootId }));
+                }
+                logStatus(`Task sent successfully (queue position ${data.queue_position}). Enforcing protocol...`);
+            } else if (response.status === 429) {
+                logStatus('All agents are busy and the queue is full. Try again shortly.', 'error');
             } else {
                 logStatus('Server responded with error.', 'error');
             }
@@ -352,7 +367,14 @@ document.addEventListener('DOMContentLoaded', () => {
 
     // WebSocket Connection
     function connectWebSocket() {
-        const ws = new WebSocket('ws://localhost:8000/ws');
+        // Lifecycle frames of every task plus full streams of ours; never the firehose
+        const params = new URLSearchParams({ summary: '1' });
+        myTaskIds.forEach(id => params.append('task_id', id));
+        if (lastSeq !== null) {
+            params.set('since', lastSeq);
+            params.set('boot_id', bootId);
+        }
+        ws = new WebSocket(`ws://localhost:8000/ws?${params}`);
 
         ws.onopen = () => {
             logStatus('Live Uplink Established.');
@@ -365,9 +387,31 @@ document.addEventListener('DOMContentLoaded', () => {
                 // Try to parse JSON
                 const parsed = JSON.parse(data);
 
+                if (parsed.type === 'hello') {
+                    if (bootId !== null && parsed.boot_id !== bootId) {
+                        // Server restarted: its seqs start over, so forget ours
+                        seenSeqs.clear();
+                        lastSeq = null;
+                    }
+                    bootId = parsed.boot_id;
+                    return;
+                }
+
+                // Other pages' tasks; not marked seen so a replay after subscribing still shows them
+                if (parsed.task_id && !myTaskIds.has(parsed.task_id)) return;
+                if (parsed.seq !== undefined) {
+                    if (seenSeqs.has(parsed.seq)) return; // Replay overlap
+                    seenSeqs.add(parsed.seq);
+                    if (seenSeqs.size > 1000) seenSeqs.delete(seenSeqs.values().next().value);
+                    lastSeq = Math.max(lastSeq ?? 0, parsed.seq);
+                }
+
                 if (parsed.type === 'log') {
                     logStatus(`> ${parsed.message}`);
                 }
+                else if (parsed.type === 'log_batch') {
+                    parsed.messages.forEach(m => logStatus(`> ${m}`));
+                }
                 else if (parsed.type === 'complete') {
                     // Task Complete
                     if (parsed.status === 'success') {
@@ -379,6 +423,16 @@ document.addEventListener('DOMContentLoaded', () => {
                         }
                     }
                 }
+                else if (parsed.type === 'resync') {
+                    lastSeq = parsed.current_seq;
+                    logStatus('> (Missed updates while disconnected; check the dashboard for results)');
+                }
+                else if (parsed.type === 'dropped') {
+                    logStatus(`> (${parsed.count} log lines skipped while the connection was slow)`);
+                }
+                else if (parsed.type === 'queued') {
+                    logStatus(`> Task Queued: ${parsed.persona} (position ${parsed.queue_position})`);
+                }
                 else if (parsed.type === 'start') {
                     logStatus(`> Task Started: ${parsed.persona} (ID: ${parsed.task_id})`);
                 }
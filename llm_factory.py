@@ -0,0 +1,92 @@
+import copy
+import os
+import threading
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+from rate_limiter import LIMITER
+
+# --- DroidRun Professional Architecture Imports ---
+try:
+    from droidrun.agent.droid import DroidAgent
+    from droidrun.agent.utils.llm_picker import load_llm
+    from droidrun.config_manager import DroidrunConfig, AgentConfig, ManagerConfig, ExecutorConfig, TelemetryConfig, DeviceConfig
+except ImportError:
+    print("CRITICAL ERROR: 'droidrun' library not found or incompatible version.")
+    print("Please ensure you have installed it: pip install droidrun")
+    raise
+
+# Process-wide caches; building an LLM client or a config is pure setup cost we only pay once.
+# Configs are templates: callers get their own copy since DroidAgent may mutate it
+_llms: Dict[Tuple[str, str, Optional[str]], Any] = {}
+_configs: Dict[Tuple[Optional[str], bool, bool], DroidrunConfig] = {}
+_lock = threading.Lock()
+
+# A DroidAgent run makes many LLM calls we can't intercept, so each run is charged up front.
+# Kept well under the request bucket (GEMINI_RPM over a 10s burst = 10 at the default 60 RPM)
+# so one run can't drain it and several devices can start together.
+DROID_RUN_REQUESTS = int(os.getenv("DROID_RUN_REQUESTS", "3"))
+DROID_RUN_TOKENS = int(os.getenv("DROID_RUN_TOKENS", "30000"))
+
+
+def provider_name_for(provider: str) -> str:
+    """Maps our short provider names onto DroidRun's LLM picker names."""
+    return "GoogleGenAI" if provider == "gemini" else provider
+
+
+def default_api_key() -> Optional[str]:
+    return os.getenv("GEMINI_API_KEY") or os.getenv("GOOGLE_API_KEY")
+
+
+def get_llm(provider: str = "gemini", model: str = "models/gemini-2.5-flash", api_key: Optional[str] = None):
+    """Shared LLM client for (provider, model, api_key)."""
+    provider_name = provider_name_for(provider)
+    api_key = api_key or default_api_key()
+    key = (provider_name, model, api_key)
+    llm = _llms.get(key)
+    if llm is None:
+        with _lock:
+            llm = _llms.get(key)
+            if llm is None:
+                llm = _llms[key] = load_llm(provider_name=provider_name, model=model, api_key=api_key)
+    return llm
+
+
+def get_config(device_serial: Optional[str] = None, vision: bool = True, reasoning: bool = True) -> DroidrunConfig:
+    """DroidrunConfig for (device, vision, reasoning), copied from a cached template so
+    concurrent agents never share mutable config state."""
+    key = (device_serial, vision, reasoning)
+    config = _configs.get(key)
+    if config is None:
+        with _lock:
+            config = _configs.get(key)
+            if config is None:
+                # Vision for Manager (planning) and Executor (acting); telemetry off to avoid
+                # the "multiple values for distinct_id" error
+                agent_config = AgentConfig(
+                    reasoning=reasoning,
+                    manager=ManagerConfig(vision=vision),
+                    executor=ExecutorConfig(vision=vision)
+                )
+                config = _configs[key] = DroidrunConfig(
+                    agent=agent_config,
+                    device=DeviceConfig(serial=device_serial),
+                    telemetry=TelemetryConfig(enabled=False)
+                )
+    return copy.deepcopy(config)
+
+
+def create_droid_agent(goal: str, provider: str = "gemini", model: str = "models/gemini-2.5-flash",
+                       device_serial: Optional[str] = None, vision: bool = True, reasoning: bool = True,
+                       api_key: Optional[str] = None) -> DroidAgent:
+    """A fresh DroidAgent for `goal`, built from the shared LLM client and its own config."""
+    return DroidAgent(
+        goal=goal,
+        llms=get_llm(provider, model, api_key),
+        config=get_config(device_serial, vision, reasoning)
+    )
+
+
+async def run_droid_agent(agent: DroidAgent, key: Hashable = None):
+    """Runs `agent` under the shared Gemini rate limiter (key = device serial for fair queuing)."""
+    async with LIMITER.limit(tokens=DROID_RUN_TOKENS, key=key, requests=DROID_RUN_REQUESTS):
+        return await agent.run()
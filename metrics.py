@@ -0,0 +1,280 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+# Seconds; spans a fast ADB tap (~50ms) up to a multi-minute agent run
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class _Timer:
+    """Context manager that observes the elapsed wall time into a histogram child."""
+
+    def __init__(self, child: "_HistogramChild"):
+        self.child = child
+        self.start = 0.0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.child.observe(time.perf_counter() - self.start)
+        return False
+
+
+class _HistogramChild:
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # Last slot is +Inf
+        self.sum = 0.0
+        self.lock = threading.Lock()
+
+    def observe(self, value: float):
+        i = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            self.counts[i] += 1
+            self.sum += value
+
+    def time(self) -> _Timer:
+        return _Timer(self)
+
+
+class _CounterChild:
+    def __init__(self):
+        self.value = 0.0
+        self.lock = threading.Lock()
+
+    def inc(self, amount: float = 1):
+        with self.lock:
+            self.value += amount
+
+
+class _GaugeChild:
+    def __init__(self):
+        self.value = 0.0
+        self.fn: Optional[Callable[[], float]] = None
+
+    def set(self, value: float):
+        self.value = value
+
+    def set_function(self, fn: Callable[[], float]):
+        """Evaluate `fn` at scrape time instead of tracking the value on the hot path."""
+        self.fn = fn
+
+    def get(self) -> float:
+        return self.fn() if self.fn else self.value
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), registry: "Registry" = None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+        (registry or REGISTRY).register(self)
+
+    def labels(self, *values):
+        """Returns the child for these label values (created once, then a dict lookup)."""
+        key = tuple(str(v) for v in values)
+        child = self._children.get(key)
+        if child is None:
+            if len(key) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}, got {key}")
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self._samples())
+        return "\n".join(lines)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS, registry: "Registry" = None):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames, registry)
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value: float):
+        self.labels().observe(value)
+
+    def time(self) -> _Timer:
+        return self.labels().time()
+
+    def _samples(self) -> List[str]:
+        lines = []
+        for key, child in list(self._children.items()):
+            with child.lock:
+                counts, total = list(child.counts), child.sum
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount: float = 1):
+        self.labels().inc(amount)
+
+    def _samples(self) -> List[str]:
+        return [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(child.value)}"
+            for key, child in list(self._children.items())
+        ]
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def _new_child(self):
+        return _GaugeChild()
+
+    def set(self, value: float):
+        self.labels().set(value)
+
+    def set_function(self, fn: Callable[[], float]):
+        self.labels().set_function(fn)
+
+    def _samples(self) -> List[str]:
+        return [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(child.get())}"
+            for key, child in list(self._children.items())
+        ]
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+
+    def register(self, metric: _Metric):
+        self._metrics.append(metric)
+
+    def render(self) -> str:
+        """Prometheus text exposition format (version 0.0.4)."""
+        return "\n".join(metric.render() for metric in self._metrics) + "\n"
+
+
+REGISTRY = Registry()
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# --- Hot-path metrics ---
+TASK_SECONDS = Histogram(
+    "task_duration_seconds", "Wall time of run_agent_task from start to completion.", ("persona", "status")
+)
+TASK_QUEUE_WAIT_SECONDS = Histogram(
+    "task_queue_wait_seconds", "Time a task spent queued before a worker picked it up.", ("lane",)
+)
+EXECUTE_TASK_SECONDS = Histogram(
+    "execute_task_duration_seconds", "Wall time of one agent execute_task call.", ("agent", "app")
+)
+LLM_SECONDS = Histogram(
+    "llm_request_duration_seconds", "Latency of direct LLM calls.", ("caller",)
+)
+LLM_REQUESTS = Counter(
+    "llm_requests_total", "Direct LLM calls by outcome (ok, error, quota).", ("caller", "outcome")
+)
+LLM_LIMITER_WAIT_SECONDS = Histogram(
+    "llm_rate_limit_wait_seconds", "Time LLM callers waited for the shared rate limiter."
+)
+ADB_ACTION_SECONDS = Histogram(
+    "adb_action_duration_seconds", "Latency of NeuroOrchestrator.execute_action_direct by action type.", ("action",)
+)
+WS_FANOUT_SECONDS = Histogram(
+    "ws_fanout_duration_seconds", "Time to encode an event and queue it for every subscriber.", ("type",),
+    buckets=(0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1)
+)
+PRICE_CACHE_LOOKUPS = Counter(
+    "price_cache_lookups_total", "Price cache lookups by app and outcome (hit, miss, stale).", ("app", "outcome")
+)
+COALESCED_CALLS = Counter(
+    "agent_calls_coalesced_total", "Agent calls that joined an identical in-flight run instead of starting one.", ("call",)
+)
+VISION_IMAGE_BYTES = Histogram(
+    "vision_image_bytes", "Encoded size of screenshots sent to the vision planner.",
+    buckets=(10000, 25000, 50000, 100000, 200000, 400000, 800000, 1600000)
+)
+VISION_IMAGE_TOKENS = Counter(
+    "vision_image_tokens_total", "Estimated image tokens sent to the vision planner."
+)
+QUEUE_DEPTH = Gauge("task_queue_depth", "Tasks waiting in the scheduler queue.")
+TASKS_RUNNING = Gauge("tasks_running", "Tasks currently running on a worker.")
+
+
+def is_quota_error(error: BaseException) -> bool:
+    text = str(error)
+    return "429" in text or "ResourceExhausted" in text or "quota" in text.lower()
+
+
+@contextmanager
+def track_llm_call(caller: str):
+    """Times a direct LLM call and counts it by outcome."""
+    start = time.perf_counter()
+    outcome = "ok"
+    try:
+        yield
+    except Exception as e:
+        outcome = "quota" if is_quota_error(e) else "error"
+        raise
+    finally:
+        LLM_SECONDS.labels(caller).observe(time.perf_counter() - start)
+        LLM_REQUESTS.labels(caller, outcome).inc()
+
+
+def timed_execute_task(agent: str):
+    """Decorator for `async execute_task(self, app_name, ...)`: observes latency per app."""
+    def decorator(fn):
+        @wraps(fn)
+        async def wrapper(self, app_name, *args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return await fn(self, app_name, *args, **kwargs)
+            finally:
+                EXECUTE_TASK_SECONDS.labels(agent, app_name).observe(time.perf_counter() - start)
+        return wrapper
+    return decorator
@@ -0,0 +1,147 @@
+import asyncio
+import itertools
+from collections import deque
+from typing import Deque, Dict, List, Optional, Sequence
+
+# Marks the end of one command's output: "<prefix> <id> <exit code>"
+SENTINEL = "__NEURO_DONE__"
+# Marks the start of one command's output: "<prefix> <id>"; anything before it (shell banners,
+# linker warnings on stderr) belongs to no command
+BEGIN = "__NEURO_BEGIN__"
+
+
+class AdbError(RuntimeError):
+    pass
+
+
+class AdbShell:
+    """
+    One long-lived `adb -s <serial> shell` per device. Commands are written to its stdin,
+    each wrapped in echoes of a begin marker and a sentinel carrying the command id and exit status, so
+    several commands can be in flight at once (pipelined) and their outputs are split
+    back apart by a single reader task. Restarts itself if the shell dies or a command
+    times out (the stream can't be trusted to be aligned after that).
+    """
+
+    def __init__(self, serial: str, timeout: float = 15.0):
+        self.serial = serial
+        self.timeout = timeout
+        self._proc: Optional[asyncio.subprocess.Process] = None
+        self._reader: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        # (id, future, output lines); lines is None until the command's begin marker is seen
+        self._pending: Deque[list] = deque()
+        self._ids = itertools.count(1)
+        self._lock = asyncio.Lock()
+
+    async def _ensure_started(self):
+        loop = asyncio.get_running_loop()
+        if self._proc is not None and self._proc.returncode is None and self._loop is loop:
+            return
+        await self.close()
+        self._loop = loop
+        self._proc = await asyncio.create_subprocess_exec(
+            "adb", "-s", self.serial, "shell",
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.STDOUT,
+        )
+        self._reader = asyncio.create_task(self._read_loop(self._proc))
+
+    async def _read_loop(self, proc: asyncio.subprocess.Process):
+        try:
+            while True:
+                raw = await proc.stdout.readline()
+                if not raw:
+                    break
+                line = raw.decode("utf-8", errors="replace").rstrip("\r\n")
+                if not self._pending:
+                    continue  # Shell banner/noise between commands
+                entry = self._pending[0]
+                cmd_id, future, lines = entry
+                if lines is None:
+                    if line.split() == [BEGIN, str(cmd_id)]:
+                        entry[2] = []
+                    continue  # Noise before the command started
+                # Output without a trailing newline ends up on the sentinel's line
+                at = line.find(SENTINEL)
+                parts = line[at:].split() if at >= 0 else []
+                if len(parts) == 3 and parts[1] == str(cmd_id):
+                    if line[:at]:
+                        lines.append(line[:at])
+                    self._pending.popleft()
+                    if not future.done():
+                        future.set_result((int(parts[2]), "\n".join(lines)))
+                    continue
+                lines.append(line)
+        finally:
+            # A reader left over from a replaced shell must not fail the new shell's commands
+            if self._proc is proc:
+                self._fail_pending(AdbError(f"adb shell for {self.serial} exited"))
+
+    def _fail_pending(self, error: Exception):
+        while self._pending:
+            _, future, _ = self._pending.popleft()
+            if not future.done():
+                future.set_exception(error)
+
+    async def run_many(self, commands: Sequence[str], check: bool = True) -> List[str]:
+        """Sends every command in one write and waits for all outputs (in order)."""
+        if not commands:
+            return []
+        if self._loop is not asyncio.get_running_loop():
+            self._lock = asyncio.Lock()  # Locks can't be shared across event loops
+        async with self._lock:
+            await self._ensure_started()
+            futures = []
+            payload = []
+            for command in commands:
+                cmd_id = next(self._ids)
+                future = asyncio.get_running_loop().create_future()
+                self._pending.append([cmd_id, future, None])
+                futures.append(future)
+                payload.append(f"echo {BEGIN} {cmd_id}; {command}; echo {SENTINEL} {cmd_id} $?\n")
+            self._proc.stdin.write("".join(payload).encode("utf-8"))
+            await self._proc.stdin.drain()
+
+        try:
+            results = await asyncio.wait_for(asyncio.gather(*futures), self.timeout)
+        except asyncio.TimeoutError:
+            print(f"[ADB] {self.serial}: no response within {self.timeout}s; restarting shell")
+            await self.close()
+            raise AdbError(f"adb shell timed out on {self.serial}: {commands[0]}")
+
+        outputs = []
+        for command, (code, output) in zip(commands, results):
+            if check and code != 0:
+                raise AdbError(f"`{command}` failed on {self.serial} (exit {code}): {output}")
+            outputs.append(output)
+        return outputs
+
+    async def run(self, command: str, check: bool = True) -> str:
+        return (await self.run_many([command], check=check))[0]
+
+    async def close(self):
+        proc, reader = self._proc, self._reader
+        self._proc = self._reader = None
+        if proc is not None and proc.returncode is None:
+            try:
+                proc.stdin.close()
+                proc.kill()
+                await proc.wait()
+            except (ProcessLookupError, RuntimeError):
+                pass
+        if reader is not None:
+            reader.cancel()
+        self._fail_pending(AdbError(f"adb shell for {self.serial} closed"))
+
+
+_sessions: Dict[str, AdbShell] = {}
+
+
+def get_session(serial: str) -> AdbShell:
+    """Process-wide shell per device, shared by every orchestrator that leases it."""
+    session = _sessions.get(serial)
+    if session is None:
+        session = _sessions[serial] = AdbShell(serial)
+    return session
@@ -0,0 +1,73 @@
+"""
+Screenshot latency: the old screencap-to-/sdcard + pull path vs. exec-out (PNG and raw).
+
+    python -m neurorun.bench_screencap [-s SERIAL] [-n 10]
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from PIL import Image
+
+from neurorun.screencap import capture
+
+
+def capture_pull(serial: str) -> Image.Image:
+    """What capture_state_image used to do: two adb processes and a file round trip."""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "cap.png")
+        subprocess.run(["adb", "-s", serial, "shell", "screencap", "-p", "/sdcard/neuro_cap.png"], check=True)
+        subprocess.run(["adb", "-s", serial, "pull", "/sdcard/neuro_cap.png", path],
+                       check=True, stdout=subprocess.DEVNULL)
+        image = Image.open(path)
+        image.load()
+        return image
+
+
+async def timed(fn, runs: int):
+    samples = []
+    size = None
+    for _ in range(runs):
+        start = time.perf_counter()
+        image = await fn()
+        samples.append((time.perf_counter() - start) * 1000)
+        size = image.size
+    return samples, size
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="NeuroRun screencap latency benchmark")
+    parser.add_argument("-s", "--serial", help="Device serial (default: first `adb devices` entry)")
+    parser.add_argument("-n", "--runs", type=int, default=10)
+    args = parser.parse_args()
+
+    serial = args.serial
+    if not serial:
+        lines = subprocess.run(["adb", "devices"], capture_output=True, text=True).stdout.splitlines()[1:]
+        devices = [line.split()[0] for line in lines if line.strip().endswith("device")]
+        if not devices:
+            sys.exit("No device attached")
+        serial = devices[0]
+
+    paths = {
+        "shell screencap + pull": lambda: asyncio.to_thread(capture_pull, serial),
+        "exec-out screencap -p": lambda: capture(serial, "png"),
+        "exec-out screencap (raw)": lambda: capture(serial, "raw"),
+    }
+    print(f"Device {serial}, {args.runs} runs each")
+    print(f"{'path':<28}{'size':>12}{'mean ms':>10}{'p50 ms':>10}{'max ms':>10}")
+    for name, fn in paths.items():
+        await fn()  # Warm-up: first adb call pays for the server connection
+        samples, size = await timed(fn, args.runs)
+        print(f"{name:<28}{f'{size[0]}x{size[1]}':>12}{statistics.mean(samples):>10.1f}"
+              f"{statistics.median(samples):>10.1f}{max(samples):>10.1f}")
+
+
+if __name__ == "__main__":
+    # Default loop on purpose: the Windows selector loop can't run subprocesses
+    asyncio.run(main())
@@ -0,0 +1,73 @@
+import os
+from collections import Counter
+from typing import Any, Dict, List, Optional, Tuple
+
+# Typed texts kept verbatim in the summary of compacted steps (they're what the planner most needs)
+SUMMARY_TEXTS = 3
+
+
+def describe(action: Dict[str, Any]) -> str:
+    """One short line per action instead of the raw dict."""
+    kind = action.get("type", "?")
+    if kind == "tap":
+        if action.get("target") is not None:
+            return f"tap {str(action['target'])[:40]!r}"
+        box = action.get("bq_box")
+        if box and len(box) == 4:
+            return f"tap@({round((box[1] + box[3]) / 2)},{round((box[0] + box[2]) / 2)})"
+        return "tap"
+    if kind == "type":
+        return f"type {str(action.get('text', ''))[:40]!r}"
+    if kind == "key":
+        return f"key {action.get('keycode', '')}"
+    return str(kind)
+
+
+def _tokens(text: str) -> int:
+    return len(text) // 4 + 1
+
+
+class MissionHistory:
+    """
+    Planner history for one mission, bounded to roughly `budget` prompt tokens
+    (NEURO_HISTORY_TOKENS). Recent steps are listed one per line; once they exceed the
+    budget the oldest are folded into a one-line summary (counts per action type plus the
+    last few typed texts), so the prompt stays the same size however long the mission runs.
+    """
+
+    def __init__(self, budget: Optional[int] = None):
+        self.budget = budget if budget is not None else int(os.getenv("NEURO_HISTORY_TOKENS", "300"))
+        self.reset()
+
+    def reset(self):
+        self.steps = 0
+        self._recent: List[Tuple[str, Dict[str, Any]]] = []  # (line, action)
+        self._compacted = 0
+        self._counts: Counter = Counter()
+        self._texts: List[str] = []
+
+    def __len__(self) -> int:
+        return self.steps
+
+    def add(self, action: Dict[str, Any], note: str = ""):
+        self.steps += 1
+        line = f"{self.steps}. {describe(action)}" + (f" ({note})" if note else "")
+        self._recent.append((line, action))
+        while len(self._recent) > 1 and _tokens(self.render()) > self.budget:
+            self._compact_oldest()
+
+    def _compact_oldest(self):
+        _, action = self._recent.pop(0)
+        self._compacted += 1
+        self._counts[action.get("type", "?")] += 1
+        if action.get("type") == "type" and action.get("text"):
+            self._texts = (self._texts + [repr(str(action["text"])[:40])])[-SUMMARY_TEXTS:]
+
+    def render(self) -> str:
+        lines = []
+        if self._compacted:
+            counts = ", ".join(f"{n} {kind}" for kind, n in self._counts.most_common())
+            texts = f"; typed {', '.join(self._texts)}" if self._texts else ""
+            lines.append(f"Earlier: steps 1-{self._compacted} ({counts}{texts})")
+        lines.extend(line for line, _ in self._recent)
+        return "\n".join(lines) if lines else "(none)"
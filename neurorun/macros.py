@@ -0,0 +1,177 @@
+import atexit
+import copy
+import json
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+# Screens further apart than this (dHash bits out of 64) count as a divergence
+DEFAULT_MAX_DISTANCE = 10
+
+
+def parameterize(action: Dict[str, Any], params: Dict[str, str]) -> Dict[str, Any]:
+    """Replaces concrete parameter values in typed text with '{name}' slots."""
+    action = copy.deepcopy(action)
+    text = action.get("text")
+    if isinstance(text, str):
+        # Longest values first so "pizza" doesn't clobber part of "pizza margherita"
+        for name, value in sorted(params.items(), key=lambda kv: -len(str(kv[1]))):
+            if value and str(value) in text:
+                text = text.replace(str(value), "{" + name + "}")
+        action["text"] = text
+    return action
+
+
+def fill_template(template: str, params: Dict[str, str]) -> str:
+    """Replaces '{name}' slots for the given params only; any other braces are left as-is."""
+    for name, value in params.items():
+        template = template.replace("{" + name + "}", str(value))
+    return template
+
+
+def fill(action: Dict[str, Any], params: Dict[str, str]) -> Dict[str, Any]:
+    """Inverse of `parameterize` for one replay."""
+    action = copy.deepcopy(action)
+    text = action.get("text")
+    if isinstance(text, str):
+        action["text"] = fill_template(text, params)
+    return action
+
+
+class Macro:
+    """A recorded action path for one (app, goal template): each step is the screen it was
+    taken on (dHash hex) plus the parameterized action."""
+
+    def __init__(self, app: str, template: str, steps: List[Dict[str, Any]], successes: int = 0,
+                 failures: int = 0, recorded_at: Optional[float] = None):
+        self.app = app
+        self.template = template
+        self.steps = steps
+        self.successes = successes
+        self.failures = failures
+        self.recorded_at = recorded_at or time.time()
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "app": self.app,
+            "template": self.template,
+            "steps": self.steps,
+            "successes": self.successes,
+            "failures": self.failures,
+            "recorded_at": self.recorded_at,
+        }
+
+
+class MacroStore:
+    """
+    Macros keyed by (app, goal template), kept in memory and persisted as JSON only when
+    NEURO_MACRO_PATH is set. Saves run on a timer thread `save_delay` seconds after the
+    first change, so the event loop never blocks on disk.
+    A macro that fails `max_failures` replays in a row is dropped and re-learned.
+    """
+
+    def __init__(self, path: Optional[str] = None, max_distance: Optional[int] = None, max_failures: int = 3,
+                 save_delay: float = 2.0):
+        self.path = path if path is not None else os.getenv("NEURO_MACRO_PATH")
+        self.max_distance = max_distance if max_distance is not None else int(os.getenv("NEURO_MACRO_MAX_DISTANCE", str(DEFAULT_MAX_DISTANCE)))
+        self.max_failures = max_failures
+        self.save_delay = save_delay
+        self._macros: Dict[Tuple[str, str], Macro] = {}
+        self._lock = threading.Lock()
+        self._save_timer: Optional[threading.Timer] = None
+        if self.path:
+            self._load()
+            atexit.register(self.flush)
+
+    @staticmethod
+    def _key(app: str, template: str) -> Tuple[str, str]:
+        return (app.strip().lower(), " ".join(template.split()))
+
+    def get(self, app: str, template: str) -> Optional[Macro]:
+        return self._macros.get(self._key(app, template))
+
+    def record(self, app: str, template: str, steps: List[Tuple[str, Dict[str, Any]]], params: Dict[str, str]):
+        """Stores the (signature, action) steps of a successful mission, replacing any older path."""
+        if not steps:
+            return
+        macro = Macro(app, template, [
+            {"signature": signature, "action": parameterize(action, params)} for signature, action in steps
+        ], successes=1)
+        with self._lock:
+            self._macros[self._key(app, template)] = macro
+        self._schedule_save()
+
+    def report_success(self, app: str, template: str):
+        macro = self.get(app, template)
+        if macro:
+            macro.successes += 1
+            macro.failures = 0
+            self._schedule_save()
+
+    def report_failure(self, app: str, template: str):
+        key = self._key(app, template)
+        macro = self._macros.get(key)
+        if macro is None:
+            return
+        macro.failures += 1
+        if macro.failures >= self.max_failures:
+            with self._lock:
+                self._macros.pop(key, None)
+            print(f"[Macro] Dropped macro for {app}: {template!r} after {macro.failures} failed replays")
+        self._schedule_save()
+
+    # --- Persistence ---
+    def _load(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                rows = json.load(f)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            print(f"[Macro] Ignoring unreadable macro file {self.path}: {e}")
+            return
+        for row in rows:
+            macro = Macro(**row)
+            self._macros[self._key(macro.app, macro.template)] = macro
+
+    def _schedule_save(self):
+        if not self.path:
+            return
+        with self._lock:
+            if self._save_timer is not None:
+                return  # The pending save will pick this change up
+            self._save_timer = threading.Timer(self.save_delay, self.flush)
+            self._save_timer.daemon = True
+            self._save_timer.start()
+
+    def flush(self):
+        """Writes pending changes now (also runs at interpreter exit)."""
+        with self._lock:
+            timer, self._save_timer = self._save_timer, None
+        if timer is None:
+            return
+        timer.cancel()
+        self._save()
+
+    def _save(self):
+        with self._lock:
+            rows = [macro.to_dict() for macro in self._macros.values()]
+        tmp = f"{self.path}.tmp"
+        try:
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(rows, f, indent=1)
+            os.replace(tmp, self.path)
+        except OSError as e:
+            print(f"[Macro] Could not save macros to {self.path}: {e}")
+
+
+_shared: Optional[MacroStore] = None
+
+
+def get_macro_store() -> MacroStore:
+    """Process-wide store so concurrent orchestrators share (and persist) one macro set."""
+    global _shared
+    if _shared is None:
+        _shared = MacroStore()
+    return _shared
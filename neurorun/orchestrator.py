@@ -1,9 +1,8 @@
 import os
-import time
 import asyncio
 import json
-import base64
-from typing import List, Dict, Any, Optional
+import shlex
+from typing import List, Dict, Optional
 
 import google.generativeai as genai
 from PIL import Image
@@ -12,13 +11,30 @@ try:
     from droidrun.agent.droid import DroidAgent
     from droidrun.tools import AdbTools
     from droidrun.adb import DeviceManager
-    from droidrun.agent.utils.llm_picker import load_llm
+    from llm_factory import DROID_RUN_REQUESTS, DROID_RUN_TOKENS, get_llm
 except ImportError:
     print("Critical: DroidRun SDK not found.")
     raise
 
+from metrics import ADB_ACTION_SECONDS, VISION_IMAGE_BYTES, VISION_IMAGE_TOKENS, is_quota_error, track_llm_call
+from rate_limiter import LIMITER, estimate_tokens
+from neurorun import screencap, ui_index
+from neurorun.adb_session import AdbShell, get_session
+from neurorun.history import MissionHistory
+from neurorun.macros import MacroStore, fill, fill_template, get_macro_store
+from neurorun.screen_signature import HASH_SIZE, dhash, from_hex, hamming, to_hex
+from neurorun.ui_settle import wait_until_idle
+from neurorun.vision_preprocess import VisionConfig, preprocess
+
+# Action types reported to metrics as-is; anything else the planner invents is bucketed as "other"
+KNOWN_ACTIONS = {"tap", "type", "key", "back", "home", "wait"}
+
+# Finer dHash (256 bits) for "did the last action do anything?"; small edits like typed text must register
+CHANGE_HASH_SIZE = 16
+
 class NeuroOrchestrator:
-    def __init__(self, api_key: str):
+    def __init__(self, api_key: str, device_serial: Optional[str] = None, macros: Optional[MacroStore] = None,
+                 vision: Optional[VisionConfig] = None):
         self.api_key = api_key
         if not api_key:
             raise ValueError("API Key required for NeuroOrchestrator")
@@ -27,30 +43,44 @@ class NeuroOrchestrator:
         genai.configure(api_key=self.api_key)
         self.planner_model = genai.GenerativeModel('gemini-2.0-flash-exp') # Use flash for speed, or pro for reasoning
         
-        self.device_serial = None
+        self.device_serial = device_serial # Leased device; None = first attached
         self.tools = None
+        self.adb: Optional[AdbShell] = None  # Persistent shell on the device, set by connect()
         self.width = 1080 
         self.height = 2400
         self.step_limit = 15
-        self.history: List[Dict] = []
+        self.history = MissionHistory()  # Reset at the start of every run_mission
+        self.macros = macros or get_macro_store()
+        self.vision = vision or VisionConfig()
+        self.last_image_stats: Dict[str, int] = {}
+        # Unchanged-frame check: frames within this many bits count as the same screen
+        self.unchanged_distance = int(os.getenv("NEURO_UNCHANGED_MAX_DISTANCE", "2"))
+        self.unchanged_retries = int(os.getenv("NEURO_UNCHANGED_RETRIES", "3"))
+        self.unchanged_poll = float(os.getenv("NEURO_UNCHANGED_POLL_SECONDS", "1.0"))
+        # Longest action sequence the planner may return per screenshot (1 = single-action plans)
+        self.max_sequence = max(1, int(os.getenv("NEURO_MAX_SEQUENCE", "4")))
+        # Plan from the accessibility tree first; screenshots are only uploaded as a fallback
+        self.use_ui_index = os.getenv("NEURO_UI_INDEX", "1") == "1"
+        self.ui_index_min_elements = int(os.getenv("NEURO_UI_INDEX_MIN_ELEMENTS", "3"))
+        self.ui_index_max_elements = int(os.getenv("NEURO_UI_INDEX_MAX_ELEMENTS", "80"))
 
     async def connect(self):
         """Connect to device and initialize tools"""
         try:
-            dm = DeviceManager()
-            devices = await dm.list_devices()
-            if not devices:
-                print("NeuroOrchestrator: No device found.")
-                return False
-            self.device_serial = devices[0].serial
+            if not self.device_serial:
+                dm = DeviceManager()
+                devices = await dm.list_devices()
+                if not devices:
+                    print("NeuroOrchestrator: No device found.")
+                    return False
+                self.device_serial = devices[0].serial
             print(f"NeuroOrchestrator: Connected to {self.device_serial}")
             self.tools = AdbTools(serial=self.device_serial)
+            self.adb = get_session(self.device_serial)
             
             # Get Resolution
             try:
-                # Direct ADB call to get size
-                stream = os.popen(f"adb -s {self.device_serial} shell wm size")
-                out = stream.read().strip() # e.g., Physical size: 1080x2400
+                out = (await self.adb.run("wm size")).strip() # e.g., Physical size: 1080x2400
                 if "size:" in out:
                     res = out.split("size:")[1].strip().split("x")
                     self.width = int(res[0])
@@ -69,30 +99,37 @@ class NeuroOrchestrator:
 
     async def capture_state_image(self) -> Optional[Image.Image]:
         try:
-            path = f"neuro_state_{int(time.time())}.png"
-            os.system(f"adb -s {self.device_serial} shell screencap -p /sdcard/neuro_cap.png")
-            os.system(f"adb -s {self.device_serial} pull /sdcard/neuro_cap.png {path}")
-            
-            if os.path.exists(path):
-                img = Image.open(path)
-                return img
-            return None
+            # Streamed over exec-out and decoded in memory; nothing touches /sdcard or the disk
+            return await screencap.capture(self.device_serial)
         except Exception as e:
             print(f"Screenshot failed: {e}")
             return None
 
-    def plan_next_step(self, main_goal: str, current_image: Image.Image, step_count: int) -> Dict:
+    async def plan_next_step(self, main_goal: str, current_image: Image.Image, step_count: int,
+                             note: str = "") -> Dict:
         """
         Uses Vision to output exact COORDINATES or TEXT args.
+        The model sees a cropped screenshot; the returned bq_box is always on the full-screen
+        0-1000 scale.
         """
+        # Resize/encode is CPU work; keep it off the event loop so other missions keep running
+        prepared = await asyncio.to_thread(preprocess, current_image, self.vision)
+        self.last_image_stats = prepared.stats()
+        VISION_IMAGE_BYTES.observe(len(prepared.data))
+        VISION_IMAGE_TOKENS.inc(prepared.tokens)
+        print(f"[Vision] {prepared.size[0]}x{prepared.size[1]} {prepared.mime_type}: "
+              f"{len(prepared.data) // 1024} KB, ~{prepared.tokens} image tokens")
+
         prompt = f"""
         You are an advanced Android Automation Brain.
         Main Goal: {main_goal}
         Step: {step_count}/{self.step_limit}
-        History: {[h['action'] for h in self.history]}
+        History:
+        {self.history.render()}
+        {note}
 
         Analyze the screenshot. The device resolution is implied 1000x1000 relative for coordinates.
-        Identify the NEXT single action.
+        Identify the NEXT single action.{self._sequence_rules()}
         - If the keyboard is open and blocking the view, use "back" to close it ONLY if you are NOT currently typing/searching.
         - If you are searching, DO NOT use "back" as it might exit the search. Instead, proceed to tap the result IF VISIBLE.
         - If the desired item (like 'Fries' image) is ALREADY visible, prefer 'tap' over 'type'.
@@ -111,47 +148,170 @@ class NeuroOrchestrator:
         }}
         """
         
+        def to_device(plan: Dict) -> Dict:
+            for action in [plan.get("action") or {}] + list(plan.get("actions") or []):
+                if action.get("bq_box"):
+                    # The model saw a cropped image; taps land on the full screen
+                    action["bq_box"] = prepared.to_device_box(action["bq_box"])
+            return plan
+
+        plan = await self._request_plan([prompt, prepared.part], estimate_tokens(prompt) + prepared.tokens,
+                                        "planner", to_device)
+        return plan or {"status": "failed", "analysis": "Failed after retries", "action": {"type": "wait"}}
+
+    async def plan_from_ui_tree(self, main_goal: str, step_count: int, note: str = "") -> Optional[Dict]:
+        """
+        Text-only planning over the uiautomator element list: no screenshot is uploaded and
+        targets are resolved to bq_box locally. Returns None when there's no usable tree
+        (dump failed, empty/canvas UI), or a plan with "needs_vision" set when the model
+        couldn't decide from the list or a target didn't match any element.
+        """
+        try:
+            index = await ui_index.dump(self.device_serial)
+        except Exception as e:
+            print(f"[UI] Hierarchy dump failed ({e}); using vision")
+            return None
+        if len(index) < self.ui_index_min_elements:
+            return None
+
+        prompt = f"""
+        You are an advanced Android Automation Brain.
+        Main Goal: {main_goal}
+        Step: {step_count}/{self.step_limit}
+        History:
+        {self.history.render()}
+        {note}
+
+        The current screen's UI elements ([number] label (class, clickable)):
+        {index.describe(self.ui_index_max_elements)}
+
+        Identify the NEXT single action from this element list alone.{self._sequence_rules()}
+        - Refer to elements by "target": the element number or its exact label, instead of coordinates.
+        - If the keyboard is open and blocking the view, use "back" to close it ONLY if you are NOT currently typing/searching.
+        - If you can't tell what to do without seeing the screen (images, unlabeled icons, canvas), set "needs_vision": true.
+
+        Output valid JSON only:
+        {{
+            "analysis": "Thinking process...",
+            "status": "continue" | "done" | "failed",
+            "needs_vision": false,
+            "action": {{
+                "type": "tap" | "type" | "key" | "wait" | "back" | "home" | "done",
+                "target": 12 | "label" - REQUIRED for 'tap', OPTIONAL for 'type' (to tap first),
+                "text": "..." (REQUIRED for 'type'),
+                "keycode": "..." (OPTIONAL for 'key'),
+                "data": {{...}} (REQUIRED if status='done', extracted info)
+            }}
+        }}
+        """
+
+        def resolve(plan: Dict) -> Dict:
+            for action in [plan.get("action") or {}] + list(plan.get("actions") or []):
+                target = action.get("target")
+                if target is None or action.get("bq_box"):
+                    continue
+                element = index.find(target)
+                if element is None:
+                    print(f"[UI] No element matches {target!r}; using vision")
+                    plan["needs_vision"] = True
+                    break
+                action["bq_box"] = element.bq_box(self.width, self.height)
+                action["target"] = element.label  # Element numbers mean nothing on the next screen
+            return plan
+
+        plan = await self._request_plan([prompt], estimate_tokens(prompt), "planner_text", resolve)
+        return plan or {"needs_vision": True}
+
+    async def _request_plan(self, parts: List, tokens: int, caller: str, fix=None) -> Optional[Dict]:
+        """One planner round trip: shared limiter, metrics, quota retries, JSON parsing.
+        `fix` post-processes the parsed plan (coordinate mapping); None after repeated failure."""
         max_retries = 3
         for attempt in range(max_retries):
             try:
-                # Add delay to respect rate limits
-                if attempt > 0:
-                    time.sleep(2) 
-                
-                response = self.planner_model.generate_content([prompt, current_image])
+                # Shared limiter paces every Gemini caller (and backs off on 429s)
+                async with LIMITER.limit(tokens=tokens, key=self.device_serial):
+                    with track_llm_call(caller):
+                        response = await self.planner_model.generate_content_async(parts)
                 text = response.text.strip()
                 if "```json" in text:
                     text = text.split("```json")[1].split("```")[0]
                 elif "```" in text:
                     text = text.split("```")[1].split("```")[0]
-                return json.loads(text)
+                plan = json.loads(text)
+                return fix(plan) if fix else plan
             except Exception as e:
                 print(f"Planning Error (Attempt {attempt+1}): {e}")
-                if "429" in str(e) or "ResourceExhausted" in str(e) or "quota" in str(e).lower():
-                    wait_time = (attempt + 1) * 5
-                    print(f"Quota hit. Waiting {wait_time}s...")
-                    time.sleep(wait_time)
+                if is_quota_error(e):
+                    # The limiter has already paused; the next acquire waits out the backoff
+                    print("Quota hit. Retrying after limiter backoff...")
                 else:
                     break
-        
-        return {"status": "failed", "analysis": "Failed after retries", "action": {"type": "wait"}}
+        return None
+
+    def _sequence_rules(self) -> str:
+        if self.max_sequence <= 1:
+            return ""
+        return f"""
+        - If the next few actions need no new look at the screen (e.g. tap the search box, type the query),
+          you MAY instead return them in order as "actions": [{{...}}, ...] (at most {self.max_sequence}, same fields as "action").
+          Add "checkpoint": true to an action whose result you must see before deciding anything further.
+          Add "expect_change": true to an action that only makes sense once the screen has changed
+          (e.g. a result list appeared); the sequence stops there if it hasn't."""
+
+    async def execute_action_sequence(self, actions: List[Dict], frame: Optional[int] = None) -> List[Dict]:
+        """
+        Runs a planner action sequence back to back without replanning. Stops after an action
+        marked "checkpoint", or before one marked "expect_change" if the screen still matches
+        `frame` (fine hash of the screen the plan was made on). Returns the actions executed.
+        """
+        executed = []
+        for action in actions[:self.max_sequence]:
+            if executed and action.get("expect_change") and frame is not None:
+                if not await self._screen_changed(frame):
+                    print("[Sequence] Expected screen change didn't happen; replanning")
+                    break
+            await self.execute_action_direct(action)
+            executed.append(action)
+            if action.get("checkpoint"):
+                break
+        return executed
+
+    @staticmethod
+    async def _frame_hash(img: Image.Image, size: int = CHANGE_HASH_SIZE) -> int:
+        return await asyncio.to_thread(dhash, img, size)
+
+    async def _screen_changed(self, frame: int) -> bool:
+        for attempt in range(self.unchanged_retries + 1):
+            img = await self.capture_state_image()
+            if img and hamming(await self._frame_hash(img), frame) > self.unchanged_distance:
+                return True
+            if attempt < self.unchanged_retries:
+                await asyncio.sleep(self.unchanged_poll)
+        return False
 
     async def execute_action_direct(self, action: Dict):
         """
         Executes action directly via ADB.
         """
+        tipo = action.get('type')
+        with ADB_ACTION_SECONDS.labels(tipo if tipo in KNOWN_ACTIONS else "other").time():
+            return await self._execute_action(action)
+
+    def _tap_command(self, box: List[float]) -> str:
+        # box is [ymin, xmin, ymax, xmax] 0-1000
+        ymin, xmin, ymax, xmax = box
+        cx = (xmin + xmax) / 2 / 1000 * self.width
+        cy = (ymin + ymax) / 2 / 1000 * self.height
+        return f"input tap {int(cx)} {int(cy)}"
+
+    async def _execute_action(self, action: Dict):
         tipo = action.get('type')
         print(f"  [Act] Executing: {tipo} | {action}")
         
         if tipo == 'tap':
             box = action.get('bq_box')
             if box:
-                # box is [ymin, xmin, ymax, xmax] 0-1000
-                ymin, xmin, ymax, xmax = box
-                cx = (xmin + xmax) / 2 / 1000 * self.width
-                cy = (ymin + ymax) / 2 / 1000 * self.height
-                cmd = f"adb -s {self.device_serial} shell input tap {int(cx)} {int(cy)}"
-                os.system(cmd)
+                await self.adb.run(self._tap_command(box))
                 return "Tapped"
                 
         elif tipo == 'type':
@@ -160,28 +320,32 @@ class NeuroOrchestrator:
             # Standard input text is most compatible with standard keyboards
             # We escape spaces
             clean_text = text.replace(" ", "%s")
-            os.system(f"adb -s {self.device_serial} shell input text {clean_text}")
+            commands = [f"input text {shlex.quote(clean_text)}"]
+            if action.get('bq_box'):
+                # Focus the field first; both events go out in one round trip
+                commands.insert(0, self._tap_command(action['bq_box']))
+            await self.adb.run_many(commands)
             
-            # Hit Enter to search
-            time.sleep(1.5)
-            os.system(f"adb -s {self.device_serial} shell input keyevent 66")
+            # Hit Enter to search once the IME has caught up
+            await wait_until_idle(self.device_serial, timeout=1.5)
+            await self.adb.run("input keyevent 66")
             return f"Typed {text}"
             
         elif tipo == 'key':
             code = action.get('keycode', '')
-            os.system(f"adb -s {self.device_serial} shell input keyevent {code}")
+            await self.adb.run(f"input keyevent {shlex.quote(str(code))}")
             return f"Key {code}"
             
         elif tipo == 'back':
-            os.system(f"adb -s {self.device_serial} shell input keyevent 4")
+            await self.adb.run("input keyevent 4")
             return "Back (Close Keyboard/Nav)"
             
         elif tipo == 'home':
-            os.system(f"adb -s {self.device_serial} shell input keyevent 3")
+            await self.adb.run("input keyevent 3")
             return "Home"
             
         elif tipo == 'wait':
-            time.sleep(2)
+            await wait_until_idle(self.device_serial, timeout=2)
             return "Waited"
             
         return "Unknown Action"
@@ -192,12 +356,8 @@ class NeuroOrchestrator:
         """
         print(f"  [Executor] Running: {instruction}")
         
-        # Load LLM for the agent (Executor)
-        llm = load_llm(
-            provider_name="GoogleGenAI", 
-            model="models/gemini-2.0-flash", 
-            api_key=self.api_key
-        )
+        # Load LLM for the agent (Executor); cached process-wide
+        llm = get_llm("gemini", "models/gemini-2.0-flash", self.api_key)
         
         # We use a short max_steps because this is a sub-task
         agent = DroidAgent(
@@ -209,41 +369,146 @@ class NeuroOrchestrator:
             vision=False 
         )
         
-        handler = agent.run()
-        if hasattr(handler, "stream_events"):
-            async for event in handler.stream_events():
-                pass
-        result = await handler
+        # Same shared Gemini budget as the agents' DroidAgent runs (llm_factory.run_droid_agent)
+        async with LIMITER.limit(tokens=DROID_RUN_TOKENS, key=self.device_serial, requests=DROID_RUN_REQUESTS):
+            handler = agent.run()
+            if hasattr(handler, "stream_events"):
+                async for event in handler.stream_events():
+                    pass
+            result = await handler
         return result
 
-    async def run_mission(self, goal: str):
+    async def run_mission(self, goal: str, app: Optional[str] = None, params: Optional[Dict[str, str]] = None):
+        """
+        `goal` may be a template ("Search for {query} on Zomato") filled from `params`.
+        With `app` set, a successful run is recorded as a macro for (app, template); later
+        runs replay it step by step, checking the screen signature before each action, and
+        only fall back to the planner once the screen diverges from the recording.
+        The planner may return several actions per screenshot (see execute_action_sequence).
+        Each step is planned from the UI element list when possible (plan_from_ui_tree) and
+        only uploads the screenshot when that falls back to vision.
+        A step whose screen is unchanged since the last action is re-polled locally before
+        the planner is asked again. stale_frames_skipped counts the steps where that let the
+        planner see the new screen instead of the stale one; unchanged_polls counts every
+        re-poll. There is no such check after a 'wait' action or while a macro is replaying
+        (its steps are checked by signature).
+        """
+        params = params or {}
+        template = goal
+        goal = fill_template(template, params)
         print(f"NeuroOrchestrator Mission (Direct Mode): {goal}")
         if not await self.connect():
             return {"status": "failed", "error": "Connection Failed"}
+        self.history.reset()
+
+        macro = self.macros.get(app, template) if app else None
+        replay = list(macro.steps) if macro else []
+        performed = []  # (screen signature, action) of every executed step, for recording
+        stats = {"replayed_steps": 0, "planner_calls": 0, "text_planner_calls": 0, "vision_fallbacks": 0,
+                 "stale_frames_skipped": 0, "unchanged_polls": 0, "chained_actions": 0,
+                 "macro": "none" if macro is None else "replayed", "image_bytes": 0, "image_tokens": 0}
+        last_frame = None  # Fine hash of the screen the previous action was taken on
+        last_type = None  # Type of the previous action; an unchanged screen is expected after 'wait'
 
         for i in range(1, self.step_limit + 1):
             print(f"\n--- Step {i}/{self.step_limit} ---")
             
             img = await self.capture_state_image()
             if not img:
-                return {"status": "failed", "error": "Vision Lost"}
+                return {"status": "failed", "error": "Vision Lost", "stats": stats}
+            frame = await self._frame_hash(img)
+
+            # Screen still identical to the one we last acted on: the action hasn't landed (or the
+            # app is loading). Poll locally instead of paying for a planner call on the same frame.
+            check = last_frame is not None and last_type != "wait" and not replay
+            retries = 0
+            while (check and hamming(frame, last_frame) <= self.unchanged_distance
+                   and retries < self.unchanged_retries):
+                retries += 1
+                stats["unchanged_polls"] += 1
+                print(f"[Vision] Screen unchanged; waiting {self.unchanged_poll}s ({retries}/{self.unchanged_retries})")
+                await asyncio.sleep(self.unchanged_poll)
+                img = await self.capture_state_image()
+                if not img:
+                    return {"status": "failed", "error": "Vision Lost", "stats": stats}
+                frame = await self._frame_hash(img)
+            unchanged = check and hamming(frame, last_frame) <= self.unchanged_distance
+            if retries and not unchanged:
+                stats["stale_frames_skipped"] += 1  # The screen moved on before we asked the planner
+            last_frame = frame
+            signature = await self._frame_hash(img, size=HASH_SIZE)
+
+            # Macro replay: act without the planner while the screen matches the recording
+            if replay:
+                step = replay.pop(0)
+                distance = hamming(signature, from_hex(step["signature"])) if step["signature"] else 0
+                if distance <= self.macros.max_distance:
+                    action = fill(step["action"], params)
+                    print(f"[Macro] Replaying step {stats['replayed_steps'] + 1}/{len(macro.steps)} (distance {distance})")
+                    await self.execute_action_direct(action)
+                    performed.append((to_hex(signature), action))
+                    self.history.add(action, note="replayed")
+                    stats["replayed_steps"] += 1
+                    # Recorded sequence members (no signature of their own) follow without a check
+                    while replay and replay[0]["signature"] is None:
+                        action = fill(replay.pop(0)["action"], params)
+                        await self.execute_action_direct(action)
+                        performed.append((None, action))
+                        self.history.add(action, note="replayed")
+                        stats["replayed_steps"] += 1
+                    last_type = action.get("type")
+                    await wait_until_idle(self.device_serial, timeout=2)  # Stabilize UI
+                    continue
+                print(f"[Macro] Screen diverged (distance {distance}); handing back to the planner")
+                replay = []
+                stats["macro"] = "diverged"
                 
-            plan = self.plan_next_step(goal, img, i)
+            note = "NOTE: The previous action had no visible effect; try something different." if unchanged else ""
+            plan = await self.plan_from_ui_tree(goal, i, note=note) if self.use_ui_index else None
+            if plan is not None:
+                stats["planner_calls"] += 1
+                stats["text_planner_calls"] += 1
+            if plan is None or plan.get("needs_vision"):
+                if plan is not None:
+                    stats["vision_fallbacks"] += 1
+                plan = await self.plan_next_step(goal, img, i, note=note)
+                stats["planner_calls"] += 1
+                stats["image_bytes"] += self.last_image_stats.get("bytes", 0)
+                stats["image_tokens"] += self.last_image_stats.get("tokens", 0)
             print(f"Brain: {plan.get('analysis', '...')}")
             
-            action = plan.get('action', {})
+            actions = plan.get('actions') or [plan.get('action', {})]
+            action = actions[0]
             status = plan.get('status', 'continue')
             
             if status == 'done':
                 print("Mission Success!")
-                return {"status": "success", "data": action.get("data", {})}
+                if app:
+                    if stats["macro"] == "replayed" and len(performed) == stats["replayed_steps"]:
+                        self.macros.report_success(app, template)
+                    else:
+                        # New or repaired path: the recording replaces the old macro
+                        self.macros.record(app, template, performed, params)
+                return {"status": "success", "data": action.get("data") or plan.get("data", {}), "stats": stats}
             if status == 'failed':
-                return {"status": "failed", "error": plan.get("analysis")}
+                if macro:
+                    self.macros.report_failure(app, template)
+                return {"status": "failed", "error": plan.get("analysis"), "stats": stats}
             
             # Act Direct
-            await self.execute_action_direct(action)
-            
-            self.history.append({"action": action})
-            time.sleep(2) # Stabilize UI
+            if len(actions) > 1:
+                executed = await self.execute_action_sequence(actions, frame)
+                stats["chained_actions"] += len(executed) - 1
+            else:
+                await self.execute_action_direct(action)
+                executed = [action]
+            # Only the first action of a sequence was taken on the screen we hashed
+            for n, done in enumerate(executed):
+                performed.append((to_hex(signature) if n == 0 else None, done))
+                self.history.add(done)
+            last_type = executed[-1].get("type") if executed else None
+            await wait_until_idle(self.device_serial, timeout=2)  # Stabilize UI
 
-        return {"status": "timeout", "error": "Limit reached"}
+        if macro:
+            self.macros.report_failure(app, template)
+        return {"status": "timeout", "error": "Limit reached", "stats": stats}
@@ -0,0 +1,33 @@
+from PIL import Image
+
+# dHash over a (size+1) x size grayscale thumbnail -> size*size bit signature
+HASH_SIZE = 8
+
+
+def dhash(image: Image.Image, size: int = HASH_SIZE) -> int:
+    """
+    Difference hash: 1 bit per adjacent-pixel brightness comparison on a tiny grayscale
+    thumbnail. Robust to compression noise and small content changes (prices, a clock),
+    sensitive to layout changes (a different screen or an open dialog).
+    """
+    thumb = image.convert("L").resize((size + 1, size), Image.BILINEAR)
+    pixels = thumb.tobytes()
+    bits = 0
+    for row in range(size):
+        offset = row * (size + 1)
+        for col in range(size):
+            bits = (bits << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+    return bits
+
+
+def hamming(a: int, b: int) -> int:
+    """Number of differing bits between two signatures."""
+    return bin(a ^ b).count("1")
+
+
+def to_hex(signature: int) -> str:
+    return f"{signature:016x}"
+
+
+def from_hex(text: str) -> int:
+    return int(text, 16)
@@ -0,0 +1,78 @@
+import asyncio
+import io
+import os
+import struct
+from typing import Optional
+
+from PIL import Image
+
+from neurorun.adb_session import AdbError
+
+# screencap -> raw pixel format (android PixelFormat / AHardwareBuffer values)
+RAW_MODES = {
+    1: ("RGBA", "RGBA"),  # RGBA_8888
+    2: ("RGBX", "RGBX"),  # RGBX_8888: converted to RGB after decoding
+    5: ("RGBA", "BGRA"),  # BGRA_8888
+}
+
+
+class ScreencapError(AdbError):
+    pass
+
+
+async def exec_out(serial: Optional[str], *args: str, timeout: float = 10.0) -> bytes:
+    """`adb exec-out <args>`: binary-safe stdout, no pty translation, nothing written to /sdcard.
+    serial=None targets the only attached device."""
+    target = ["-s", serial] if serial else []
+    proc = await asyncio.create_subprocess_exec(
+        "adb", *target, "exec-out", *args,
+        stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE,
+    )
+    try:
+        out, err = await asyncio.wait_for(proc.communicate(), timeout)
+    except asyncio.TimeoutError:
+        proc.kill()
+        await proc.wait()
+        raise ScreencapError(f"adb exec-out {' '.join(args)} timed out on {serial}")
+    if proc.returncode != 0:
+        raise ScreencapError(f"adb exec-out {' '.join(args)} failed on {serial}: {err.decode(errors='replace').strip()}")
+    return out
+
+
+def decode_raw(data: bytes) -> Image.Image:
+    """
+    Decodes `screencap` raw output: a little-endian header of width, height, format
+    (+ colorspace since Android 9, so 12 or 16 bytes) followed by width*height*4 pixel bytes.
+    The image wraps the buffer directly instead of copying it, except for RGBX, which is
+    converted to RGB (a copy) so callers never see the padding channel.
+    """
+    if len(data) < 12:
+        raise ScreencapError(f"screencap returned {len(data)} bytes")
+    width, height, pixel_format = struct.unpack_from("<III", data, 0)
+    header = len(data) - width * height * 4
+    if header not in (12, 16):
+        raise ScreencapError(f"Unexpected screencap size {len(data)} for {width}x{height}")
+    if pixel_format not in RAW_MODES:
+        raise ScreencapError(f"Unsupported screencap pixel format {pixel_format}")
+    mode, raw_mode = RAW_MODES[pixel_format]
+    image = Image.frombuffer(mode, (width, height), memoryview(data)[header:], "raw", raw_mode, 0, 1)
+    return image.convert("RGB") if mode == "RGBX" else image
+
+
+def _decode_png(data: bytes) -> Image.Image:
+    image = Image.open(io.BytesIO(data))
+    image.load()
+    return image
+
+
+async def capture(serial: Optional[str], image_format: Optional[str] = None, timeout: float = 10.0) -> Image.Image:
+    """
+    Screenshot straight into memory (NEURO_SCREENCAP_FORMAT): "raw" skips the device-side
+    PNG encode (~9 MB over USB for 1080x2400), "png" moves fewer bytes but costs an encode
+    and a decode; which wins depends on the link, see bench_screencap.
+    """
+    image_format = (image_format or os.getenv("NEURO_SCREENCAP_FORMAT", "raw")).lower()
+    if image_format == "png":
+        data = await exec_out(serial, "screencap", "-p", timeout=timeout)
+        return await asyncio.to_thread(_decode_png, data)
+    return decode_raw(await exec_out(serial, "screencap", timeout=timeout))
@@ -0,0 +1,123 @@
+import re
+import xml.etree.ElementTree as ET
+from typing import Dict, List, Optional
+
+from neurorun import screencap
+
+_BOUNDS = re.compile(r"\[(-?\d+),(-?\d+)\]\[(-?\d+),(-?\d+)\]")
+
+
+def _norm(text: str) -> str:
+    return " ".join(re.sub(r"[^0-9a-z]+", " ", text.lower()).split())
+
+
+class UiElement:
+    """One labelled node of the UI hierarchy. `bounds` are device pixels (left, top, right,
+    bottom) of the node itself, or of its nearest clickable ancestor if it isn't clickable."""
+
+    def __init__(self, index: int, text: str, resource_id: str, content_desc: str, class_name: str,
+                 bounds: tuple, clickable: bool):
+        self.index = index
+        self.text = text
+        self.resource_id = resource_id
+        self.content_desc = content_desc
+        self.class_name = class_name
+        self.bounds = bounds
+        self.clickable = clickable
+
+    @property
+    def labels(self) -> List[str]:
+        """Normalized names this element answers to; resource ids by their last segment."""
+        names = [self.text, self.content_desc]
+        if self.resource_id:
+            names.append(self.resource_id.split("/")[-1].replace("_", " "))
+        return [n for n in (_norm(name) for name in names) if n]
+
+    @property
+    def label(self) -> str:
+        return self.text or self.content_desc or self.resource_id.split("/")[-1]
+
+    def bq_box(self, width: int, height: int) -> List[int]:
+        """[ymin, xmin, ymax, xmax] on the 0-1000 scale the executor expects."""
+        left, top, right, bottom = self.bounds
+        return [round(top / height * 1000), round(left / width * 1000),
+                round(bottom / height * 1000), round(right / width * 1000)]
+
+    def describe(self) -> str:
+        label = self.label
+        kind = self.class_name.split(".")[-1]
+        extra = f" id={self.resource_id.split('/')[-1]}" if self.resource_id and label != self.resource_id.split("/")[-1] else ""
+        return f"[{self.index}] {label[:60]!r} ({kind}{', clickable' if self.clickable else ''}{extra})"
+
+
+class UiIndex:
+    """
+    In-memory index of a uiautomator dump: text, resource-id and content-desc -> bounds.
+    `find` resolves planner targets like "Search", "Add to Cart" or an element number
+    without a screenshot; `describe` renders the element list for a text-only planner.
+    """
+
+    def __init__(self, elements: List[UiElement]):
+        self.elements = elements
+        self._by_label: Dict[str, List[UiElement]] = {}
+        for element in elements:
+            for label in element.labels:
+                self._by_label.setdefault(label, []).append(element)
+
+    @classmethod
+    def from_xml(cls, xml: str) -> "UiIndex":
+        root = ET.fromstring(xml)
+        elements: List[UiElement] = []
+
+        def walk(node, clickable_bounds):
+            match = _BOUNDS.match(node.get("bounds", ""))
+            bounds = tuple(int(v) for v in match.groups()) if match else None
+            clickable = node.get("clickable") == "true"
+            if clickable and bounds:
+                clickable_bounds = bounds
+            text, desc, rid = node.get("text", ""), node.get("content-desc", ""), node.get("resource-id", "")
+            if bounds and bounds[2] > bounds[0] and bounds[3] > bounds[1] and (text or desc or rid):
+                elements.append(UiElement(len(elements), text, rid, desc, node.get("class", ""),
+                                          clickable_bounds or bounds, clickable_bounds is not None))
+            for child in node:
+                walk(child, clickable_bounds)
+
+        walk(root, None)
+        return cls(elements)
+
+    def __len__(self) -> int:
+        return len(self.elements)
+
+    def find(self, target) -> Optional[UiElement]:
+        """Exact label > label starting with the target > label containing it; clickable
+        elements win ties, then the topmost. An int (or "#12") picks by element number."""
+        if isinstance(target, int) or (isinstance(target, str) and re.fullmatch(r"#?\d+", target.strip())):
+            number = int(str(target).strip().lstrip("#"))
+            return self.elements[number] if 0 <= number < len(self.elements) else None
+        wanted = _norm(str(target or ""))
+        if not wanted:
+            return None
+        candidates = self._by_label.get(wanted)
+        if not candidates:
+            candidates = [e for e in self.elements if any(label.startswith(wanted) for label in e.labels)]
+        if not candidates:
+            candidates = [e for e in self.elements if any(wanted in label for label in e.labels)]
+        if not candidates:
+            return None
+        return min(candidates, key=lambda e: (not e.clickable, e.bounds[1], e.index))
+
+    def describe(self, limit: int = 80) -> str:
+        lines = [element.describe() for element in self.elements[:limit]]
+        if len(self.elements) > limit:
+            lines.append(f"... {len(self.elements) - limit} more")
+        return "\n".join(lines)
+
+
+async def dump(serial: Optional[str], timeout: float = 10.0) -> UiIndex:
+    """uiautomator dump streamed over exec-out (no file on the device)."""
+    raw = await screencap.exec_out(serial, "uiautomator", "dump", "/dev/tty", timeout=timeout)
+    text = raw.decode("utf-8", errors="replace")
+    start, end = text.find("<?xml"), text.rfind("</hierarchy>")
+    if start < 0 or end < 0:
+        raise ValueError(f"No UI hierarchy in uiautomator output: {text[:120]!r}")
+    return UiIndex.from_xml(text[start:end + len("</hierarchy>")])
@@ -0,0 +1,56 @@
+import asyncio
+import os
+import time
+from typing import Optional
+
+from neurorun import screencap
+from neurorun.screen_signature import dhash, hamming
+
+# Finer than the macro signature so a spinner or a list filling in still counts as movement
+SETTLE_HASH_SIZE = 16
+
+
+async def wait_until_idle(serial: Optional[str], timeout: Optional[float] = None,
+                          stable_frames: int = 2, poll: Optional[float] = None,
+                          max_distance: Optional[int] = None, min_wait: Optional[float] = None) -> bool:
+    """
+    Returns once the screen has stopped changing: `stable_frames` consecutive screenshots
+    within `max_distance` bits of each other (UI_SETTLE_*). Replaces fixed cooldown sleeps,
+    so flows move on as soon as the device is ready rather than after the worst case.
+
+    Returns False if the UI was still moving at `timeout`, or as soon as a screenshot fails
+    or can't finish before it; callers carry on either way, as they did after a fixed sleep.
+    """
+    timeout = timeout if timeout is not None else float(os.getenv("UI_SETTLE_TIMEOUT", "5"))
+    poll = poll if poll is not None else float(os.getenv("UI_SETTLE_POLL_SECONDS", "0.2"))
+    max_distance = max_distance if max_distance is not None else int(os.getenv("UI_SETTLE_MAX_DISTANCE", "2"))
+    # Give the last input a moment to start its transition before the first frame is taken
+    min_wait = min_wait if min_wait is not None else float(os.getenv("UI_SETTLE_MIN_WAIT", "0.3"))
+
+    deadline = time.monotonic() + timeout
+    await asyncio.sleep(min(min_wait, timeout))
+
+    previous = None
+    stable = 1
+    while True:
+        try:
+            # A slow capture must not carry the wait past the deadline
+            image = await screencap.capture(serial, timeout=max(0.1, deadline - time.monotonic()))
+            frame = await asyncio.to_thread(dhash, image, SETTLE_HASH_SIZE)
+        except Exception as e:
+            # Don't add a fixed wait on top of a failed (possibly slow) capture
+            print(f"[Settle] Screen check failed ({e}); carrying on")
+            return False
+
+        if previous is not None and hamming(frame, previous) <= max_distance:
+            stable += 1
+            if stable >= stable_frames:
+                return True
+        else:
+            stable = 1
+        previous = frame
+
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return False
+        await asyncio.sleep(min(poll, remaining))
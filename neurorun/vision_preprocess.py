@@ -0,0 +1,98 @@
+import io
+import math
+import os
+from typing import List, Optional, Sequence, Tuple
+
+from PIL import Image
+
+# Gemini bills images in 768x768 tiles of 258 tokens; anything within 384x384 is a single 258
+TILE_SIZE = 768
+TOKENS_PER_TILE = 258
+SMALL_IMAGE_SIDE = 384
+
+MIME_TYPES = {"jpeg": "image/jpeg", "webp": "image/webp", "png": "image/png"}
+
+
+def estimate_image_tokens(width: int, height: int) -> int:
+    if width <= SMALL_IMAGE_SIDE and height <= SMALL_IMAGE_SIDE:
+        return TOKENS_PER_TILE
+    return math.ceil(width / TILE_SIZE) * math.ceil(height / TILE_SIZE) * TOKENS_PER_TILE
+
+
+class VisionConfig:
+    """
+    How screenshots are shrunk before the planner sees them (env NEURO_VISION_*).
+    Crops are fractions of the screen height; max_side bounds the longer edge in pixels.
+    """
+
+    def __init__(self, max_side: Optional[int] = None, image_format: Optional[str] = None,
+                 quality: Optional[int] = None, grayscale: Optional[bool] = None,
+                 crop_top: Optional[float] = None, crop_bottom: Optional[float] = None):
+        self.max_side = max_side if max_side is not None else int(os.getenv("NEURO_VISION_MAX_SIDE", "1024"))
+        self.image_format = (image_format or os.getenv("NEURO_VISION_FORMAT", "jpeg")).lower()
+        if self.image_format not in MIME_TYPES:
+            raise ValueError(f"Unsupported NEURO_VISION_FORMAT: {self.image_format}")
+        self.quality = quality if quality is not None else int(os.getenv("NEURO_VISION_QUALITY", "80"))
+        self.grayscale = grayscale if grayscale is not None else os.getenv("NEURO_VISION_GRAYSCALE", "0") == "1"
+        # Status bar (~3% of a 20:9 phone) and gesture/nav bar (~4%) carry nothing to act on
+        self.crop_top = crop_top if crop_top is not None else float(os.getenv("NEURO_VISION_CROP_TOP", "0.03"))
+        self.crop_bottom = crop_bottom if crop_bottom is not None else float(os.getenv("NEURO_VISION_CROP_BOTTOM", "0.04"))
+
+
+class PreparedImage:
+    """The encoded image sent to the planner plus what's needed to map its coordinates back."""
+
+    def __init__(self, data: bytes, mime_type: str, size: Tuple[int, int], crop: Tuple[int, int, int, int],
+                 device_size: Tuple[int, int]):
+        self.data = data
+        self.mime_type = mime_type
+        self.size = size                # (width, height) actually sent
+        self.crop = crop                # (left, top, right, bottom) in device pixels
+        self.device_size = device_size  # (width, height) of the original screenshot
+        self.tokens = estimate_image_tokens(*size)
+
+    @property
+    def part(self) -> dict:
+        """Inline blob accepted by GenerativeModel.generate_content."""
+        return {"mime_type": self.mime_type, "data": self.data}
+
+    def to_device_box(self, box: Sequence[float]) -> List[int]:
+        """[ymin, xmin, ymax, xmax] on the sent image's 0-1000 scale -> same on the full screen."""
+        left, top, right, bottom = self.crop
+        width, height = self.device_size
+        ymin, xmin, ymax, xmax = box
+
+        def y(v):
+            return round((top + v / 1000 * (bottom - top)) / height * 1000)
+
+        def x(v):
+            return round((left + v / 1000 * (right - left)) / width * 1000)
+
+        return [y(ymin), x(xmin), y(ymax), x(xmax)]
+
+    def stats(self) -> dict:
+        return {"width": self.size[0], "height": self.size[1], "bytes": len(self.data), "tokens": self.tokens}
+
+
+def preprocess(image: Image.Image, config: VisionConfig) -> PreparedImage:
+    """Crop the status/nav bars, downscale, optionally grayscale, then encode."""
+    width, height = image.size
+    left, top, right, bottom = 0, int(height * config.crop_top), width, height - int(height * config.crop_bottom)
+    if right <= left or bottom <= top:
+        left, top, right, bottom = 0, 0, width, height
+
+    crop = (left, top, right, bottom)
+    out = image.crop(crop) if crop != (0, 0, width, height) else image
+
+    scale = config.max_side / max(out.size)
+    if scale < 1:
+        out = out.resize((max(1, round(out.width * scale)), max(1, round(out.height * scale))), Image.BILINEAR)
+
+    out = out.convert("L") if config.grayscale else out.convert("RGB")
+
+    buffer = io.BytesIO()
+    if config.image_format == "png":
+        out.save(buffer, format="PNG", optimize=False)
+    else:
+        out.save(buffer, format=config.image_format.upper(), quality=config.quality)
+    return PreparedImage(buffer.getvalue(), MIME_TYPES[config.image_format], out.size, crop, (width, height))
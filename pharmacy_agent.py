@@ -8,9 +8,7 @@ from dotenv import load_dotenv
 
 # --- DroidRun Professional Architecture Imports ---
 try:
-    from droidrun.agent.droid import DroidAgent
-    from droidrun.agent.utils.llm_picker import load_llm
-    from droidrun.config_manager import DroidrunConfig, AgentConfig, ManagerConfig, ExecutorConfig, TelemetryConfig
+    from llm_factory import create_droid_agent, run_droid_agent
 except ImportError:
     print("CRITICAL ERROR: 'droidrun' library not found or incompatible version.")
     print("Please ensure you have installed it: pip install droidrun")
@@ -18,15 +16,21 @@ except ImportError:
 
 load_dotenv()
 
+from metrics import timed_execute_task
+from neurorun.ui_settle import wait_until_idle
+from result_cache import PRICE_CACHE
+from single_flight import coalesce_identical
+
 class PharmacyAgent:
     """
     Agent to compare medicine prices across PharmEasy, Apollo 24|7, and Tata 1mg.
     Follows the Professional Architecture.
     """
     
-    def __init__(self, provider="gemini", model="models/gemini-2.5-flash"):
+    def __init__(self, provider="gemini", model="models/gemini-2.5-flash", device_serial=None):
         self.provider = provider
         self.model = model
+        self.device_serial = device_serial
         self._ensure_api_keys()
 
     def _ensure_api_keys(self):
@@ -42,8 +46,17 @@ class PharmacyAgent:
         except:
             return float('inf')
 
+    @timed_execute_task("pharmacy")
+    @coalesce_identical(("app_name", "medicine", "role"))
     async def execute_task(self, app_name: str, medicine: str, role: str) -> dict:
         print(f"\n[PharmaAgent] Initializing Task for: {app_name} - {medicine} ({role} mode)")
+
+        # Same shared price cache as the marketplace searches (per-app TTLs in result_cache.py)
+        cache_key = PRICE_CACHE.key(app_name, medicine, role)
+        cached = PRICE_CACHE.get(cache_key)
+        if cached is not None:
+            print(f"[PharmaAgent] ⚡ Cache hit for '{medicine}' on {app_name} ({cached['cache_age']}s old)")
+            return cached
         
         # Mode-specific instructions
         if role == "pharmacist":
@@ -68,40 +81,14 @@ class PharmacyAgent:
             f"Ensure strict JSON format."
         )
 
-        # --- Professional Config Setup ---
-        api_key = os.getenv("GEMINI_API_KEY") or os.getenv("GOOGLE_API_KEY")
-        provider_name = "GoogleGenAI" if self.provider == "gemini" else self.provider
-
-        llm = load_llm(
-            provider_name=provider_name,
-            model=self.model,
-            api_key=api_key
-        )
-
-        manager_config = ManagerConfig(vision=True)
-        executor_config = ExecutorConfig(vision=True)
-        agent_config = AgentConfig(
-            reasoning=True,
-            manager=manager_config,
-            executor=executor_config
-        )
-        telemetry_config = TelemetryConfig(enabled=False)
-        config = DroidrunConfig(
-            agent=agent_config,
-            telemetry=telemetry_config
-        )
-
-        agent = DroidAgent(
-            goal=goal,
-            llms=llm,
-            config=config
-        )
+        # --- Professional Config Setup (shared LLM client + config, see llm_factory.py) ---
+        agent = create_droid_agent(goal, provider=self.provider, model=self.model, device_serial=self.device_serial)
 
         result_data = {"app": app_name, "medicine": medicine, "status": "failed", "data": {}, "numeric_price": float('inf')}
 
         try:
             print(f"[PharmaAgent] 🧠 Running Agent on {app_name} for {medicine}...")
-            result = await agent.run()
+            result = await run_droid_agent(agent, key=self.device_serial)
             
             # --- Robust Output Parsing ---
             if result:
@@ -129,6 +116,8 @@ class PharmacyAgent:
                         result_data["data"] = data
                         result_data["status"] = "success"
                         result_data["numeric_price"] = self._parse_price(data.get("price"))
+                        if result_data["numeric_price"] != float('inf'):
+                            PRICE_CACHE.put(cache_key, result_data)
                     except json.JSONDecodeError:
                         print(f"[Warn] JSON Decode Error: {clean_json}")
                 else:
@@ -198,8 +187,8 @@ class PharmacyAgent:
                     all_found = False
                     break # Stop if one item not found, basket incomplete
                 
-                # Small cooldown between searches
-                await asyncio.sleep(2)
+                # Let the app settle between searches
+                await wait_until_idle(self.device_serial, timeout=2)
 
             if all_found:
                 app_totals[app] = {"total_cost": total_cost, "items": item_details}
@@ -207,8 +196,8 @@ class PharmacyAgent:
                 app_totals[app] = {"status": "incomplete"}
                 print(f"  > Basket incomplete for {app}")
             
-            # Cooldown betwen apps
-            await asyncio.sleep(3)
+            # Settle before switching apps
+            await wait_until_idle(self.device_serial, timeout=3)
 
         print(f"\n--- Final Aggregated Basket Results ---")
         best_option = None
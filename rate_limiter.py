@@ -0,0 +1,153 @@
+import asyncio
+import logging
+import os
+import re
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from typing import Deque, Hashable, Optional, Tuple
+
+from metrics import LLM_LIMITER_WAIT_SECONDS, is_quota_error
+
+logger = logging.getLogger("RateLimiter")
+
+# Gemini bills an image as 258 tokens per 768x768 tile; a phone screenshot is ~8 tiles
+SCREENSHOT_TOKENS = 8 * 258
+# Expected response size added to every estimate
+RESPONSE_TOKENS = 500
+
+
+def estimate_tokens(text: str = "", images: int = 0) -> int:
+    """Rough prompt+response token count (~4 chars per token) used to charge the TPM bucket."""
+    return len(text) // 4 + images * SCREENSHOT_TOKENS + RESPONSE_TOKENS
+
+
+def retry_after(error: Optional[BaseException]) -> Optional[float]:
+    """Server-suggested delay from a quota error ("Please retry in 37.2s" / "retry_delay { seconds: 37 }")."""
+    if error is None:
+        return None
+    match = re.search(r"retry(?: in|_delay\s*\{\s*seconds:)\s*(\d+(?:\.\d+)?)", str(error))
+    return float(match.group(1)) if match else None
+
+
+class _Bucket:
+    """Token bucket refilled continuously at `per_minute / 60` per second."""
+
+    def __init__(self, per_minute: float, burst_seconds: float):
+        self.rate = per_minute / 60
+        self.capacity = max(1.0, self.rate * burst_seconds)
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def refill(self, now: float, scale: float):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate * scale)
+        self.updated = now
+
+    def wait_time(self, amount: float, scale: float) -> float:
+        amount = min(amount, self.capacity)
+        return 0.0 if self.level >= amount else (amount - self.level) / (self.rate * scale)
+
+    def take(self, amount: float):
+        self.level -= min(amount, self.capacity)
+
+
+class RateLimiter:
+    """
+    Process-wide async limiter for requests/minute and tokens/minute.
+
+    Callers wait in per-key FIFO queues (key = device serial or task id) that are served
+    round-robin, so one chatty task can't starve the others. Quota errors pause the
+    limiter (honouring the server's retry hint) and halve the effective rate; successes
+    recover it gradually (AIMD), so concurrent tasks slow down together instead of failing.
+    """
+
+    def __init__(self, rpm: Optional[float] = None, tpm: Optional[float] = None, burst_seconds: float = 10,
+                 max_backoff: float = 60):
+        self.rpm = rpm if rpm is not None else float(os.getenv("GEMINI_RPM", "60"))
+        self.tpm = tpm if tpm is not None else float(os.getenv("GEMINI_TPM", "1000000"))
+        self.max_backoff = max_backoff
+        self._requests = _Bucket(self.rpm, burst_seconds) if self.rpm > 0 else None
+        self._tokens = _Bucket(self.tpm, burst_seconds) if self.tpm > 0 else None
+
+        self.scale = 1.0  # Fraction of the configured rate currently allowed
+        self.backoff = 0.0
+        self._paused_until = 0.0
+
+        self._queues: "OrderedDict[Hashable, Deque[Tuple[asyncio.Future, int, int]]]" = OrderedDict()
+        self._dispatcher: Optional[asyncio.Task] = None
+
+    @property
+    def enabled(self) -> bool:
+        return self._requests is not None or self._tokens is not None
+
+    async def acquire(self, tokens: int = 0, key: Hashable = None, requests: int = 1):
+        """Waits until `requests` calls totalling ~`tokens` tokens fit in the budget."""
+        if not self.enabled:
+            return
+        start = time.monotonic()
+        future = asyncio.get_running_loop().create_future()
+        self._queues.setdefault(key, deque()).append((future, tokens, requests))
+        if self._dispatcher is None or self._dispatcher.done():
+            self._dispatcher = asyncio.create_task(self._dispatch())
+        await future
+        LLM_LIMITER_WAIT_SECONDS.observe(time.monotonic() - start)
+
+    async def _dispatch(self):
+        while self._queues:
+            key, queue = next(iter(self._queues.items()))
+            future, tokens, requests = queue[0]
+            if future.done():  # Waiter was cancelled
+                self._pop(key, queue)
+                continue
+
+            now = time.monotonic()
+            wait = self._paused_until - now
+            for bucket, amount in ((self._requests, requests), (self._tokens, tokens)):
+                if bucket:
+                    bucket.refill(now, self.scale)
+                    wait = max(wait, bucket.wait_time(amount, self.scale))
+            if wait > 0:
+                await asyncio.sleep(wait)
+                continue
+
+            for bucket, amount in ((self._requests, requests), (self._tokens, tokens)):
+                if bucket:
+                    bucket.take(amount)
+            future.set_result(None)
+            self._pop(key, queue)
+
+    def _pop(self, key: Hashable, queue: Deque):
+        queue.popleft()
+        if queue:
+            # Round-robin: this key goes to the back of the line
+            self._queues.move_to_end(key)
+        else:
+            del self._queues[key]
+
+    def report_quota_error(self, error: Optional[BaseException] = None):
+        self.backoff = min(self.max_backoff, max(1.0, self.backoff * 2))
+        delay = max(retry_after(error) or 0.0, self.backoff)
+        self._paused_until = max(self._paused_until, time.monotonic() + delay)
+        self.scale = max(0.1, self.scale / 2)
+        logger.warning(f"LLM quota hit; pausing {delay:.1f}s, rate now {self.scale:.0%} of limit")
+
+    def report_success(self):
+        self.backoff /= 2
+        self.scale = min(1.0, self.scale + 0.1)
+
+    @asynccontextmanager
+    async def limit(self, tokens: int = 0, key: Hashable = None, requests: int = 1):
+        """`async with LIMITER.limit(...)`: waits for budget, then feeds the outcome back."""
+        await self.acquire(tokens, key, requests)
+        try:
+            yield
+        except Exception as e:
+            if is_quota_error(e):
+                self.report_quota_error(e)
+            raise
+        else:
+            self.report_success()
+
+
+# Shared by every Gemini path (DroidAgent runs, the NeuroOrchestrator planner, itineraries)
+LIMITER = RateLimiter()
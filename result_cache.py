@@ -0,0 +1,158 @@
+import atexit
+import copy
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from metrics import PRICE_CACHE_LOOKUPS
+
+logger = logging.getLogger("ResultCache")
+
+# Seconds a price stays fresh per app; food delivery prices and availability move faster
+DEFAULT_APP_TTLS = {
+    "zomato": 300,
+    "swiggy": 300,
+    "amazon": 1800,
+    "flipkart": 1800,
+    "pharmeasy": 1800,
+    "tata 1mg": 1800,
+    "apollo 24|7": 1800,
+}
+
+CacheKey = Tuple[str, str, str]
+
+
+def normalize_query(query: str) -> str:
+    return " ".join(str(query or "").lower().split())
+
+
+class ResultCache:
+    """
+    LRU cache of successful agent search results with per-app TTLs.
+
+    Keys are (app, normalized query, item_type). Values are stored as JSON-able dicts and
+    handed out as deep copies, so callers can annotate results freely. With `path` set
+    (PRICE_CACHE_PATH) entries are saved to a JSON file and reloaded on start. Saves run on
+    a timer thread `save_delay` seconds after the first change, so a burst of puts costs
+    one write and the event loop never blocks on disk.
+    """
+
+    def __init__(self, max_entries: Optional[int] = None, default_ttl: Optional[float] = None,
+                 path: Optional[str] = None, save_delay: float = 2.0):
+        self.max_entries = max_entries if max_entries is not None else int(os.getenv("PRICE_CACHE_MAX_ENTRIES", "500"))
+        self.default_ttl = default_ttl if default_ttl is not None else float(os.getenv("PRICE_CACHE_TTL", "600"))
+        self.path = path if path is not None else os.getenv("PRICE_CACHE_PATH")
+
+        # key -> (stored_at wall-clock, value), least recently used first
+        self._entries: "OrderedDict[CacheKey, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.save_delay = save_delay
+        self._save_timer: Optional[threading.Timer] = None
+        if self.path:
+            self._load()
+            atexit.register(self.flush)
+
+    @staticmethod
+    def key(app: str, query: str, item_type: str = "") -> CacheKey:
+        return (app.strip().lower(), normalize_query(query), normalize_query(item_type))
+
+    def ttl_for(self, app: str) -> float:
+        """PRICE_CACHE_TTL_<APP> overrides the built-in per-app TTL."""
+        app = app.strip().lower()
+        default = DEFAULT_APP_TTLS.get(app, self.default_ttl)
+        env_name = "PRICE_CACHE_TTL_" + "".join(c if c.isalnum() else "_" for c in app.upper())
+        return float(os.getenv(env_name, default))
+
+    def get(self, key: CacheKey, max_age: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """
+        Fresh entry for `key`, or None. `max_age` (seconds) tightens or loosens the app's
+        TTL for this lookup; max_age=0 always misses.
+        """
+        limit = self.ttl_for(key[0]) if max_age is None else max_age
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                PRICE_CACHE_LOOKUPS.labels(key[0], "miss").inc()
+                return None
+            age = time.time() - entry[0]
+            if age > limit:
+                PRICE_CACHE_LOOKUPS.labels(key[0], "stale").inc()
+                return None
+            self._entries.move_to_end(key)
+            value = copy.deepcopy(entry[1])
+        PRICE_CACHE_LOOKUPS.labels(key[0], "hit").inc()
+        value["cached"] = True
+        value["cache_age"] = round(age, 1)
+        return value
+
+    def put(self, key: CacheKey, value: Dict[str, Any]):
+        with self._lock:
+            self._entries[key] = (time.time(), copy.deepcopy(value))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        if self.path:
+            self._schedule_save()
+
+    def invalidate(self, app: Optional[str] = None):
+        with self._lock:
+            if app is None:
+                self._entries.clear()
+            else:
+                for key in [k for k in self._entries if k[0] == app.strip().lower()]:
+                    del self._entries[key]
+        if self.path:
+            self._schedule_save()
+
+    # --- Persistence ---
+    def _load(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                rows = json.load(f)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable price cache {self.path}: {e}")
+            return
+        now = time.time()
+        for app, query, item_type, stored_at, value in rows:
+            key = (app, query, item_type)
+            if now - stored_at <= self.ttl_for(app):
+                self._entries[key] = (stored_at, value)
+        logger.info(f"Loaded {len(self._entries)} cached prices from {self.path}")
+
+    def _schedule_save(self):
+        with self._lock:
+            if self._save_timer is not None:
+                return  # The pending save will pick this change up
+            self._save_timer = threading.Timer(self.save_delay, self.flush)
+            self._save_timer.daemon = True
+            self._save_timer.start()
+
+    def flush(self):
+        """Writes pending changes now (also runs at interpreter exit)."""
+        with self._lock:
+            timer, self._save_timer = self._save_timer, None
+        if timer is None:
+            return
+        timer.cancel()
+        self._save()
+
+    def _save(self):
+        with self._lock:
+            rows = [[*key, stored_at, value] for key, (stored_at, value) in self._entries.items()]
+        tmp = f"{self.path}.tmp"
+        try:
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(rows, f, default=str)
+            os.replace(tmp, self.path)
+        except OSError as e:
+            logger.warning(f"Could not persist price cache to {self.path}: {e}")
+
+
+# Shared by every agent in the process
+PRICE_CACHE = ResultCache()
@@ -8,9 +8,7 @@ from dotenv import load_dotenv
 
 # --- DroidRun Professional Architecture Imports ---
 try:
-    from droidrun.agent.droid import DroidAgent
-    from droidrun.agent.utils.llm_picker import load_llm
-    from droidrun.config_manager import DroidrunConfig, AgentConfig, ManagerConfig, ExecutorConfig, TelemetryConfig
+    from llm_factory import create_droid_agent, run_droid_agent
 except ImportError:
     print("CRITICAL ERROR: 'droidrun' library not found or incompatible version.")
     print("Please ensure you have installed it: pip install droidrun")
@@ -19,15 +17,20 @@ except ImportError:
 # Load environment variables
 load_dotenv()
 
+from metrics import timed_execute_task
+from neurorun.ui_settle import wait_until_idle
+from single_flight import coalesce_identical
+
 class RideComparisonAgent:
     """
     Agent to compare ride prices between Uber and Ola using DroidRun.
     Follows the Professional Architecture.
     """
     
-    def __init__(self, provider="gemini", model="gemini-1.5-flash"):
+    def __init__(self, provider="gemini", model="gemini-1.5-flash", device_serial=None):
         self.provider = provider
         self.model = model
+        self.device_serial = device_serial
         self._ensure_api_keys()
 
     def _ensure_api_keys(self):
@@ -44,6 +47,8 @@ class RideComparisonAgent:
         except:
             return float('inf')
 
+    @timed_execute_task("ride")
+    @coalesce_identical(("app_name", "pickup", "drop", "preference"), when={"action": "compare"})
     async def execute_task(self, app_name: str, pickup: str, drop: str, preference: str = "cab", action: str = "compare") -> dict:
         """
         Executes a ride check task on a specific app.
@@ -92,45 +97,14 @@ class RideComparisonAgent:
                 f"Ensure strict JSON format."
             )
 
-        # --- Professional Config Setup ---
-        api_key = os.getenv("GEMINI_API_KEY") or os.getenv("GOOGLE_API_KEY")
-        
-        # Determine Provider Name for LLM Picker
-        provider_name = "GoogleGenAI" if self.provider == "gemini" else self.provider
-
-        llm = load_llm(
-            provider_name=provider_name,
-            model=self.model,
-            api_key=api_key
-        )
-
-        manager_config = ManagerConfig(vision=True)
-        executor_config = ExecutorConfig(vision=True)
-        
-        agent_config = AgentConfig(
-            reasoning=True,
-            manager=manager_config,
-            executor=executor_config
-        )
-        
-        telemetry_config = TelemetryConfig(enabled=False)
-        
-        config = DroidrunConfig(
-            agent=agent_config,
-            telemetry=telemetry_config
-        )
-
-        agent = DroidAgent(
-            goal=goal,
-            llms=llm,
-            config=config
-        )
+        # --- Professional Config Setup (shared LLM client + config, see llm_factory.py) ---
+        agent = create_droid_agent(goal, provider=self.provider, model=self.model, device_serial=self.device_serial)
 
         result_data = {"app": app_name, "status": "failed", "data": {}, "numeric_price": float('inf')}
 
         try:
             print(f"[RideAgent] 🧠 Running Agent on {app_name}...")
-            result = await agent.run()
+            result = await run_droid_agent(agent, key=self.device_serial)
             
             # --- Robust Output Parsing ---
             if result:
@@ -179,8 +153,8 @@ class RideComparisonAgent:
         for app in apps:
             res = await self.execute_task(app, pickup, drop, preference, action="compare")
             results[app] = res
-            # Cooldown to allow app switching/closing
-            await asyncio.sleep(3)
+            # Wait for app switching/closing to finish
+            await wait_until_idle(self.device_serial, timeout=3)
 
         # Comparison Logic
         print("\n--- Final Aggregated Results ---")
@@ -1,19 +1,31 @@
 import asyncio
-import json
 import logging
+import os
+import time
 import uuid
 from datetime import datetime
-from typing import Dict, Any, List, Optional
+from typing import Any, Optional
 
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect
+from fastapi import FastAPI, HTTPException, Query, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import Response
 from pydantic import BaseModel
 
+# Server infrastructure
+from connection_manager import ConnectionManager
+from device_pool import DevicePool
+from metrics import CONTENT_TYPE, QUEUE_DEPTH, REGISTRY, TASK_SECONDS, TASKS_RUNNING
+from neurorun.ui_settle import wait_until_idle
+from task_db import TaskDatabase
+from task_scheduler import QueueFullError, TaskScheduler, deadline_for, lane_for
+from task_store import ACTIVE_STATUSES, TaskStore
+
 # Import Agents
 from commerce_agent import CommerceAgent
 from ride_comparison_agent import RideComparisonAgent
 from pharmacy_agent import PharmacyAgent
 from event_coordinator_agent import EventCoordinatorAgent
+from neurorun.orchestrator import NeuroOrchestrator
 
 # Voyager-1 Imports
 from agents.transit_agent import TransitManager
@@ -38,67 +50,31 @@ app.add_middleware(
 
 # --- InMemory Task Store ---
 # Structure: { task_id: { "id": str, "persona": str, "status": str, "logs": list, "result": Any, "timestamp": str } }
-task_history: List[Dict[str, Any]] = []
-
-def add_task_record(task_id: str, persona: str, payload: Any):
-    record = {
-        "id": task_id,
-        "persona": persona,
-        "status": "running",
-        "created_at": datetime.now().isoformat(),
-        "logs": [],
-        "result": None,
-        "payload": payload.dict()
-    }
-    task_history.insert(0, record) # Newest first
-    return record
+# Indexed by id and bounded (TASK_STORE_MAX_TASKS / TASK_STORE_MAX_BYTES); see task_store.py
+# Set TASK_DB_PATH to also persist history to SQLite (task_db.py)
+TASK_DB_PATH = os.getenv("TASK_DB_PATH")
+task_db = TaskDatabase(TASK_DB_PATH) if TASK_DB_PATH else None
+task_store = TaskStore(backend=task_db)
+
+def add_task_record(task_id: str, persona: str, payload: Any, status: str = "running"):
+    return task_store.add(task_id, persona, payload, status)
 
 def update_task_status(task_id: str, status: str, result: Any = None):
-    for task in task_history:
-        if task["id"] == task_id:
-            task["status"] = status
-            if result:
-                task["result"] = result
-            break
+    task_store.update_status(task_id, status, result)
 
 def append_task_log(task_id: str, message: str):
-    for task in task_history:
-        if task["id"] == task_id:
-            timestamp = datetime.now().strftime("%H:%M:%S")
-            log_entry = f"[{timestamp}] {message}"
-            task["logs"].append(log_entry)
-            break
-
-# WebSocket Manager
-class ConnectionManager:
-    def __init__(self):
-        self.active_connections: list[WebSocket] = []
-
-    async def connect(self, websocket: WebSocket):
-        await websocket.accept()
-        self.active_connections.append(websocket)
-
-    def disconnect(self, websocket: WebSocket):
-        self.active_connections.remove(websocket)
-
-    async def broadcast(self, message: str):
-        # Legacy support if needed, but we prefer structured
-        for connection in self.active_connections:
-            try:
-                await connection.send_text(message)
-            except:
-                pass
-
-    async def broadcast_json(self, data: Dict[str, Any]):
-        message = json.dumps(data, default=str)
-        for connection in self.active_connections:
-            try:
-                await connection.send_text(message)
-            except:
-                pass
+    task_store.append_log(task_id, message)
 
+# WebSocket Manager (per-client send queues; see connection_manager.py)
 manager = ConnectionManager()
 
+def _track_event(event: dict):
+    # Remember which event last touched each task so /tasks?since=<seq> can serve deltas
+    if event.get("task_id"):
+        task_store.mark_updated(event["task_id"], event["seq"])
+
+manager.on_publish = _track_event
+
 # Data Models
 class TaskPayload(BaseModel):
     persona: str
@@ -121,48 +97,148 @@ class TaskPayload(BaseModel):
     destination: str = None
     date: str = None
     user_interests: str = None
+
+    # For Neuro (any app, driven by NeuroOrchestrator): goal may hold {name} slots filled from params
+    goal: str = None
+    app: str = None
+    params: dict = None
     
+@app.on_event("startup")
+async def startup():
+    # One agent per phone: workers follow the device pool unless pinned explicitly
+    await device_pool.start()
+    pinned = int(os.getenv("MAX_CONCURRENT_TASKS", "0"))
+    await scheduler.start(pinned or len(device_pool))
+    if not pinned:
+        device_pool.on_resize = scheduler.scale_to
+
+    if task_db:
+        await task_db.start()
+        # Only warm the in-memory store with recent summaries; details load lazily
+        recent, max_pos = await task_db.load_recent(
+            int(os.getenv("TASK_DB_WARM_TASKS", "50")), interrupted_statuses=ACTIVE_STATUSES
+        )
+        task_store.restore(recent, max_pos)
+        logger.info(f"Restored {len(recent)} recent tasks from {TASK_DB_PATH}")
+
+@app.on_event("shutdown")
+async def shutdown():
+    await scheduler.stop()
+    await device_pool.stop()
+    if task_db:
+        await task_db.stop()
+
 @app.get("/")
 async def root():
     return {"status": "DroidRun Server Running"}
 
+@app.get("/metrics")
+async def get_metrics():
+    """Prometheus text format: task/agent/LLM/ADB latency histograms, queue depth, WS fan-out."""
+    return Response(REGISTRY.render(), media_type=CONTENT_TYPE)
+
+@app.get("/devices")
+async def get_devices():
+    return device_pool.snapshot()
+
 @app.get("/tasks")
-async def get_tasks():
-    return task_history
+async def get_tasks(
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = None,
+    persona: Optional[str] = None,
+    status: Optional[str] = None,
+    created_after: Optional[datetime] = None,
+    created_before: Optional[datetime] = None,
+    view: str = "summary",
+    since: Optional[int] = None,
+    boot_id: Optional[str] = None
+):
+    """
+    Newest-first, cursor-paginated task list.
+    The default 'summary' view leaves out logs and result; use /tasks/{task_id} for full details.
+    Every response carries the current event `seq` and the server's `boot_id`; pass both back
+    as `since`/`boot_id` to get only the tasks changed after it (the filters and `limit`
+    still apply). A `since` the server can't answer (another boot, or more changes
+    than `limit`) falls back to a normal first page with "resync": true.
+    """
+    if view not in ("summary", "full"):
+        raise HTTPException(status_code=400, detail="view must be 'summary' or 'full'")
+    seq = manager.seq
+    filters = dict(
+        persona=persona,
+        status=status,
+        created_after=created_after.isoformat() if created_after else None,
+        created_before=created_before.isoformat() if created_before else None,
+    )
+    if since is not None and since <= seq and boot_id in (None, manager.boot_id):
+        changed = task_store.changed_since(since, view, limit=limit, **filters)
+        if changed is not None:
+            return {"tasks": changed, "next_cursor": None, "seq": seq, "boot_id": manager.boot_id}
+    query = dict(limit=limit, cursor=cursor, view=view, **filters)
+    try:
+        # The DB holds the complete history (including evicted tasks)
+        page = await task_db.page(**query) if task_db else task_store.page(**query)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    page["seq"] = seq
+    page["boot_id"] = manager.boot_id
+    if since is not None:
+        page["resync"] = True
+    return page
 
 @app.get("/tasks/{task_id}")
 async def get_task_details(task_id: str):
-    for task in task_history:
-        if task["id"] == task_id:
-            return task
-    return {"error": "Task not found"}
+    task = task_store.get(task_id)
+    # Evicted or restored-from-disk tasks are read from the DB on demand
+    if (task is None or task.get("logs") is None) and task_db:
+        task = await task_db.get(task_id)
+    if task is None:
+        return {"error": "Task not found"}
+    return task
 
 @app.websocket("/ws")
 async def websocket_endpoint(websocket: WebSocket):
-    await manager.connect(websocket)
+    """
+    Live event stream. Clients get everything by default; narrow it with query params
+    (?task_id=..&persona=..&summary=1, repeatable) or subscribe/unsubscribe messages.
+    ?since=<seq>&boot_id=<id> replays the matching events missed since then (or sends
+    'resync' if that boot is gone). Every connection starts with a 'hello' frame carrying
+    the current boot_id and seq.
+    """
+    client = await manager.connect(websocket)
+    params = websocket.query_params
+    task_ids, personas = params.getlist("task_id"), params.getlist("persona")
+    summary = params.get("summary") in ("1", "true")
+    if task_ids or personas or summary:
+        manager.subscribe(client, task_ids, personas, summary=summary)
+    since = params.get("since")
+    if since is not None and since.isdigit():
+        manager.replay(client, int(since), params.get("boot_id"))
     try:
         while True:
-            await websocket.receive_text()
-            # Keep alive
+            text = await websocket.receive_text()
+            await manager.handle_message(client, text)
     except WebSocketDisconnect:
+        pass
+    finally:
         manager.disconnect(websocket)
 
 async def log_and_broadcast(task_id: str, message: str):
     """Save log to history and broadcast to WS"""
     append_task_log(task_id, message)
-    await manager.broadcast_json({
-        "type": "log",
-        "task_id": task_id,
-        "message": message
-    })
+    task = task_store.get(task_id)
+    # Coalesced into 'log_batch' frames (WS_BATCH_MS) by the connection manager
+    await manager.broadcast_log(task_id, task["persona"] if task else None, message)
 
-async def run_agent_task(payload: TaskPayload):
+async def run_agent_task(task_id: str, payload: TaskPayload, device_serial: Optional[str] = None):
     """
-    Executes the agent logic based on persona.
+    Executes the agent logic based on persona on the leased device.
     Broadcasts logs to WebSocket.
+    Stops early on DELETE /task/{task_id} ("cancelled") or when the persona's deadline
+    passes ("timeout"); either way the device is released as soon as the agent unwinds.
     """
-    task_id = str(uuid.uuid4())
-    add_task_record(task_id, payload.persona, payload)
+    update_task_status(task_id, "running")
+    started = time.perf_counter()
     
     # Notify start
     await manager.broadcast_json({
@@ -173,13 +249,27 @@ async def run_agent_task(payload: TaskPayload):
     })
 
     await log_and_broadcast(task_id, f"🚀 Starting Executor for Persona: {payload.persona}")
+    if device_serial:
+        await log_and_broadcast(task_id, f"📱 Device: {device_serial}")
     
     result = None
     status = "failed"
+
+    # Deadline: cancel this task from the loop and tell the handler below it was a timeout
+    deadline = deadline_for(payload.persona)
+    timed_out = False
+    current = asyncio.current_task()
+
+    def expire():
+        nonlocal timed_out
+        timed_out = True
+        current.cancel()
+
+    timer = asyncio.get_running_loop().call_later(deadline, expire) if deadline else None
     
     try:
         if payload.persona == "shopper":
-            agent = CommerceAgent(model="models/gemini-2.5-flash")
+            agent = CommerceAgent(model="models/gemini-2.5-flash", device_serial=device_serial)
             await log_and_broadcast(task_id, f"Searching for {payload.product} on Amazon/Flipkart...")
             
             result = await agent.execute_task("Amazon", payload.product, "product") 
@@ -189,7 +279,7 @@ async def run_agent_task(payload: TaskPayload):
                  result = await agent.execute_task("Flipkart", payload.product, "product")
                  
         elif payload.persona == "rider":
-            agent = RideComparisonAgent(model="models/gemini-2.5-flash")
+            agent = RideComparisonAgent(model="models/gemini-2.5-flash", device_serial=device_serial)
             pref_msg = f" ({payload.preference.upper()})" if payload.preference else ""
             
             await log_and_broadcast(task_id, f"Vehicle Preference: {payload.preference or 'Any'}")
@@ -250,13 +340,13 @@ async def run_agent_task(payload: TaskPayload):
                 await log_and_broadcast(task_id, msg)
             
         elif payload.persona == "patient":
-            agent = PharmacyAgent(model="models/gemini-2.5-flash")
+            agent = PharmacyAgent(model="models/gemini-2.5-flash", device_serial=device_serial)
             await log_and_broadcast(task_id, f"Searching for medicine: {payload.medicine}...")
             full_res = await agent.compare_prices(payload.medicine, "patient")
             result = full_res.get('best_option', {"status": "failed"})
 
         elif payload.persona == "foodie":
-             agent = CommerceAgent(model="models/gemini-2.5-flash")
+             agent = CommerceAgent(model="models/gemini-2.5-flash", device_serial=device_serial)
              await log_and_broadcast(task_id, f"🍔 Foodie Mode Activated: {payload.action.upper()} '{payload.food_item}'")
              
              if payload.action == 'order':
@@ -283,7 +373,7 @@ async def run_agent_task(payload: TaskPayload):
                       await log_and_broadcast(task_id, f"Checking {p}...")
                       res = await agent.execute_task(p, payload.food_item, "food item", action="search")
                       results[p.lower()] = res
-                      await asyncio.sleep(1)
+                      await wait_until_idle(device_serial, timeout=1)
                  
                  z_price = results.get('zomato', {}).get('data', {}).get('price', 'N/A')
                  s_price = results.get('swiggy', {}).get('data', {}).get('price', 'N/A')
@@ -304,7 +394,7 @@ async def run_agent_task(payload: TaskPayload):
                  }
 
         elif payload.persona == "coordinator":
-            agent = EventCoordinatorAgent(model="models/gemini-2.5-flash")
+            agent = EventCoordinatorAgent(model="models/gemini-2.5-flash", device_serial=device_serial)
             await log_and_broadcast(task_id, f"🎪 Orchestrating Event: {payload.event_name}")
             logistics = [] 
             await agent.orchestrate_event(payload.event_name, payload.guest_list, logistics)
@@ -313,8 +403,8 @@ async def run_agent_task(payload: TaskPayload):
         elif payload.persona == "traveller":
             await log_and_broadcast(task_id, f"✈️ Starting Voyager-1: Trip to {payload.destination}...")
             
-            transit_agent = TransitManager()
-            stay_agent = StayManager()
+            transit_agent = TransitManager(device_serial=device_serial)
+            stay_agent = StayManager(device_serial=device_serial)
             
             # 1. Flight
             await log_and_broadcast(task_id, f"Searching flights from {payload.source} to {payload.destination}...")
@@ -353,6 +443,19 @@ async def run_agent_task(payload: TaskPayload):
             status = "success"
             msg = f"Trip to {payload.destination} is ready!"
 
+        elif payload.persona == "neuro":
+            if not payload.goal:
+                raise ValueError("The neuro persona needs a 'goal'")
+            orchestrator = NeuroOrchestrator(api_key=os.getenv("GEMINI_API_KEY") or os.getenv("GOOGLE_API_KEY"),
+                                             device_serial=device_serial)
+            await log_and_broadcast(task_id, f"🧠 Neuro Mission: {payload.goal}" + (f" on {payload.app}" if payload.app else ""))
+            mission = await orchestrator.run_mission(payload.goal, app=payload.app, params=payload.params)
+            await log_and_broadcast(task_id, f"Mission {mission['status']}: {mission.get('stats', {})}")
+            if mission["status"] == "success":
+                result = mission
+            else:
+                await log_and_broadcast(task_id, f"Mission error: {mission.get('error')}")
+
         # Determine final status
         if result:
             status = "success"
@@ -361,26 +464,104 @@ async def run_agent_task(payload: TaskPayload):
             status = "failed"
             await log_and_broadcast(task_id, "❌ Task Failed or Returned No Data.")
 
+    except asyncio.CancelledError:
+        # Recorded and reported here; the job ends normally so the worker moves on
+        if timed_out:
+            status = "timeout"
+            result = {"error": f"Deadline of {deadline:g}s exceeded"}
+            await log_and_broadcast(task_id, f"⏱️ Timed out after {deadline:g}s")
+        elif scheduler.stopping:
+            # Server shutting down: recorded like the startup recovery of in-flight tasks
+            status = "failed"
+            result = {"error": "Interrupted by server shutdown"}
+            await log_and_broadcast(task_id, "🛑 Interrupted by server shutdown.")
+        else:
+            status = "cancelled"
+            result = {"error": "Cancelled by user"}
+            await log_and_broadcast(task_id, "🛑 Task Cancelled.")
+
     except Exception as e:
         logger.error(f"Task Error: {e}")
+        # Only ADB/connection errors count against the phone (see device_pool.is_device_error)
+        device_pool.mark_failure(device_serial, e)
         status = "failed"
         result = {"error": str(e)}
         await log_and_broadcast(task_id, f"🔥 Error: {str(e)}")
 
+    finally:
+        if timer:
+            timer.cancel()
+
     # Update History and Broadcast Completion
+    TASK_SECONDS.labels(payload.persona, status).observe(time.perf_counter() - started)
     update_task_status(task_id, status, result)
     await manager.broadcast_json({
         "type": "complete",
         "task_id": task_id,
+        "persona": payload.persona,
         "status": status,
         "result": result
     })
 
+device_pool = DevicePool()
+scheduler = TaskScheduler(run_agent_task, pool=device_pool)
+QUEUE_DEPTH.set_function(lambda: scheduler.depth)
+TASKS_RUNNING.set_function(lambda: len(scheduler.running))
+
 @app.post("/task")
 async def create_task(payload: TaskPayload):
-    # Run in background
-    asyncio.create_task(run_agent_task(payload))
-    return {"status": "accepted", "message": "Task queued"}
+    task_id = str(uuid.uuid4())
+    lane = lane_for(payload.persona)
+    try:
+        position = scheduler.submit(task_id, payload, lane)
+    except QueueFullError as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "30"})
+
+    add_task_record(task_id, payload.persona, payload, status="queued")
+    await manager.broadcast_json({
+        "type": "queued",
+        "task_id": task_id,
+        "persona": payload.persona,
+        "lane": lane,
+        "queue_position": position,
+        "timestamp": datetime.now().isoformat()
+    })
+    return {
+        "status": "accepted",
+        "message": "Task queued",
+        "task_id": task_id,
+        "lane": lane,
+        "queue_position": position,
+        # seq of the 'queued' event, so a client can subscribe with since=seq-1 and miss nothing
+        "seq": manager.seq
+    }
+
+@app.delete("/task/{task_id}")
+async def cancel_task(task_id: str):
+    """Cancels a queued or running task. Running agents stop at their next await."""
+    task = task_store.get(task_id)
+    if task is None:
+        raise HTTPException(status_code=404, detail="Task not found")
+
+    outcome = scheduler.cancel(task_id)
+    if outcome is None:
+        raise HTTPException(status_code=409, detail="Task has already finished")
+
+    if outcome == "queued":
+        # Never reached run_agent_task, so record the outcome here
+        result = {"error": "Cancelled before start"}
+        update_task_status(task_id, "cancelled", result)
+        await manager.broadcast_json({
+            "type": "complete",
+            "task_id": task_id,
+            "persona": task["persona"],
+            "status": "cancelled",
+            "result": result
+        })
+        return {"status": "cancelled", "task_id": task_id}
+
+    # run_agent_task records 'cancelled' and broadcasts 'complete' once the agent unwinds
+    return {"status": "cancelling", "task_id": task_id}
 
 if __name__ == "__main__":
     import uvicorn
@@ -0,0 +1,87 @@
+import asyncio
+import copy
+import inspect
+from functools import wraps
+from typing import Any, Dict, Hashable, Optional, Sequence, Tuple
+
+from metrics import COALESCED_CALLS
+
+
+def _normalize(value: Any) -> Hashable:
+    if isinstance(value, str):
+        return " ".join(value.lower().split())
+    return value if isinstance(value, Hashable) else repr(value)
+
+
+class SingleFlight:
+    """
+    Runs at most one call per key at a time; identical concurrent calls await the running
+    one instead of starting their own. The run happens inside the first caller's own task
+    (it drives that caller's leased device), so it stops the moment that caller is cancelled
+    or times out; anyone still waiting then starts over, one of them becoming the new
+    leader. Waiters get their own deep copy of the result. Their own devices sit idle
+    meanwhile, which is far cheaper than driving the same app flow on each of them.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+
+    async def do(self, key: Hashable, factory):
+        while True:
+            shared = self._inflight.get(key)
+            if shared is None:
+                return await self._lead(key, factory)
+            COALESCED_CALLS.labels(self.name).inc()
+            try:
+                result = await asyncio.shield(shared)
+            except asyncio.CancelledError:
+                if shared.cancelled():
+                    continue  # The leader went away mid-run; we weren't cancelled ourselves
+                raise
+            return copy.deepcopy(result)
+
+    async def _lead(self, key: Hashable, factory):
+        shared = asyncio.get_running_loop().create_future()
+        # Nobody may be waiting; don't warn about an exception no one retrieved
+        shared.add_done_callback(lambda f: f.cancelled() or f.exception())
+        self._inflight[key] = shared
+        try:
+            result = await factory()
+        except asyncio.CancelledError:
+            shared.cancel()
+            raise
+        except BaseException as e:
+            shared.set_exception(e)
+            raise
+        else:
+            shared.set_result(result)
+            return result
+        finally:
+            if self._inflight.get(key) is shared:
+                del self._inflight[key]
+
+
+def coalesce_identical(key_args: Sequence[str], when: Optional[Dict[str, Any]] = None):
+    """
+    Decorator for agent methods: concurrent calls whose `key_args` match (strings compared
+    case/whitespace-insensitively) share one run, whichever agent instance and device they
+    come from. Calls that don't satisfy `when` (e.g. action='order') always run on their own.
+    """
+    def decorator(fn):
+        signature = inspect.signature(fn)
+        flight = SingleFlight(fn.__qualname__)
+
+        @wraps(fn)
+        async def wrapper(*args, **kwargs):
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            params = bound.arguments
+            if when and any(params.get(name) != value for name, value in when.items()):
+                return await fn(*args, **kwargs)
+            key: Tuple = tuple(_normalize(params.get(name)) for name in key_args)
+            return await flight.do(key, lambda: fn(*args, **kwargs))
+
+        wrapper.single_flight = flight
+        return wrapper
+    return decorator
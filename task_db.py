@@ -0,0 +1,268 @@
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger("TaskDB")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    pos INTEGER PRIMARY KEY,
+    id TEXT NOT NULL UNIQUE,
+    persona TEXT NOT NULL,
+    status TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    payload TEXT,
+    result TEXT,
+    log_count INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_tasks_persona ON tasks(persona, pos);
+CREATE INDEX IF NOT EXISTS idx_tasks_status ON tasks(status, pos);
+CREATE INDEX IF NOT EXISTS idx_tasks_created ON tasks(created_at);
+
+CREATE TABLE IF NOT EXISTS task_logs (
+    id INTEGER PRIMARY KEY,
+    task_id TEXT NOT NULL,
+    entry TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_task_logs_task ON task_logs(task_id, id);
+"""
+
+SUMMARY_COLUMNS = "pos, id, persona, status, created_at, payload, log_count"
+
+
+def _dumps(value: Any) -> Optional[str]:
+    return None if value is None else json.dumps(value, default=str)
+
+
+def _loads(value: Optional[str]) -> Any:
+    return None if value is None else json.loads(value)
+
+
+class TaskDatabase:
+    """
+    Optional SQLite (WAL) persistence for the task store.
+
+    Writes are queued in memory and committed in one transaction every `flush_interval`
+    seconds (or as soon as `batch_size` ops are pending), on a dedicated single-thread
+    executor, so `log_and_broadcast` never waits on disk. Reads go through the same
+    executor and therefore see every write submitted before them.
+    """
+
+    def __init__(self, path: str, flush_interval: Optional[float] = None, batch_size: int = 500):
+        self.path = path
+        self.flush_interval = flush_interval if flush_interval is not None else int(os.getenv("TASK_DB_FLUSH_MS", "500")) / 1000
+        self.batch_size = batch_size
+
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="task-db")
+        self._conn: Optional[sqlite3.Connection] = None
+        self._pending: List[Tuple] = []
+        self._flusher: Optional[asyncio.Task] = None
+        self._kick = asyncio.Event()
+
+    # --- Lifecycle ---
+    async def start(self):
+        await self._run(self._open)
+        self._flusher = asyncio.create_task(self._flush_loop())
+        logger.info(f"Task DB ready at {self.path} (flush every {self.flush_interval * 1000:.0f}ms)")
+
+    async def stop(self):
+        if self._flusher:
+            self._flusher.cancel()
+            try:
+                await self._flusher
+            except asyncio.CancelledError:
+                pass
+        await self.flush()
+        await self._run(self._close)
+        self._executor.shutdown(wait=True)
+
+    def _open(self):
+        self._conn = sqlite3.connect(self.path)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+
+    def _close(self):
+        if self._conn:
+            self._conn.close()
+            self._conn = None
+
+    async def _run(self, fn, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, fn, *args)
+
+    # --- Write side (called from the event loop, never blocks) ---
+    def record_task(self, pos: int, record: Dict[str, Any]):
+        self._enqueue(("task", pos, record["id"], record["persona"], record["status"],
+                       record["created_at"], _dumps(record.get("payload"))))
+
+    def record_status(self, task_id: str, status: str, result: Any = None):
+        self._enqueue(("status", task_id, status, _dumps(result) if result else None))
+
+    def record_log(self, task_id: str, entry: str):
+        self._enqueue(("log", task_id, entry))
+
+    def _enqueue(self, op: Tuple):
+        self._pending.append(op)
+        if len(self._pending) >= self.batch_size:
+            self._kick.set()
+
+    async def _flush_loop(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._kick.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._kick.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"Task DB flush failed: {e}")
+
+    async def flush(self):
+        if not self._pending:
+            return
+        ops, self._pending = self._pending, []
+        await self._run(self._write_batch, ops)
+
+    def _write_batch(self, ops: List[Tuple]):
+        log_rows = []
+        log_counts: Dict[str, int] = {}
+        with self._conn:
+            for op in ops:
+                kind = op[0]
+                if kind == "task":
+                    self._conn.execute(
+                        "INSERT OR REPLACE INTO tasks (pos, id, persona, status, created_at, payload) VALUES (?, ?, ?, ?, ?, ?)",
+                        op[1:]
+                    )
+                elif kind == "status":
+                    _, task_id, status, result = op
+                    if result is None:
+                        self._conn.execute("UPDATE tasks SET status = ? WHERE id = ?", (status, task_id))
+                    else:
+                        self._conn.execute("UPDATE tasks SET status = ?, result = ? WHERE id = ?", (status, result, task_id))
+                elif kind == "log":
+                    log_rows.append(op[1:])
+                    log_counts[op[1]] = log_counts.get(op[1], 0) + 1
+
+            if log_rows:
+                self._conn.executemany("INSERT INTO task_logs (task_id, entry) VALUES (?, ?)", log_rows)
+                self._conn.executemany(
+                    "UPDATE tasks SET log_count = log_count + ? WHERE id = ?",
+                    [(count, task_id) for task_id, count in log_counts.items()]
+                )
+
+    # --- Read side ---
+    async def page(self, limit: int = 50, cursor: Optional[str] = None, persona: Optional[str] = None,
+                   status: Optional[str] = None, created_after: Optional[str] = None,
+                   created_before: Optional[str] = None, view: str = "summary") -> Dict[str, Any]:
+        """Same contract as TaskStore.page, answered from the indexed tables."""
+        if cursor:
+            try:
+                cursor_pos = int(cursor)
+            except ValueError:
+                raise ValueError(f"Invalid cursor: {cursor!r}")
+        else:
+            cursor_pos = None
+        await self.flush()
+        return await self._run(self._query_page, limit, cursor_pos, persona, status, created_after, created_before, view)
+
+    def _query_page(self, limit, cursor_pos, persona, status, created_after, created_before, view):
+        columns = SUMMARY_COLUMNS + (", result" if view == "full" else "")
+        clauses, params = [], []
+        if cursor_pos is not None:
+            clauses.append("pos < ?")
+            params.append(cursor_pos)
+        if persona:
+            clauses.append("persona = ?")
+            params.append(persona)
+        if status:
+            clauses.append("status = ?")
+            params.append(status)
+        if created_after:
+            clauses.append("created_at >= ?")
+            params.append(created_after)
+        if created_before:
+            clauses.append("created_at < ?")
+            params.append(created_before)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+
+        # Fetch one extra row to know whether another page exists
+        rows = self._conn.execute(
+            f"SELECT {columns} FROM tasks {where} ORDER BY pos DESC LIMIT ?", (*params, limit + 1)
+        ).fetchall()
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+
+        tasks = [self._row_to_task(row, view) for row in rows]
+        if view == "full" and tasks:
+            logs = self._logs_for([t["id"] for t in tasks])
+            for task in tasks:
+                task["logs"] = logs.get(task["id"], [])
+
+        next_cursor = str(rows[-1]["pos"]) if has_more and rows else None
+        return {"tasks": tasks, "next_cursor": next_cursor}
+
+    async def get(self, task_id: str) -> Optional[Dict[str, Any]]:
+        await self.flush()
+        return await self._run(self._query_task, task_id)
+
+    def _query_task(self, task_id: str) -> Optional[Dict[str, Any]]:
+        row = self._conn.execute(f"SELECT {SUMMARY_COLUMNS}, result FROM tasks WHERE id = ?", (task_id,)).fetchone()
+        if row is None:
+            return None
+        task = self._row_to_task(row, "full")
+        task["logs"] = self._logs_for([task_id]).get(task_id, [])
+        return task
+
+    def _logs_for(self, task_ids: List[str]) -> Dict[str, List[str]]:
+        placeholders = ",".join("?" * len(task_ids))
+        logs: Dict[str, List[str]] = {}
+        for row in self._conn.execute(
+            f"SELECT task_id, entry FROM task_logs WHERE task_id IN ({placeholders}) ORDER BY id", task_ids
+        ):
+            logs.setdefault(row["task_id"], []).append(row["entry"])
+        return logs
+
+    @staticmethod
+    def _row_to_task(row: sqlite3.Row, view: str) -> Dict[str, Any]:
+        task = {
+            "id": row["id"],
+            "persona": row["persona"],
+            "status": row["status"],
+            "created_at": row["created_at"],
+            "payload": _loads(row["payload"]),
+        }
+        if view == "full":
+            task["result"] = _loads(row["result"])
+        else:
+            task["log_count"] = row["log_count"]
+        return task
+
+    # --- Startup ---
+    async def load_recent(self, limit: int, interrupted_statuses=("running",)) -> Tuple[List[Tuple[int, Dict[str, Any]]], int]:
+        """
+        Marks tasks that were still active at shutdown as failed, then returns the `limit` most
+        recent tasks as (pos, summary) oldest first, plus the highest position ever used.
+        Logs and results are not loaded here; they are read on demand.
+        """
+        return await self._run(self._load_recent, limit, tuple(interrupted_statuses))
+
+    def _load_recent(self, limit: int, interrupted_statuses: Tuple[str, ...]):
+        placeholders = ",".join("?" * len(interrupted_statuses))
+        with self._conn:
+            self._conn.execute(
+                f"UPDATE tasks SET status = 'failed', result = ? WHERE status IN ({placeholders})",
+                (_dumps({"error": "Interrupted by server restart"}), *interrupted_statuses)
+            )
+        rows = self._conn.execute(
+            f"SELECT {SUMMARY_COLUMNS} FROM tasks ORDER BY pos DESC LIMIT ?", (limit,)
+        ).fetchall()
+        max_pos = self._conn.execute("SELECT COALESCE(MAX(pos), 0) FROM tasks").fetchone()[0]
+        return [(row["pos"], self._row_to_task(row, "summary")) for row in reversed(rows)], max_pos
@@ -0,0 +1,181 @@
+import asyncio
+import logging
+import os
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional, Set, Tuple
+
+from metrics import TASK_QUEUE_WAIT_SECONDS
+
+logger = logging.getLogger("TaskScheduler")
+
+INTERACTIVE = "interactive"
+BACKGROUND = "background"
+
+# Personas a user is actively waiting on; everything else (coordinator, traveller, ...) is background
+INTERACTIVE_PERSONAS = {"rider", "foodie", "shopper", "patient"}
+
+
+# Wall-clock budget per persona in seconds; override with TASK_DEADLINE_<PERSONA> (0 = no deadline)
+DEFAULT_DEADLINES = {
+    "rider": 300,
+    "foodie": 300,
+    "shopper": 300,
+    "patient": 300,
+    "traveller": 1200,
+    "coordinator": 1800,
+}
+
+
+def lane_for(persona: str) -> str:
+    return INTERACTIVE if persona in INTERACTIVE_PERSONAS else BACKGROUND
+
+
+def deadline_for(persona: str) -> Optional[float]:
+    default = DEFAULT_DEADLINES.get(persona, float(os.getenv("TASK_DEADLINE_SECONDS", "600")))
+    seconds = float(os.getenv(f"TASK_DEADLINE_{persona.upper()}", default))
+    return seconds if seconds > 0 else None
+
+
+class QueueFullError(Exception):
+    """Raised by TaskScheduler.submit when the queue is at capacity."""
+
+
+class TaskScheduler:
+    """
+    Bounded two-lane queue feeding a fixed pool of workers.
+
+    Interactive jobs are picked first, but every `background_every`-th pick goes to the
+    background lane when it has work, so a stream of rider/foodie requests can't starve
+    the coordinator forever. `runner(task_id, payload, device_serial)` does the actual work;
+    with a DevicePool each job runs on its own leased device.
+
+    Each job runs as its own asyncio task so `cancel` can stop it without taking the worker
+    down with it; the device lease is released as soon as the job unwinds.
+    """
+
+    def __init__(self, runner: Callable[[str, Any, Optional[str]], Awaitable[Any]], pool=None,
+                 max_queue: Optional[int] = None, background_every: int = 3):
+        self.runner = runner
+        self.pool = pool
+        self.max_queue = max_queue if max_queue is not None else int(os.getenv("TASK_QUEUE_MAX", "20"))
+        self.background_every = background_every
+        self.concurrency = 0
+
+        # Each lane holds (task_id, payload, enqueued_at)
+        self._lanes: Dict[str, Deque[Tuple[str, Any, float]]] = {INTERACTIVE: deque(), BACKGROUND: deque()}
+        self._ready = asyncio.Semaphore(0)
+        self._workers = []
+        self._picks = 0
+        self.running: Dict[str, Any] = {}
+        self._jobs: Dict[str, asyncio.Task] = {}
+        self._started: Set[str] = set()
+        # Set by stop() so runners can tell a shutdown from a user cancel
+        self.stopping = False
+
+    @property
+    def depth(self) -> int:
+        return sum(len(q) for q in self._lanes.values())
+
+    def submit(self, task_id: str, payload: Any, lane: str = INTERACTIVE) -> int:
+        """Queues a job and returns its 1-based queue position. Raises QueueFullError at capacity."""
+        if self.depth >= self.max_queue:
+            raise QueueFullError(f"Task queue is full ({self.max_queue} waiting)")
+        self._lanes[lane].append((task_id, payload, time.monotonic()))
+        self._ready.release()
+        return self.position(task_id)
+
+    def position(self, task_id: str) -> Optional[int]:
+        """Approximate 1-based position (interactive jobs are counted ahead of background ones)."""
+        ahead = 0
+        for lane in (INTERACTIVE, BACKGROUND):
+            for i, (queued_id, _, _) in enumerate(self._lanes[lane]):
+                if queued_id == task_id:
+                    return ahead + i + 1
+            ahead += len(self._lanes[lane])
+        return None
+
+    def cancel(self, task_id: str) -> Optional[str]:
+        """
+        Cancels a job. Returns "queued" if it never reached the runner (the caller records the
+        outcome), "running" if the runner was interrupted (the runner records it), or None if
+        the scheduler doesn't know the task (already finished).
+        """
+        for lane in self._lanes.values():
+            for job in lane:
+                if job[0] == task_id:
+                    # The worker that wakes for it finds the lane short and goes back to sleep
+                    lane.remove(job)
+                    return "queued"
+
+        job = self._jobs.get(task_id)
+        if job is None or job.done():
+            return None
+        started = task_id in self._started
+        job.cancel()
+        return "running" if started else "queued"
+
+    def _next_job(self) -> Tuple[str, Any]:
+        self._picks += 1
+        interactive, background = self._lanes[INTERACTIVE], self._lanes[BACKGROUND]
+        lane = BACKGROUND if background and (not interactive or self._picks % self.background_every == 0) else INTERACTIVE
+        task_id, payload, enqueued_at = self._lanes[lane].popleft()
+        TASK_QUEUE_WAIT_SECONDS.labels(lane).observe(time.monotonic() - enqueued_at)
+        return task_id, payload
+
+    async def start(self, concurrency: int):
+        self.scale_to(concurrency)
+        logger.info(f"Scheduler started: {self.concurrency} worker(s), queue limit {self.max_queue}")
+
+    def scale_to(self, concurrency: int):
+        """Adds workers up to `concurrency` (e.g. when a phone is plugged in). Never shrinks;
+        surplus workers simply wait for a device lease."""
+        while len(self._workers) < max(1, concurrency):
+            self._workers.append(asyncio.create_task(self._worker(len(self._workers))))
+        self.concurrency = len(self._workers)
+
+    async def stop(self):
+        self.stopping = True
+        jobs = list(self._jobs.values())
+        for task in jobs + self._workers:
+            task.cancel()
+        await asyncio.gather(*jobs, *self._workers, return_exceptions=True)
+        self._workers = []
+
+    @asynccontextmanager
+    async def _device(self, n: int):
+        if self.pool is None:
+            yield None
+        else:
+            async with self.pool.lease(f"worker-{n}") as device:
+                yield device
+
+    async def _worker(self, n: int):
+        while True:
+            await self._ready.acquire()
+            if not self.depth:
+                continue  # The job this permit was for got cancelled while queued
+            # Hold a device before taking a job off its lane: jobs waiting for a phone stay
+            # queued, so depth/queue_position and the TASK_QUEUE_MAX back-pressure see them
+            async with self._device(n) as device:
+                if not self.depth:
+                    continue  # Cancelled while we waited for the device
+                task_id, payload = self._next_job()
+                if device is not None:
+                    device.task_id = task_id
+                self.running[task_id] = payload
+                job = asyncio.create_task(self._run(task_id, payload, device.serial if device else None))
+                self._jobs[task_id] = job
+                try:
+                    await asyncio.wait({job})
+                    if not job.cancelled() and job.exception():
+                        logger.error(f"Worker {n}: task {task_id} crashed: {job.exception()}")
+                finally:
+                    self.running.pop(task_id, None)
+                    self._jobs.pop(task_id, None)
+                    self._started.discard(task_id)
+
+    async def _run(self, task_id: str, payload: Any, serial: Optional[str]):
+        self._started.add(task_id)
+        await self.runner(task_id, payload, serial)
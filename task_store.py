@@ -0,0 +1,267 @@
+import bisect
+import json
+import os
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+# Tasks in these states are still owned by an executor and must never be evicted.
+ACTIVE_STATUSES = {"queued", "running"}
+
+# Heavy fields left out of the list view; full records stay on /tasks/{task_id}
+SUMMARY_EXCLUDED_FIELDS = ("logs", "result")
+
+
+def summarize_task(task: Dict[str, Any]) -> Dict[str, Any]:
+    """Projection used by the task list: everything except logs/result, plus a log count."""
+    summary = {k: v for k, v in task.items() if k not in SUMMARY_EXCLUDED_FIELDS}
+    # Records restored from the task DB carry their count and load logs lazily
+    logs = task.get("logs")
+    summary["log_count"] = len(logs) if logs is not None else task.get("log_count", 0)
+    return summary
+
+
+def _approx_size(value: Any) -> int:
+    """Cheap byte estimate of a JSON-ish value (what it would cost to serve it)."""
+    if value is None:
+        return 0
+    try:
+        return len(json.dumps(value, default=str))
+    except (TypeError, ValueError):
+        return len(str(value))
+
+
+class TaskStore:
+    """
+    In-memory task history indexed by task id.
+
+    Records live in an OrderedDict in insertion order (oldest first), so lookups are O(1)
+    and newest-first listing is a reversed walk. Once the count or byte limit is exceeded,
+    the oldest finished tasks are evicted; active tasks are always kept.
+
+    An optional `backend` (see task_db.TaskDatabase) receives every write so history
+    survives restarts and eviction.
+
+    `mark_updated` tags a task with the event sequence number that last changed it, which
+    lets `changed_since` answer delta syncs without scanning the whole history.
+    """
+
+    def __init__(self, max_tasks: Optional[int] = None, max_bytes: Optional[int] = None, backend=None):
+        self.max_tasks = max_tasks if max_tasks is not None else int(os.getenv("TASK_STORE_MAX_TASKS", "500"))
+        self.max_bytes = max_bytes if max_bytes is not None else int(os.getenv("TASK_STORE_MAX_BYTES", str(32 * 1024 * 1024)))
+
+        self._tasks: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._sizes: Dict[str, int] = {}
+        self.total_bytes = 0
+        # Finished (evictable) records; while zero, being over a limit has nothing to evict
+        self._finished = 0
+
+        # Pagination index: every record gets a monotonically increasing position.
+        # _order is ascending (append-only) so a cursor resolves with bisect; evicted
+        # positions leave holes that are compacted once they outnumber live records.
+        self._next_pos = 0
+        self._order: List[int] = []
+        self._pos_to_id: Dict[int, str] = {}
+        self._id_to_pos: Dict[str, int] = {}
+
+        # task_id -> seq of its last event, least recently changed first
+        self._touched: "OrderedDict[str, int]" = OrderedDict()
+
+        self.backend = backend
+
+    def __len__(self) -> int:
+        return len(self._tasks)
+
+    def __contains__(self, task_id: str) -> bool:
+        return task_id in self._tasks
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        """Iterates records newest first."""
+        return reversed(self._tasks.values())
+
+    def get(self, task_id: str) -> Optional[Dict[str, Any]]:
+        return self._tasks.get(task_id)
+
+    def list(self) -> List[Dict[str, Any]]:
+        return list(iter(self))
+
+    def add(self, task_id: str, persona: str, payload: Any, status: str = "running") -> Dict[str, Any]:
+        record = {
+            "id": task_id,
+            "persona": persona,
+            "status": status,
+            "created_at": datetime.now().isoformat(),
+            "logs": [],
+            "result": None,
+            "payload": payload.dict() if hasattr(payload, "dict") else payload
+        }
+        self._tasks[task_id] = record
+        self._next_pos += 1
+        self._order.append(self._next_pos)
+        self._pos_to_id[self._next_pos] = task_id
+        self._id_to_pos[task_id] = self._next_pos
+        self._resize(task_id, _approx_size(record))
+        if status not in ACTIVE_STATUSES:
+            self._finished += 1
+        if self.backend:
+            self.backend.record_task(self._next_pos, record)
+        self._evict()
+        return record
+
+    def restore(self, entries: List[Tuple[int, Dict[str, Any]]], max_pos: int):
+        """
+        Re-inserts (pos, record) pairs loaded from the backend, oldest first.
+        Restored records have `logs` set to None; callers fetch full details from the backend.
+        """
+        for pos, record in entries:
+            record.setdefault("result", None)
+            record["logs"] = None
+            self._tasks[record["id"]] = record
+            self._order.append(pos)
+            self._pos_to_id[pos] = record["id"]
+            self._id_to_pos[record["id"]] = pos
+            self._resize(record["id"], _approx_size(record))
+            if record.get("status") not in ACTIVE_STATUSES:
+                self._finished += 1
+        self._next_pos = max(self._next_pos, max_pos)
+        self._evict()
+
+    def update_status(self, task_id: str, status: str, result: Any = None) -> Optional[Dict[str, Any]]:
+        task = self._tasks.get(task_id)
+        if task is None:
+            return None
+        self._finished += (status not in ACTIVE_STATUSES) - (task["status"] not in ACTIVE_STATUSES)
+        task["status"] = status
+        if result:
+            old = _approx_size(task["result"])
+            task["result"] = result
+            self._resize(task_id, self._sizes[task_id] - old + _approx_size(result))
+        if self.backend:
+            self.backend.record_status(task_id, status, result)
+        # A task that just finished may now be evictable
+        self._evict()
+        return task
+
+    def append_log(self, task_id: str, message: str) -> Optional[str]:
+        task = self._tasks.get(task_id)
+        if task is None:
+            return None
+        timestamp = datetime.now().strftime("%H:%M:%S")
+        log_entry = f"[{timestamp}] {message}"
+        task["logs"].append(log_entry)
+        # +4 for the quotes and separator it adds to the serialized list
+        self._resize(task_id, self._sizes[task_id] + len(log_entry) + 4)
+        if self.backend:
+            self.backend.record_log(task_id, log_entry)
+        if self.total_bytes > self.max_bytes:
+            self._evict()
+        return log_entry
+
+    def page(self, limit: int = 50, cursor: Optional[str] = None, persona: Optional[str] = None,
+             status: Optional[str] = None, created_after: Optional[str] = None,
+             created_before: Optional[str] = None, view: str = "summary") -> Dict[str, Any]:
+        """
+        Newest-first page of tasks, optionally filtered by persona, status and creation time
+        (ISO strings, compared lexicographically like created_at itself).
+        The cursor is opaque to clients: pass back `next_cursor` to get the next (older) page.
+        """
+        if cursor:
+            try:
+                start = bisect.bisect_left(self._order, int(cursor))
+            except ValueError:
+                raise ValueError(f"Invalid cursor: {cursor!r}")
+        else:
+            start = len(self._order)
+
+        items = []
+        next_cursor = None
+        last_pos = None
+        for i in range(start - 1, -1, -1):
+            pos = self._order[i]
+            task_id = self._pos_to_id.get(pos)
+            if task_id is None:
+                continue
+            task = self._tasks[task_id]
+            if created_after and task["created_at"] < created_after:
+                # Creation order matches position order, so everything below is older too
+                break
+            if created_before and task["created_at"] >= created_before:
+                continue
+            if persona and task["persona"] != persona:
+                continue
+            if status and task["status"] != status:
+                continue
+
+            if len(items) >= limit:
+                # Peeked one match past the page: only now is there a next page to point at
+                next_cursor = str(last_pos)
+                break
+            items.append(summarize_task(task) if view == "summary" else task)
+            last_pos = pos
+
+        return {"tasks": items, "next_cursor": next_cursor}
+
+    def mark_updated(self, task_id: str, seq: int):
+        if task_id in self._tasks:
+            self._touched[task_id] = seq
+            self._touched.move_to_end(task_id)
+
+    def changed_since(self, since: int, view: str = "summary", persona: Optional[str] = None,
+                      status: Optional[str] = None, created_after: Optional[str] = None,
+                      created_before: Optional[str] = None,
+                      limit: Optional[int] = None) -> Optional[List[Dict[str, Any]]]:
+        """
+        Tasks whose last event has seq > since, most recently changed first, filtered like
+        `page`. Returns None when more than `limit` match: the delta doesn't fit in one
+        response and the caller should fall back to a full listing.
+        """
+        items = []
+        for task_id, seq in reversed(self._touched.items()):
+            if seq <= since:
+                break
+            task = self._tasks[task_id]
+            if created_after and task["created_at"] < created_after:
+                continue
+            if created_before and task["created_at"] >= created_before:
+                continue
+            if persona and task["persona"] != persona:
+                continue
+            if status and task["status"] != status:
+                continue
+            if limit is not None and len(items) >= limit:
+                return None
+            items.append(summarize_task(task) if view == "summary" else task)
+        return items
+
+    def _resize(self, task_id: str, size: int):
+        self.total_bytes += size - self._sizes.get(task_id, 0)
+        self._sizes[task_id] = size
+
+    def _evict(self):
+        count, size = len(self._tasks), self.total_bytes
+        if count <= self.max_tasks and size <= self.max_bytes:
+            return
+        if not self._finished:
+            # Only active tasks: stay over the limit without walking the history
+            return
+        # Walk oldest -> newest, picking finished tasks until we're back under both limits.
+        # Only the skipped active tasks and the victims are visited, not the whole history.
+        victims = []
+        for task_id, task in self._tasks.items():
+            if count <= self.max_tasks and size <= self.max_bytes:
+                break
+            if task["status"] in ACTIVE_STATUSES:
+                continue
+            victims.append(task_id)
+            count -= 1
+            size -= self._sizes[task_id]
+
+        self._finished -= len(victims)
+        for task_id in victims:
+            del self._tasks[task_id]
+            self.total_bytes -= self._sizes.pop(task_id, 0)
+            self._touched.pop(task_id, None)
+            self._pos_to_id.pop(self._id_to_pos.pop(task_id), None)
+
+        if len(self._order) > 2 * len(self._tasks) + 64:
+            self._order = [pos for pos in self._order if pos in self._pos_to_id]
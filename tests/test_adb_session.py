@@ -0,0 +1,59 @@
+import asyncio
+import os
+import shutil
+import stat
+
+import pytest
+
+from neurorun.adb_session import AdbError, AdbShell
+
+pytestmark = pytest.mark.skipif(shutil.which("sh") is None, reason="needs a POSIX shell")
+
+
+@pytest.fixture
+def fake_adb(tmp_path, monkeypatch):
+    """An `adb` on PATH whose `adb -s <serial> shell` is just a local sh reading stdin."""
+    script = tmp_path / "adb"
+    script.write_text("#!/bin/sh\necho 'fake adb banner'\nexec sh\n")
+    script.chmod(script.stat().st_mode | stat.S_IEXEC)
+    monkeypatch.setenv("PATH", f"{tmp_path}{os.pathsep}{os.environ['PATH']}")
+
+
+def test_pipelined_commands_split_back_apart(fake_adb):
+    async def main():
+        shell = AdbShell("emulator-5554", timeout=5)
+        try:
+            outputs = await shell.run_many(["echo one", "printf 'no newline'", "true", "printf 'a\\nb\\n'"])
+            assert outputs == ["one", "no newline", "", "a\nb"]
+            assert await shell.run("echo again") == "again"  # Same long-lived shell
+        finally:
+            await shell.close()
+
+    asyncio.run(main())
+
+
+def test_exit_status_is_checked(fake_adb):
+    async def main():
+        shell = AdbShell("emulator-5554", timeout=5)
+        try:
+            with pytest.raises(AdbError, match="exit 3"):
+                await shell.run("echo oops; (exit 3)")
+            assert await shell.run("exit_code_ignored=1; false", check=False) == ""
+        finally:
+            await shell.close()
+
+    asyncio.run(main())
+
+
+def test_timeout_restarts_the_shell(fake_adb):
+    async def main():
+        shell = AdbShell("emulator-5554", timeout=0.3)
+        try:
+            with pytest.raises(AdbError, match="timed out"):
+                await shell.run("exec sleep 5")  # Killed along with the shell
+            shell.timeout = 5
+            assert await shell.run("echo fresh") == "fresh"
+        finally:
+            await shell.close()
+
+    asyncio.run(main())
@@ -0,0 +1,87 @@
+import asyncio
+import json
+
+import pytest
+
+pytest.importorskip("fastapi")
+
+from connection_manager import ConnectionManager  # noqa: E402
+
+
+class StalledSocket:
+    """A WebSocket whose sends never complete, so everything piles up in the client queue."""
+
+    def __init__(self):
+        self.closed = False
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, message):
+        await asyncio.Event().wait()
+
+    async def close(self):
+        self.closed = True
+
+
+def _queued_types(client):
+    return [json.loads(message)["type"] for _, message in list(client.queue._queue)]
+
+
+def test_full_queue_sheds_logs_but_keeps_lifecycle_frames():
+    async def main():
+        manager = ConnectionManager(max_queue=3, batch_interval=0)
+        socket = StalledSocket()
+        client = await manager.connect(socket)
+        await asyncio.sleep(0)  # The writer takes the 'hello' frame and stalls sending it
+
+        manager.publish({"type": "queued", "task_id": "a"})
+        manager.publish({"type": "log", "task_id": "a", "message": "1"})
+        manager.publish({"type": "log", "task_id": "a", "message": "2"})
+        manager.publish({"type": "log", "task_id": "a", "message": "3"})  # Dropped
+        manager.publish({"type": "complete", "task_id": "a"})  # Evicts the oldest log, not "queued"
+        assert _queued_types(client) == ["queued", "log", "complete"]
+        assert client.dropped == 2
+
+        manager.publish({"type": "queued", "task_id": "b"})
+        assert _queued_types(client) == ["queued", "complete", "queued"]
+        # Nothing left to shed: the client is closed rather than losing a lifecycle frame
+        manager.publish({"type": "start", "task_id": "b"})
+        await asyncio.sleep(0.01)
+        assert socket not in manager.clients
+        assert socket.closed
+        assert not manager._closing
+
+    asyncio.run(main())
+
+
+class RecordingSocket(StalledSocket):
+    def __init__(self):
+        super().__init__()
+        self.sent = []
+
+    async def send_text(self, message):
+        self.sent.append(json.loads(message))
+
+
+def test_hello_carries_boot_id_and_other_boots_resync():
+    async def main():
+        manager = ConnectionManager(batch_interval=0)
+        for i in range(3):
+            manager.publish({"type": "queued", "task_id": f"t{i}"})
+
+        socket = RecordingSocket()
+        client = await manager.connect(socket)
+        manager.replay(client, 1, manager.boot_id)
+        await asyncio.sleep(0.01)
+        assert socket.sent[0] == {"type": "hello", "boot_id": manager.boot_id, "current_seq": 3}
+        assert [frame["seq"] for frame in socket.sent[1:]] == [2, 3]
+
+        # Same seq, but from a previous process: nothing to replay, only a resync
+        socket.sent.clear()
+        manager.replay(client, 1, "previous-boot")
+        await asyncio.sleep(0.01)
+        assert [frame["type"] for frame in socket.sent] == ["resync"]
+        assert socket.sent[0]["boot_id"] == manager.boot_id
+
+    asyncio.run(main())
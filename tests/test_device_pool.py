@@ -0,0 +1,54 @@
+import asyncio
+
+from device_pool import Device, DevicePool, is_device_error
+from neurorun.adb_session import AdbError
+
+
+def test_only_device_errors_count():
+    assert is_device_error(AdbError("adb shell died"))
+    assert is_device_error(RuntimeError("error: device offline"))
+    assert is_device_error(ConnectionRefusedError())
+    assert not is_device_error(ValueError("Expecting value: line 1 column 1"))
+    assert not is_device_error(RuntimeError("429 Resource has been exhausted (quota)"))
+
+
+def test_mark_failure_ignores_non_device_errors():
+    async def main():
+        pool = DevicePool(refresh_interval=60, max_failures=2)
+        pool.devices = {}
+        pool.devices["emulator-5554"] = Device("emulator-5554")
+        for _ in range(3):
+            pool.mark_failure("emulator-5554", ValueError("bad JSON from the model"))
+        assert pool.devices["emulator-5554"].healthy
+        for _ in range(2):
+            pool.mark_failure("emulator-5554", AdbError("device offline"))
+        assert not pool.devices["emulator-5554"].healthy
+
+    asyncio.run(main())
+
+
+def test_refresh_keeps_a_leased_default_device_until_it_is_released(monkeypatch):
+    attached = {}
+
+    async def fake_list():
+        return dict(attached)
+
+    monkeypatch.setattr("device_pool.list_adb_serials", fake_list)
+
+    async def main():
+        pool = DevicePool(refresh_interval=60)
+        await pool.refresh()
+        assert list(pool.devices) == [None]
+
+        async with pool.lease("t1") as device:
+            attached["emulator-5554"] = "device"
+            await pool.refresh()
+            assert pool.devices[None] is device and device.busy
+            # New leases go to the real device, not the retiring default
+            async with pool.lease("t2") as other:
+                assert other.serial == "emulator-5554"
+
+        await pool.refresh()
+        assert list(pool.devices) == ["emulator-5554"]
+
+    asyncio.run(main())
@@ -0,0 +1,32 @@
+from neurorun.history import MissionHistory, _tokens, describe
+
+
+def test_describe_is_one_short_line():
+    assert describe({"type": "tap", "target": "Search"}) == "tap 'Search'"
+    assert describe({"type": "tap", "bq_box": [100, 200, 300, 400]}) == "tap@(300,200)"
+    assert describe({"type": "type", "text": "x" * 100}) == f"type {'x' * 40!r}"
+    assert describe({"type": "key", "keycode": 66}) == "key 66"
+    assert describe({"type": "back"}) == "back"
+
+
+def test_short_missions_are_listed_verbatim():
+    history = MissionHistory(budget=300)
+    history.add({"type": "tap", "target": "Search"})
+    history.add({"type": "type", "text": "biryani"}, note="replayed")
+    assert history.render() == "1. tap 'Search'\n2. type 'biryani' (replayed)"
+    assert MissionHistory(budget=300).render() == "(none)"
+
+
+def test_long_missions_are_compacted_within_budget():
+    history = MissionHistory(budget=40)
+    for i in range(50):
+        history.add({"type": "type", "text": f"query {i}"} if i % 5 == 0 else {"type": "tap", "target": f"Item {i}"})
+    rendered = history.render()
+    assert len(history) == 50
+    assert _tokens(rendered) <= 40
+    assert rendered.startswith("Earlier: steps 1-")
+    assert "type" in rendered.splitlines()[0] and "'query 40'" in rendered.splitlines()[0]
+    assert rendered.splitlines()[-1].startswith("50. ")
+
+    history.reset()
+    assert history.render() == "(none)" and len(history) == 0
@@ -0,0 +1,38 @@
+from neurorun.macros import MacroStore, fill, fill_template, parameterize
+
+
+def test_parameterize_and_fill_round_trip():
+    params = {"dish": "pizza margherita", "size": "pizza"}
+    action = {"type": "type", "text": "large pizza margherita"}
+    recorded = parameterize(action, params)
+    assert recorded["text"] == "large {dish}"
+    assert fill(recorded, {"dish": "paneer tikka"})["text"] == "large paneer tikka"
+    assert action["text"] == "large pizza margherita"  # Inputs are never mutated
+
+
+def test_fill_template_leaves_other_braces_alone():
+    goal = 'Search for {query}; reply as {"price": <number>}'
+    assert fill_template(goal, {"query": "biryani"}) == 'Search for biryani; reply as {"price": <number>}'
+    assert fill_template(goal, {}) == goal
+
+
+def test_failed_replays_drop_the_macro():
+    store = MacroStore(path="", max_failures=2)
+    store.record("Zomato", "Search for {query}", [("ab" * 8, {"type": "tap", "target": "Search"})], {})
+    assert store.get(" zomato ", "Search  for {query}") is not None
+    store.report_failure("Zomato", "Search for {query}")
+    store.report_success("Zomato", "Search for {query}")  # Resets the streak
+    store.report_failure("Zomato", "Search for {query}")
+    assert store.get("Zomato", "Search for {query}") is not None
+    store.report_failure("Zomato", "Search for {query}")
+    assert store.get("Zomato", "Search for {query}") is None
+
+
+def test_saves_are_debounced_and_reload(tmp_path):
+    path = str(tmp_path / "macros.json")
+    store = MacroStore(path=path, save_delay=60)
+    store.record("Zomato", "Search for {query}", [("ab" * 8, {"type": "type", "text": "biryani"})], {"query": "biryani"})
+    assert not (tmp_path / "macros.json").exists()
+    store.flush()
+    macro = MacroStore(path=path).get("Zomato", "Search for {query}")
+    assert macro.steps[0]["action"]["text"] == "{query}"
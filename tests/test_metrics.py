@@ -0,0 +1,68 @@
+import pytest
+
+from metrics import LLM_REQUESTS, Counter, Gauge, Histogram, Registry, is_quota_error, track_llm_call
+
+
+def test_histogram_buckets_are_cumulative_and_upper_bound_inclusive():
+    registry = Registry()
+    hist = Histogram("op_seconds", "Op latency.", ("op",), buckets=(0.1, 1, 5), registry=registry)
+    for value in (0.05, 0.1, 0.5, 1, 7):
+        hist.labels("tap").observe(value)
+
+    assert registry.render() == (
+        "# HELP op_seconds Op latency.\n"
+        "# TYPE op_seconds histogram\n"
+        'op_seconds_bucket{op="tap",le="0.1"} 2\n'
+        'op_seconds_bucket{op="tap",le="1"} 4\n'
+        'op_seconds_bucket{op="tap",le="5"} 4\n'
+        'op_seconds_bucket{op="tap",le="+Inf"} 5\n'
+        'op_seconds_sum{op="tap"} 8.65\n'
+        'op_seconds_count{op="tap"} 5\n'
+    )
+
+
+def test_exposition_of_counters_and_gauges():
+    registry = Registry()
+    calls = Counter("calls_total", "Calls.", ("caller", "outcome"), registry=registry)
+    depth = Gauge("queue_depth", "Queued.", registry=registry)
+    backlog = []
+    calls.labels("planner", "ok").inc()
+    calls.labels("planner", "ok").inc(2)
+    calls.labels("planner", "quota").inc()
+    depth.set_function(lambda: len(backlog))
+    backlog.extend([1, 2, 3])
+
+    assert registry.render().splitlines() == [
+        "# HELP calls_total Calls.",
+        "# TYPE calls_total counter",
+        'calls_total{caller="planner",outcome="ok"} 3',
+        'calls_total{caller="planner",outcome="quota"} 1',
+        "# HELP queue_depth Queued.",
+        "# TYPE queue_depth gauge",
+        "queue_depth 3",
+    ]
+
+
+def test_label_values_are_escaped():
+    registry = Registry()
+    counter = Counter("apps_total", "Apps.", ("app",), registry=registry)
+    counter.labels('Uber "Black"\\\nEats').inc()
+    assert 'apps_total{app="Uber \\"Black\\"\\\\\\nEats"} 1' in registry.render()
+
+
+def test_wrong_label_count_is_rejected():
+    counter = Counter("x_total", "X.", ("a", "b"), registry=Registry())
+    with pytest.raises(ValueError):
+        counter.labels("only-one")
+
+
+def test_track_llm_call_counts_outcomes():
+    assert is_quota_error(RuntimeError("429 Resource has been exhausted"))
+    with pytest.raises(RuntimeError):
+        with track_llm_call("test-caller"):
+            raise RuntimeError("429 quota exceeded")
+    with track_llm_call("test-caller"):
+        pass
+
+    assert LLM_REQUESTS.labels("test-caller", "quota").value == 1
+    assert LLM_REQUESTS.labels("test-caller", "ok").value == 1
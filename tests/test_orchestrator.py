@@ -0,0 +1,170 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("PIL.Image")
+pytest.importorskip("google.generativeai")
+pytest.importorskip("droidrun")
+
+from neurorun import orchestrator as orchestrator_module  # noqa: E402
+from neurorun.macros import MacroStore  # noqa: E402
+from neurorun.orchestrator import NeuroOrchestrator  # noqa: E402
+from neurorun.screen_signature import HASH_SIZE, to_hex  # noqa: E402
+
+# Screens far apart in both the macro signature and the fine change hash
+HOME, SEARCH, RESULTS, OTHER = 0, 0xFFFFFFFF00000000, 0x00000000FFFFFFFF, 0xFFFF0000FFFF0000
+
+
+class Screen:
+    def __init__(self, value):
+        self.value = value
+
+
+class FakeDevice:
+    """
+    Stands in for the phone: `timeline[k]` is what the screen shows after the k-th action,
+    one frame per capture (the last frame sticks). Actions are recorded, never sent.
+    """
+
+    def __init__(self, timeline):
+        self.timeline = [[Screen(v) for v in frames] for frames in timeline]
+        self.actions = []
+        self.captures = 0
+        self._frames = list(self.timeline[0])
+
+    async def capture(self):
+        self.captures += 1
+        return self._frames.pop(0) if len(self._frames) > 1 else self._frames[0]
+
+    async def execute(self, action):
+        self.actions.append(action)
+        self._frames = list(self.timeline[min(len(self.actions), len(self.timeline) - 1)])
+
+
+def make_orchestrator(monkeypatch, device, plans, macros=None):
+    async def connect():
+        return True
+
+    async def frame_hash(img, size=None):
+        return img.value if size == HASH_SIZE else img.value * 3  # Any distinct fine hash will do
+
+    planner_calls = []
+
+    async def plan_next_step(goal, img, step, note=""):
+        planner_calls.append((img.value, note))
+        return plans.pop(0)
+
+    async def settle(*args, **kwargs):
+        return True
+
+    monkeypatch.setattr(orchestrator_module, "wait_until_idle", settle)
+    orchestrator = NeuroOrchestrator("test-key", "emulator-5554", macros=macros or MacroStore(path=""))
+    orchestrator.use_ui_index = False
+    orchestrator.unchanged_poll = 0
+    orchestrator.connect = connect
+    orchestrator.capture_state_image = device.capture
+    orchestrator.execute_action_direct = device.execute
+    orchestrator._frame_hash = frame_hash
+    orchestrator.plan_next_step = plan_next_step
+    return orchestrator, planner_calls
+
+
+def recorded_macro():
+    macros = MacroStore(path="")
+    macros.record("Zomato", "Search for {dish}", [
+        (to_hex(HOME), {"type": "tap", "bq_box": [10, 10, 20, 20]}),
+        (to_hex(SEARCH), {"type": "type", "text": "pizza"}),
+        (None, {"type": "key", "keycode": "KEYCODE_ENTER"}),
+    ], {"dish": "pizza"})
+    return macros
+
+
+DONE = {"status": "done", "action": {"type": "done", "data": {"price": 250}}}
+
+
+def test_matching_replay_runs_the_macro_without_the_planner(monkeypatch):
+    macros = recorded_macro()
+    device = FakeDevice([[HOME], [SEARCH], [SEARCH], [RESULTS]])
+    orchestrator, planner_calls = make_orchestrator(monkeypatch, device, [DONE], macros)
+
+    result = asyncio.run(orchestrator.run_mission("Search for {dish}", app="Zomato", params={"dish": "burger"}))
+
+    assert result["status"] == "success" and result["data"] == {"price": 250}
+    assert [a["type"] for a in device.actions] == ["tap", "type", "key"]
+    assert device.actions[1]["text"] == "burger"
+    # Only the final "done" check went to the planner
+    assert planner_calls == [(RESULTS, "")]
+    assert result["stats"]["replayed_steps"] == 3 and result["stats"]["macro"] == "replayed"
+    assert macros.get("Zomato", "Search for {dish}").successes == 2
+
+
+def test_unsigned_sequence_members_follow_without_a_screen_check(monkeypatch):
+    macros = recorded_macro()
+    device = FakeDevice([[HOME], [SEARCH], [OTHER], [RESULTS]])
+    orchestrator, _ = make_orchestrator(monkeypatch, device, [DONE], macros)
+
+    asyncio.run(orchestrator.run_mission("Search for {dish}", app="Zomato", params={"dish": "pizza"}))
+
+    # The key press ran right after typing, on a screen nobody looked at
+    assert [a["type"] for a in device.actions] == ["tap", "type", "key"]
+    assert device.captures == 3
+
+
+def test_divergence_hands_over_to_the_planner_and_rerecords(monkeypatch):
+    macros = recorded_macro()
+    # After the first tap an unexpected screen shows up instead of the search page
+    device = FakeDevice([[HOME], [OTHER], [RESULTS]])
+    plans = [{"status": "continue", "action": {"type": "back"}}, DONE]
+    orchestrator, planner_calls = make_orchestrator(monkeypatch, device, plans, macros)
+
+    result = asyncio.run(orchestrator.run_mission("Search for {dish}", app="Zomato", params={"dish": "pizza"}))
+
+    assert result["status"] == "success"
+    assert result["stats"]["macro"] == "diverged" and result["stats"]["replayed_steps"] == 1
+    assert [a["type"] for a in device.actions] == ["tap", "back"]
+    assert [value for value, _ in planner_calls] == [OTHER, RESULTS]
+    # The repaired path replaces the recording
+    steps = macros.get("Zomato", "Search for {dish}").steps
+    assert [(s["signature"], s["action"]["type"]) for s in steps] == [(to_hex(HOME), "tap"), (to_hex(OTHER), "back")]
+
+
+def test_unchanged_screen_is_repolled_before_asking_the_planner(monkeypatch):
+    # The tap takes two polls to land; the planner only ever sees the new screen
+    device = FakeDevice([[HOME], [HOME, HOME, SEARCH], [RESULTS]])
+    plans = [{"status": "continue", "action": {"type": "tap", "bq_box": [1, 1, 2, 2]}},
+             {"status": "continue", "action": {"type": "back"}}, DONE]
+    orchestrator, planner_calls = make_orchestrator(monkeypatch, device, plans)
+
+    stats = asyncio.run(orchestrator.run_mission("Open search"))["stats"]
+
+    assert [value for value, _ in planner_calls] == [HOME, SEARCH, RESULTS]
+    assert (stats["unchanged_polls"], stats["stale_frames_skipped"]) == (2, 1)
+
+
+def test_screen_that_never_changes_reaches_the_planner_with_a_note(monkeypatch):
+    device = FakeDevice([[HOME]])
+    plans = [{"status": "continue", "action": {"type": "tap", "bq_box": [1, 1, 2, 2]}}, DONE]
+    orchestrator, planner_calls = make_orchestrator(monkeypatch, device, plans)
+
+    stats = asyncio.run(orchestrator.run_mission("Open search"))["stats"]
+
+    assert stats["unchanged_polls"] == orchestrator.unchanged_retries
+    assert stats["stale_frames_skipped"] == 0
+    assert planner_calls[1][1].startswith("NOTE: The previous action had no visible effect")
+
+
+def test_no_repoll_after_wait_or_during_replay(monkeypatch):
+    macros = MacroStore(path="")
+    # Two look-alike popups dismissed in a row: same screen before each replayed tap
+    tap = {"type": "tap", "bq_box": [900, 450, 950, 550]}
+    macros.record("Zomato", "Dismiss popups", [(to_hex(HOME), tap), (to_hex(HOME), tap)], {})
+    device = FakeDevice([[HOME], [HOME], [RESULTS]])
+    plans = [{"status": "continue", "action": {"type": "wait"}}, DONE]
+    orchestrator, planner_calls = make_orchestrator(monkeypatch, device, plans, macros)
+
+    result = asyncio.run(orchestrator.run_mission("Dismiss popups", app="Zomato"))
+
+    # Nor after the planner's 'wait', though RESULTS is then seen twice in a row
+    assert result["stats"]["replayed_steps"] == 2
+    assert result["stats"]["unchanged_polls"] == 0
+    assert planner_calls == [(RESULTS, ""), (RESULTS, "")]
@@ -0,0 +1,59 @@
+import asyncio
+import time
+
+import pytest
+
+from rate_limiter import RateLimiter, estimate_tokens, retry_after
+
+
+def test_burst_then_waits_for_refill():
+    async def main():
+        limiter = RateLimiter(rpm=600, tpm=0, burst_seconds=0.5)  # 10 req/s, burst of 5
+        start = time.monotonic()
+        for _ in range(5):
+            await limiter.acquire()
+        burst = time.monotonic() - start
+        await limiter.acquire(requests=2)
+        return burst, time.monotonic() - start
+
+    burst, total = asyncio.run(main())
+    assert burst < 0.05
+    assert 0.15 <= total < 0.5
+
+
+def test_keys_are_served_round_robin():
+    async def main():
+        limiter = RateLimiter(rpm=600, tpm=0, burst_seconds=0.1)  # One request at a time
+        order = []
+
+        async def call(key, n):
+            await limiter.acquire(key=key)
+            order.append(f"{key}{n}")
+
+        await limiter.acquire()  # Drain the burst so everything below queues
+        await asyncio.gather(*(call("a", i) for i in range(3)), *(call("b", i) for i in range(2)))
+        return order
+
+    assert asyncio.run(main()) == ["a0", "b0", "a1", "b1", "a2"]
+
+
+def test_quota_errors_back_off_and_successes_recover():
+    async def main():
+        limiter = RateLimiter(rpm=60, tpm=0)
+        with pytest.raises(RuntimeError):
+            async with limiter.limit():
+                raise RuntimeError("429 Resource has been exhausted. Please retry in 0.1s")
+        assert limiter.scale == 0.5
+        assert limiter._paused_until > time.monotonic()
+        async with limiter.limit():
+            pass
+        assert limiter.scale == pytest.approx(0.6)
+
+    asyncio.run(main())
+
+
+def test_helpers():
+    assert retry_after(RuntimeError("Please retry in 37.2s")) == 37.2
+    assert retry_after(RuntimeError("retry_delay { seconds: 12 }")) == 12
+    assert retry_after(RuntimeError("boom")) is None
+    assert estimate_tokens("x" * 400, images=1) == 100 + 8 * 258 + 500
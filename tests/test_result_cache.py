@@ -0,0 +1,52 @@
+import time
+
+from result_cache import ResultCache
+
+
+def test_hit_returns_a_tagged_copy():
+    cache = ResultCache(max_entries=10, default_ttl=60, path="")
+    key = cache.key(" Amazon ", "  USB   Cable ", "Electronics")
+    assert key == ("amazon", "usb cable", "electronics")
+    cache.put(key, {"price": 199})
+    hit = cache.get(cache.key("amazon", "usb cable", "electronics"))
+    assert hit["price"] == 199 and hit["cached"] is True
+    hit["price"] = 1
+    assert cache.get(key)["price"] == 199
+
+
+def test_ttl_and_max_age(monkeypatch):
+    cache = ResultCache(max_entries=10, default_ttl=60, path="")
+    key = cache.key("zomato", "biryani")
+    cache.put(key, {"price": 250})
+    now = time.time()
+    monkeypatch.setattr(time, "time", lambda: now + 200)
+    assert cache.get(key, max_age=500) is not None
+    assert cache.get(key, max_age=0) is None
+    # Zomato's built-in TTL is 300s; an env override wins
+    monkeypatch.setattr(time, "time", lambda: now + 400)
+    assert cache.get(key) is None
+    monkeypatch.setenv("PRICE_CACHE_TTL_ZOMATO", "1000")
+    assert cache.get(key) is not None
+    assert cache.ttl_for("Apollo 24|7") == 1800
+
+
+def test_lru_eviction():
+    cache = ResultCache(max_entries=2, default_ttl=60, path="")
+    a, b, c = (cache.key("amazon", q) for q in "abc")
+    cache.put(a, {"q": "a"})
+    cache.put(b, {"q": "b"})
+    cache.get(a)  # a is now the most recently used
+    cache.put(c, {"q": "c"})
+    assert cache.get(b) is None
+    assert cache.get(a) is not None and cache.get(c) is not None
+
+
+def test_saves_are_debounced_and_reload(tmp_path):
+    path = str(tmp_path / "prices.json")
+    cache = ResultCache(max_entries=10, default_ttl=60, path=path, save_delay=60)
+    for q in ("a", "b", "c"):
+        cache.put(cache.key("amazon", q), {"q": q})
+    assert not (tmp_path / "prices.json").exists()  # Still waiting on the timer
+    cache.flush()
+    reloaded = ResultCache(max_entries=10, default_ttl=60, path=path)
+    assert reloaded.get(reloaded.key("amazon", "b"))["q"] == "b"
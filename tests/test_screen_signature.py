@@ -0,0 +1,28 @@
+import pytest
+
+Image = pytest.importorskip("PIL.Image")
+
+from neurorun.screen_signature import dhash, from_hex, hamming, to_hex  # noqa: E402
+
+
+def gradient(width=90, height=160, reverse=False):
+    image = Image.new("L", (width, height))
+    image.putdata([(255 - x * 255 // width) if reverse else x * 255 // width
+                   for y in range(height) for x in range(width)])
+    return image
+
+
+def test_hamming_and_hex_round_trip():
+    assert hamming(0b1011, 0b0001) == 2
+    assert hamming(5, 5) == 0
+    assert from_hex(to_hex(0xF00D)) == 0xF00D
+    assert len(to_hex(1)) == 16
+
+
+def test_dhash_is_stable_under_noise_and_tracks_layout():
+    base = gradient()
+    noisy = base.copy()
+    noisy.putpixel((10, 10), 0)  # A single changed pixel (a clock tick, a price digit)
+    assert hamming(dhash(base), dhash(noisy)) <= 2
+    assert hamming(dhash(base), dhash(gradient(reverse=True))) > 32
+    assert dhash(base, size=16).bit_length() <= 256
@@ -0,0 +1,44 @@
+import struct
+
+import pytest
+
+pytest.importorskip("PIL.Image")
+
+from neurorun.screencap import ScreencapError, decode_raw  # noqa: E402
+
+# One red and one blue pixel, as each format lays them out
+PIXELS = {
+    1: bytes([255, 0, 0, 255, 0, 0, 255, 128]),  # RGBA_8888
+    2: bytes([255, 0, 0, 0, 0, 0, 255, 0]),      # RGBX_8888 (padding byte ignored)
+    5: bytes([0, 0, 255, 255, 255, 0, 0, 128]),  # BGRA_8888
+}
+EXPECTED = {
+    1: ("RGBA", [(255, 0, 0, 255), (0, 0, 255, 128)]),
+    2: ("RGB", [(255, 0, 0), (0, 0, 255)]),
+    5: ("RGBA", [(255, 0, 0, 255), (0, 0, 255, 128)]),
+}
+
+
+def raw_capture(pixel_format, header_size):
+    header = struct.pack("<III", 2, 1, pixel_format)
+    if header_size == 16:
+        header += struct.pack("<I", 1)  # Colorspace, Android 9+
+    return header + PIXELS[pixel_format]
+
+
+@pytest.mark.parametrize("header_size", [12, 16])
+@pytest.mark.parametrize("pixel_format", [1, 2, 5])
+def test_decodes_each_pixel_format_with_either_header(pixel_format, header_size):
+    image = decode_raw(raw_capture(pixel_format, header_size))
+    mode, pixels = EXPECTED[pixel_format]
+    assert image.mode == mode and image.size == (2, 1)
+    assert [image.getpixel((x, 0)) for x in range(2)] == pixels
+
+
+def test_rejects_truncated_or_unknown_captures():
+    with pytest.raises(ScreencapError):
+        decode_raw(b"\x00" * 8)
+    with pytest.raises(ScreencapError):
+        decode_raw(raw_capture(1, 12)[:-1])
+    with pytest.raises(ScreencapError):
+        decode_raw(struct.pack("<III", 2, 1, 3) + bytes(8))
@@ -0,0 +1,101 @@
+import asyncio
+
+import pytest
+
+from single_flight import SingleFlight, coalesce_identical
+
+
+class FakeAgent:
+    def __init__(self, device_serial):
+        self.device_serial = device_serial
+        self.runs = 0
+
+    @coalesce_identical(("app_name", "query"), when={"action": "search"})
+    async def execute_task(self, app_name, query, action="search"):
+        self.runs += 1
+        await asyncio.sleep(0.01)
+        return {"app": app_name, "query": query, "device": self.device_serial}
+
+
+def test_identical_calls_share_one_run_and_get_copies():
+    async def main():
+        agent = FakeAgent("emulator-5554")
+        results = await asyncio.gather(
+            agent.execute_task("Amazon", "usb cable"),
+            agent.execute_task("amazon", "  USB cable "),
+            agent.execute_task("Amazon", "usb cable", action="order"),  # Never shared
+        )
+        assert agent.runs == 2
+        assert results[0] == results[1] and results[0] is not results[1]
+
+    asyncio.run(main())
+
+
+def test_agents_on_different_devices_share_one_run():
+    async def main():
+        a, b = FakeAgent("emulator-5554"), FakeAgent("emulator-5556")
+        results = await asyncio.gather(a.execute_task("Amazon", "tv"), b.execute_task("amazon", "TV"))
+        # Only the first caller's device did the work; the other just awaited its result
+        assert (a.runs, b.runs) == (1, 0)
+        assert [r["device"] for r in results] == ["emulator-5554", "emulator-5554"]
+
+    asyncio.run(main())
+
+
+def test_cancelled_leader_stops_the_run_and_a_waiter_takes_over():
+    async def main():
+        flight = SingleFlight("test")
+        started, finished = [], []
+
+        async def work(name):
+            started.append(name)
+            await asyncio.sleep(0.05)
+            finished.append(name)
+            return name
+
+        leader = asyncio.create_task(flight.do("k", lambda: work("leader")))
+        await asyncio.sleep(0)
+        waiter = asyncio.create_task(flight.do("k", lambda: work("waiter")))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        # The leader's run is gone with it; the waiter re-ran rather than inheriting a cancel
+        assert await waiter == "waiter"
+        assert started == ["leader", "waiter"] and finished == ["waiter"]
+
+    asyncio.run(main())
+
+
+def test_cancelled_waiter_leaves_the_run_alone():
+    async def main():
+        flight = SingleFlight("test")
+
+        async def work():
+            await asyncio.sleep(0.02)
+            return {"ok": True}
+
+        leader = asyncio.create_task(flight.do("k", work))
+        await asyncio.sleep(0)
+        waiter = asyncio.create_task(flight.do("k", work))
+        await asyncio.sleep(0.005)
+        waiter.cancel()
+        assert await leader == {"ok": True}
+        assert waiter.cancelled()
+
+    asyncio.run(main())
+
+
+def test_errors_reach_every_caller():
+    async def main():
+        flight = SingleFlight("test")
+
+        async def boom():
+            await asyncio.sleep(0.01)
+            raise ValueError("no price")
+
+        results = await asyncio.gather(flight.do("k", boom), flight.do("k", boom), return_exceptions=True)
+        assert all(isinstance(r, ValueError) for r in results)
+        assert not flight._inflight
+
+    asyncio.run(main())
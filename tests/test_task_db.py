@@ -0,0 +1,110 @@
+import asyncio
+import sqlite3
+
+from task_db import TaskDatabase
+from task_store import TaskStore
+
+
+def rows_on_disk(path):
+    conn = sqlite3.connect(path)
+    try:
+        return conn.execute("SELECT id, status, log_count FROM tasks ORDER BY pos").fetchall()
+    finally:
+        conn.close()
+
+
+def test_writes_are_batched_until_the_batch_fills_or_a_read_flushes(tmp_path):
+    path = str(tmp_path / "tasks.db")
+
+    async def main():
+        db = TaskDatabase(path, flush_interval=60, batch_size=4)
+        await db.start()
+        store = TaskStore(backend=db)
+        store.add("t0", "rider", {"from": "A"})
+        store.append_log("t0", "hello")
+        await asyncio.sleep(0.05)
+        on_disk_early = rows_on_disk(path)
+
+        store.append_log("t0", "world")
+        store.update_status("t0", "completed", {"price": 10})
+        # Fourth op fills the batch and wakes the flusher without waiting for the interval
+        for _ in range(20):
+            await asyncio.sleep(0.01)
+            if rows_on_disk(path):
+                break
+        on_disk_after_batch = rows_on_disk(path)
+        await db.stop()
+        return on_disk_early, on_disk_after_batch
+
+    early, after_batch = asyncio.run(main())
+    assert early == []
+    assert after_batch == [("t0", "completed", 2)]
+
+
+def test_page_and_get_match_the_task_store_contract(tmp_path):
+    async def main():
+        db = TaskDatabase(str(tmp_path / "tasks.db"), flush_interval=60)
+        await db.start()
+        store = TaskStore(backend=db)
+        for i in range(5):
+            store.add(f"t{i}", "shopper" if i % 2 else "rider", {"i": i})
+        store.append_log("t3", "searching")
+        store.update_status("t3", "completed", {"price": 3})
+
+        first = await db.page(limit=2)
+        second = await db.page(limit=2, cursor=first["next_cursor"])
+        third = await db.page(limit=2, cursor=second["next_cursor"])
+        shoppers = await db.page(persona="shopper")
+        done = await db.page(status="completed", view="full")
+        task = await db.get("t3")
+        missing = await db.get("nope")
+        await db.stop()
+        return first, second, third, shoppers, done, task, missing
+
+    first, second, third, shoppers, done, task, missing = asyncio.run(main())
+    assert [t["id"] for t in first["tasks"]] == ["t4", "t3"]
+    assert [t["id"] for t in second["tasks"]] == ["t2", "t1"]
+    assert [t["id"] for t in third["tasks"]] == ["t0"] and third["next_cursor"] is None
+    assert [t["id"] for t in shoppers["tasks"]] == ["t3", "t1"]
+    assert first["tasks"][1]["log_count"] == 1 and "logs" not in first["tasks"][1]
+    assert done["tasks"][0]["result"] == {"price": 3}
+    assert done["tasks"][0]["logs"][0].endswith("searching")
+    assert task["payload"] == {"i": 3} and task["status"] == "completed"
+    assert missing is None
+
+
+def test_restore_continues_positions_and_fails_interrupted_tasks(tmp_path):
+    path = str(tmp_path / "tasks.db")
+
+    async def first_run():
+        db = TaskDatabase(path, flush_interval=60)
+        await db.start()
+        store = TaskStore(backend=db)
+        for i in range(4):
+            store.add(f"t{i}", "rider", {})
+        for i in range(3):
+            store.update_status(f"t{i}", "completed")
+        await db.stop()
+
+    async def second_run():
+        db = TaskDatabase(path, flush_interval=60)
+        await db.start()
+        recent, max_pos = await db.load_recent(limit=2)
+        store = TaskStore(backend=db)
+        store.restore(recent, max_pos)
+        store.add("t4", "rider", {})
+        page = await db.page(limit=10)
+        interrupted = await db.get("t3")
+        await db.stop()
+        return recent, max_pos, store, page, interrupted
+
+    asyncio.run(first_run())
+    recent, max_pos, store, page, interrupted = asyncio.run(second_run())
+
+    assert [record["id"] for _, record in recent] == ["t2", "t3"]
+    assert max_pos == 4
+    assert interrupted["status"] == "failed"
+    assert interrupted["result"] == {"error": "Interrupted by server restart"}
+    # The new task lands after every persisted one, in memory and on disk
+    assert [t["id"] for t in store.page()["tasks"]] == ["t4", "t3", "t2"]
+    assert [t["id"] for t in page["tasks"]] == ["t4", "t3", "t2", "t1", "t0"]
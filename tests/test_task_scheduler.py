@@ -0,0 +1,133 @@
+import asyncio
+from contextlib import asynccontextmanager
+
+import pytest
+
+from task_scheduler import BACKGROUND, INTERACTIVE, QueueFullError, TaskScheduler
+
+
+class FakeDevice:
+    def __init__(self, serial):
+        self.serial = serial
+        self.task_id = None
+
+
+class FakePool:
+    """One device; lease() blocks until it is free."""
+
+    def __init__(self):
+        self.device = FakeDevice("emulator-5554")
+        self._lock = asyncio.Lock()
+
+    @asynccontextmanager
+    async def lease(self, task_id=None):
+        async with self._lock:
+            yield self.device
+
+
+def test_jobs_waiting_for_a_device_stay_queued():
+    async def main():
+        release = asyncio.Event()
+        ran = []
+
+        async def runner(task_id, payload, serial):
+            ran.append((task_id, serial))
+            await release.wait()
+
+        scheduler = TaskScheduler(runner, pool=FakePool(), max_queue=2)
+        await scheduler.start(2)  # More workers than devices
+        scheduler.submit("a", None)
+        await asyncio.sleep(0.01)
+        assert ran == [("a", "emulator-5554")]
+
+        assert scheduler.submit("b", None) == 1
+        assert scheduler.submit("c", None) == 2
+        await asyncio.sleep(0.01)
+        # The spare worker is parked on the lease, so both still count against the limit
+        assert scheduler.depth == 2
+        with pytest.raises(QueueFullError):
+            scheduler.submit("d", None)
+
+        release.set()
+        for _ in range(10):
+            await asyncio.sleep(0.01)
+        assert [task_id for task_id, _ in ran] == ["a", "b", "c"]
+        assert scheduler.depth == 0
+        await scheduler.stop()
+
+    asyncio.run(main())
+
+
+def test_background_lane_gets_every_nth_pick():
+    async def main():
+        order = []
+
+        async def runner(task_id, payload, serial):
+            order.append(task_id)
+
+        scheduler = TaskScheduler(runner, max_queue=10, background_every=3)
+        for i in range(2):
+            scheduler.submit(f"bg{i}", None, BACKGROUND)
+        for i in range(4):
+            scheduler.submit(f"fg{i}", None, INTERACTIVE)
+        await scheduler.start(1)
+        for _ in range(20):
+            await asyncio.sleep(0)
+        await scheduler.stop()
+        return order
+
+    assert asyncio.run(main()) == ["fg0", "fg1", "bg0", "fg2", "fg3", "bg1"]
+
+
+def test_cancel_queued_and_running():
+    async def main():
+        started = asyncio.Event()
+        cancelled = []
+
+        async def runner(task_id, payload, serial):
+            started.set()
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.append(task_id)
+                raise
+
+        scheduler = TaskScheduler(runner, pool=FakePool(), max_queue=5)
+        await scheduler.start(1)
+        scheduler.submit("a", None)
+        scheduler.submit("b", None)
+        await started.wait()
+
+        assert scheduler.position("b") == 1
+        assert scheduler.cancel("b") == "queued"
+        assert scheduler.depth == 0
+        assert scheduler.cancel("a") == "running"
+        await asyncio.sleep(0.01)
+        assert cancelled == ["a"]
+        assert scheduler.cancel("a") is None
+        await scheduler.stop()
+
+    asyncio.run(main())
+
+
+def test_stop_flags_shutdown_before_cancelling_jobs():
+    async def main():
+        seen = []
+        scheduler = None
+
+        async def runner(task_id, payload, serial):
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                seen.append(scheduler.stopping)
+                raise
+
+        scheduler = TaskScheduler(runner, max_queue=5)
+        await scheduler.start(1)
+        scheduler.submit("a", None)
+        await asyncio.sleep(0.01)
+        assert not scheduler.stopping
+        await scheduler.stop()
+        assert seen == [True]
+
+    asyncio.run(main())
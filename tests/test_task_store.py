@@ -0,0 +1,126 @@
+from collections import OrderedDict
+
+from task_store import TaskStore
+
+
+def make_store(n, **kwargs):
+    store = TaskStore(**kwargs)
+    for i in range(n):
+        store.add(f"t{i}", "shopper" if i % 2 else "rider", {"i": i})
+    return store
+
+
+def test_page_walks_newest_first_with_cursor():
+    store = make_store(5)
+    first = store.page(limit=2)
+    assert [t["id"] for t in first["tasks"]] == ["t4", "t3"]
+    second = store.page(limit=2, cursor=first["next_cursor"])
+    assert [t["id"] for t in second["tasks"]] == ["t2", "t1"]
+    third = store.page(limit=2, cursor=second["next_cursor"])
+    assert [t["id"] for t in third["tasks"]] == ["t0"]
+    assert third["next_cursor"] is None
+
+
+def test_no_cursor_when_page_ends_exactly_on_last_match():
+    store = make_store(4)
+    page = store.page(limit=2, persona="shopper")
+    assert [t["id"] for t in page["tasks"]] == ["t3", "t1"]
+    assert page["next_cursor"] is None
+
+    page = store.page(limit=4)
+    assert len(page["tasks"]) == 4
+    assert page["next_cursor"] is None
+
+
+def test_summary_view_drops_logs_and_result():
+    store = make_store(1)
+    store.append_log("t0", "hello")
+    store.update_status("t0", "completed", {"price": 10})
+    summary = store.page()["tasks"][0]
+    assert "logs" not in summary and "result" not in summary
+    assert summary["log_count"] == 1
+    assert store.page(view="full")["tasks"][0]["result"] == {"price": 10}
+
+
+def test_eviction_keeps_active_tasks_and_drops_oldest_finished():
+    store = TaskStore(max_tasks=3)
+    for i in range(3):
+        store.add(f"t{i}", "rider", {}, status="queued")
+    store.update_status("t1", "completed", {"ok": True})
+    store.add("t3", "rider", {}, status="queued")
+    assert "t1" not in store
+    assert all(f"t{i}" in store for i in (0, 2, 3))
+    # Everything active: over the limit rather than evicting running work
+    store.add("t4", "rider", {}, status="running")
+    assert len(store) == 4
+    # ...until one of them finishes
+    store.update_status("t0", "failed")
+    assert "t0" not in store and len(store) == 3
+
+
+def test_log_lines_over_the_byte_limit_dont_walk_history_while_all_tasks_are_active():
+    store = TaskStore(max_tasks=100, max_bytes=200)
+    store.add("t0", "rider", {}, status="running")
+    store.add("t1", "rider", {}, status="queued")
+    walks = []
+
+    class CountingDict(OrderedDict):
+        def items(self):
+            walks.append(1)
+            return super().items()
+
+    store._tasks = CountingDict(store._tasks)
+    for _ in range(20):
+        store.append_log("t0", "x" * 50)
+    assert store.total_bytes > store.max_bytes and len(store) == 2
+    assert walks == []
+
+    store.update_status("t1", "completed")
+    assert "t1" not in store and "t0" in store
+
+
+def test_cursor_walks_across_evicted_holes():
+    store = TaskStore(max_tasks=3)
+    for i in range(3):
+        store.add(f"t{i}", "rider", {}, status="queued")
+    first = store.page(limit=1)
+    assert [t["id"] for t in first["tasks"]] == ["t2"]
+    # t1 finishes and gets evicted, leaving a hole right below the cursor
+    store.update_status("t1", "completed")
+    store.add("t3", "rider", {}, status="queued")
+    assert "t1" not in store
+    second = store.page(limit=1, cursor=first["next_cursor"])
+    assert [t["id"] for t in second["tasks"]] == ["t0"]
+    assert second["next_cursor"] is None
+
+
+def test_byte_limit_evicts_and_pagination_skips_evicted():
+    store = TaskStore(max_tasks=100, max_bytes=1500)
+    for i in range(10):
+        store.add(f"t{i}", "rider", {"blob": "x" * 100})
+        store.update_status(f"t{i}", "completed", {"ok": True})
+    assert store.total_bytes <= 1500
+    ids = [t["id"] for t in store.page(limit=100)["tasks"]]
+    assert ids == [t["id"] for t in store.list()]
+    assert "t9" in ids and "t0" not in ids
+
+
+def test_changed_since_returns_most_recent_first():
+    store = make_store(3)
+    store.mark_updated("t0", 1)
+    store.mark_updated("t2", 2)
+    store.mark_updated("t1", 3)
+    assert [t["id"] for t in store.changed_since(1)] == ["t1", "t2"]
+    assert store.changed_since(3) == []
+
+
+def test_changed_since_applies_filters_and_limit():
+    store = make_store(4)
+    store.update_status("t1", "completed")
+    for seq, task_id in enumerate(["t0", "t1", "t2", "t3"], start=1):
+        store.mark_updated(task_id, seq)
+    assert [t["id"] for t in store.changed_since(0, persona="shopper")] == ["t3", "t1"]
+    assert [t["id"] for t in store.changed_since(0, status="completed")] == ["t1"]
+    assert [t["id"] for t in store.changed_since(2, limit=2)] == ["t3", "t2"]
+    # More changes than fit in one response: the caller must fall back to a full page
+    assert store.changed_since(0, limit=2) is None
@@ -0,0 +1,44 @@
+from neurorun.ui_index import UiIndex
+
+DUMP = """<?xml version='1.0' encoding='UTF-8' standalone='yes' ?>
+<hierarchy rotation="0">
+  <node class="android.widget.FrameLayout" bounds="[0,0][1080,2400]" clickable="false" text="" resource-id="" content-desc="">
+    <node class="android.widget.EditText" bounds="[40,100][1040,200]" clickable="true" text="" resource-id="com.app:id/search_box" content-desc="Search" />
+    <node class="android.widget.LinearLayout" bounds="[0,400][1080,600]" clickable="true" text="" resource-id="" content-desc="">
+      <node class="android.widget.TextView" bounds="[40,420][600,480]" clickable="false" text="Chicken Biryani" resource-id="" content-desc="" />
+      <node class="android.widget.TextView" bounds="[40,500][300,560]" clickable="false" text="&#8377;249" resource-id="" content-desc="" />
+    </node>
+    <node class="android.widget.Button" bounds="[700,2200][1040,2350]" clickable="true" text="Add to Cart" resource-id="com.app:id/add" content-desc="" />
+    <node class="android.widget.TextView" bounds="[0,0][0,0]" clickable="false" text="Hidden" resource-id="" content-desc="" />
+    <node class="android.view.View" bounds="[0,700][1080,800]" clickable="false" text="" resource-id="" content-desc="" />
+  </node>
+</hierarchy>"""
+
+
+def test_from_xml_keeps_labelled_visible_nodes():
+    index = UiIndex.from_xml(DUMP)
+    assert [e.label for e in index.elements] == ["Search", "Chicken Biryani", "₹249", "Add to Cart"]
+    # Unclickable text inherits the bounds of its clickable row
+    biryani = index.elements[1]
+    assert biryani.clickable and biryani.bounds == (0, 400, 1080, 600)
+
+
+def test_find_by_label_prefix_substring_and_number():
+    index = UiIndex.from_xml(DUMP)
+    assert index.find("search").resource_id == "com.app:id/search_box"
+    assert index.find("search box").label == "Search"  # Resource id by its last segment
+    assert index.find("add to").label == "Add to Cart"
+    assert index.find("biryani").label == "Chicken Biryani"
+    assert index.find("#3").label == "Add to Cart"
+    assert index.find(0).label == "Search"
+    assert index.find(99) is None
+    assert index.find("checkout") is None
+    assert index.find("") is None
+
+
+def test_bq_box_and_describe():
+    index = UiIndex.from_xml(DUMP)
+    assert index.find("Add to Cart").bq_box(1080, 2400) == [917, 648, 979, 963]
+    lines = index.describe(limit=2).splitlines()
+    assert lines[0] == "[0] 'Search' (EditText, clickable id=search_box)"
+    assert lines[-1] == "... 2 more"
@@ -0,0 +1,68 @@
+import asyncio
+import time
+
+import pytest
+
+Image = pytest.importorskip("PIL.Image")
+
+from neurorun import screencap, ui_settle  # noqa: E402
+from neurorun.screencap import ScreencapError  # noqa: E402
+
+
+def frame(split):
+    """White/black split at `split` pixels: different splits are different screens."""
+    image = Image.new("L", (68, 64), 255)
+    image.paste(0, (split, 0, 68, 64))
+    return image
+
+
+def fake_capture(monkeypatch, frames, delay=0.0):
+    timeouts = []
+
+    async def capture(serial, timeout=10.0):
+        timeouts.append(timeout)
+        await asyncio.sleep(min(delay, timeout))
+        if delay > timeout:
+            raise ScreencapError("adb exec-out screencap timed out")
+        item = frames[min(len(timeouts) - 1, len(frames) - 1)]
+        if isinstance(item, Exception):
+            raise item
+        return item
+
+    monkeypatch.setattr(screencap, "capture", capture)
+    return timeouts
+
+
+def settle(**kwargs):
+    start = time.monotonic()
+    settled = asyncio.run(ui_settle.wait_until_idle("emulator-5554", min_wait=0, poll=0.01, **kwargs))
+    return settled, time.monotonic() - start
+
+
+def test_returns_once_consecutive_frames_match(monkeypatch):
+    timeouts = fake_capture(monkeypatch, [frame(10), frame(40), frame(40)])
+    settled, elapsed = settle(timeout=2)
+    assert settled and len(timeouts) == 3
+    assert elapsed < 0.5
+
+
+def test_moving_screen_gives_up_at_the_timeout(monkeypatch):
+    moving = [frame(split) for split in range(4, 68, 4)] * 20
+    timeouts = fake_capture(monkeypatch, moving)
+    settled, elapsed = settle(timeout=0.2)
+    assert not settled
+    assert 0.2 <= elapsed < 0.5
+    # Every capture was bounded by what was left of the deadline
+    assert all(t <= 0.2 for t in timeouts)
+
+
+def test_failed_capture_returns_without_sleeping_out_the_timeout(monkeypatch):
+    fake_capture(monkeypatch, [ScreencapError("device offline")])
+    settled, elapsed = settle(timeout=2)
+    assert not settled and elapsed < 0.5
+
+
+def test_slow_capture_does_not_overrun_the_deadline(monkeypatch):
+    fake_capture(monkeypatch, [frame(10)], delay=5)
+    settled, elapsed = settle(timeout=0.3)
+    assert not settled and elapsed < 0.6
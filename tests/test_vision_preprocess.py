@@ -0,0 +1,48 @@
+import io
+
+import pytest
+
+Image = pytest.importorskip("PIL.Image")
+
+from neurorun.vision_preprocess import VisionConfig, estimate_image_tokens, preprocess  # noqa: E402
+
+
+def config(**kwargs):
+    defaults = dict(max_side=1024, image_format="png", quality=80, grayscale=False, crop_top=0.03, crop_bottom=0.04)
+    defaults.update(kwargs)
+    return VisionConfig(**defaults)
+
+
+def test_crops_the_bars_and_scales_the_long_side():
+    prepared = preprocess(Image.new("RGB", (1080, 2400), "white"), config())
+    assert prepared.crop == (0, 72, 1080, 2304)
+    assert prepared.device_size == (1080, 2400)
+    # 1080x2232 after the crop, long side brought down to 1024
+    assert prepared.size == (495, 1024)
+    assert Image.open(io.BytesIO(prepared.data)).size == prepared.size
+    assert prepared.tokens == estimate_image_tokens(495, 1024)
+
+
+def test_small_screens_are_not_upscaled_and_grayscale_is_one_channel():
+    prepared = preprocess(Image.new("RGB", (400, 800)), config(grayscale=True, crop_top=0, crop_bottom=0))
+    assert prepared.crop == (0, 0, 400, 800)
+    assert prepared.size == (400, 800)
+    assert Image.open(io.BytesIO(prepared.data)).mode == "L"
+
+
+def test_boxes_on_the_sent_image_map_back_to_the_full_screen():
+    prepared = preprocess(Image.new("RGB", (1080, 2400)), config())
+    # The edges of the sent image are the edges of the crop
+    assert prepared.to_device_box([0, 0, 1000, 1000]) == [30, 0, 960, 1000]
+
+    # A button drawn on the device lands back on its own coordinates
+    screen = Image.new("RGB", (1080, 2400), "white")
+    screen.paste((255, 0, 0), (270, 1200, 810, 1440))
+    prepared = preprocess(screen, config())
+    sent = Image.open(io.BytesIO(prepared.data)).convert("RGB")
+    red = [(x, y) for y in range(sent.height) for x in range(sent.width) if sent.getpixel((x, y))[1] < 128]
+    xs, ys = [p[0] for p in red], [p[1] for p in red]
+    box = [min(ys) / sent.height * 1000, min(xs) / sent.width * 1000,
+           (max(ys) + 1) / sent.height * 1000, (max(xs) + 1) / sent.width * 1000]
+    device_box = [1200 / 2400 * 1000, 270 / 1080 * 1000, 1440 / 2400 * 1000, 810 / 1080 * 1000]
+    assert prepared.to_device_box(box) == pytest.approx(device_box, abs=3)